@@ -233,15 +233,23 @@ class InitiateBridgeView(APIView):
 class BridgeStatusView(APIView):
     def get(self, request, id):
         try:
-            bridge = BridgeTransaction.objects.get(id=id)
+            bridge = BridgeTransaction.objects.select_related('quote__from_network').get(id=id)
             serializer = TransactionSerializer(bridge)
-            return Response(serializer.data)
         except BridgeTransaction.DoesNotExist:
             return Response(
                 {'error': 'Bridge not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        # Receipt and confirmations of the deposit come from the tracked status, not the node
+        from apps.escrow.tx_status import lookup_or_none
+        receipt = lookup_or_none(
+            bridge.deposit_tx_hash,
+            chain_id=bridge.quote.from_network.chain_id,
+            involves=(bridge.from_address,),
+        )
+        return Response(dict(serializer.data, deposit_receipt=receipt))
+
 class BridgeHistoryView(APIView):
     def get(self, request):
         user_token = request.headers.get('X-Client-Token')
@@ -0,0 +1,189 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "auth:client_token:"
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "cache_hits": 0,
+    "cache_misses": 0,
+    "cache_invalidations": 0,
+    "last_active_queued": 0,
+    "last_active_skipped": 0,
+    "flushes": 0,
+    "flushed_rows": 0,
+    "flush_errors": 0,
+}
+
+
+def _incr(name, amount=1):
+    with _metrics_lock:
+        _metrics[name] += amount
+
+
+def get_metrics() -> dict:
+    """Snapshot of the token cache and last_active flusher counters."""
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+# ---------------------------------------------------------------------------
+# client_token -> user cache
+# ---------------------------------------------------------------------------
+
+# Backends whose entries live in one process: a token revoked in one worker
+# would stay cached in the others until AUTH_CACHE_TTL runs out
+PROCESS_LOCAL_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+def is_shared_cache() -> bool:
+    """Whether the default cache is one every worker process reads and writes."""
+    return settings.CACHES["default"]["BACKEND"] not in PROCESS_LOCAL_BACKENDS
+
+
+def is_enabled() -> bool:
+    """Tokens are cached only in a cache every worker shares (or when AUTH_CACHE_ALLOW_LOCAL is set)."""
+    if settings.XUSDT_SETTINGS["AUTH_CACHE_TTL"] <= 0:
+        return False
+    return is_shared_cache() or settings.XUSDT_SETTINGS["AUTH_CACHE_ALLOW_LOCAL"]
+
+
+def _cache_key(client_token):
+    return f"{CACHE_KEY_PREFIX}{client_token}"
+
+
+def get_cached_user(client_token):
+    if not is_enabled():
+        return None
+    user = cache.get(_cache_key(client_token))
+    _incr("cache_hits" if user is not None else "cache_misses")
+    return user
+
+
+def cache_user(user):
+    if not is_enabled():
+        return
+    cache.set(
+        _cache_key(user.client_token),
+        user,
+        timeout=settings.XUSDT_SETTINGS["AUTH_CACHE_TTL"],
+    )
+
+
+def invalidate_client_token(client_token):
+    """Drop a token from the cache, e.g. after the salt or password changes."""
+    if not client_token:
+        return
+    cache.delete(_cache_key(client_token))
+    _incr("cache_invalidations")
+
+
+# ---------------------------------------------------------------------------
+# Write-coalescing last_active updates
+# ---------------------------------------------------------------------------
+
+class LastActiveBuffer:
+    """
+    Collects `last_active` timestamps in memory so that each user costs at most
+    one UPDATE per `window` seconds. A daemon thread flushes the pending
+    timestamps every `flush_interval` seconds with a single bulk_update.
+    """
+
+    def __init__(self, window=None, flush_interval=None):
+        self._window = window
+        self._flush_interval = flush_interval
+        self._pending = {}
+        self._last_queued = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def window(self):
+        if self._window is None:
+            return settings.XUSDT_SETTINGS["LAST_ACTIVE_WRITE_WINDOW"]
+        return self._window
+
+    @property
+    def flush_interval(self):
+        if self._flush_interval is None:
+            return settings.XUSDT_SETTINGS["LAST_ACTIVE_FLUSH_INTERVAL"]
+        return self._flush_interval
+
+    def touch(self, user_id, when):
+        """Record activity for `user_id`; returns True if a write was queued."""
+        now = time.monotonic()
+        with self._lock:
+            last = self._last_queued.get(user_id)
+            if last is not None and now - last < self.window:
+                _incr("last_active_skipped")
+                return False
+            self._last_queued[user_id] = now
+            self._pending[user_id] = when
+            self._ensure_flusher()
+        _incr("last_active_queued")
+        return True
+
+    def flush(self):
+        """Write all pending timestamps; returns the number of rows written."""
+        from .models import AnonymousUser
+
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            cutoff = time.monotonic() - self.window
+            self._last_queued = {
+                uid: ts for uid, ts in self._last_queued.items() if ts >= cutoff
+            }
+
+        if not pending:
+            return 0
+
+        users = [
+            AnonymousUser(id=user_id, last_active=when)
+            for user_id, when in pending.items()
+        ]
+        try:
+            AnonymousUser.objects.bulk_update(users, ["last_active"], batch_size=500)
+        except Exception:
+            _incr("flush_errors")
+            logger.exception("Failed to flush %d last_active updates", len(users))
+            # Requeue so the next flush retries, without clobbering newer values
+            with self._lock:
+                for user_id, when in pending.items():
+                    self._pending.setdefault(user_id, when)
+            return 0
+
+        _incr("flushes")
+        _incr("flushed_rows", len(users))
+        logger.debug("Flushed last_active for %d users; metrics=%s", len(users), get_metrics())
+        return len(users)
+
+    def _ensure_flusher(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="last-active-flusher", daemon=True
+        )
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+last_active_buffer = LastActiveBuffer()
+atexit.register(last_active_buffer.flush)
@@ -3,6 +3,7 @@ from rest_framework import authentication, exceptions
 from django.conf import settings
 from django.utils import timezone
 from .models import AnonymousUser
+from .auth_cache import cache_user, get_cached_user, last_active_buffer
 
 # Get an instance of a logger
 logger = logging.getLogger(__name__)
@@ -11,6 +12,8 @@ class ClientTokenAuthentication(authentication.BaseAuthentication):
     """
     Custom authentication for anonymous users using client tokens.
     Handles cases where username might be null and ensures all required user attributes exist.
+    Users are cached by token and `last_active` writes are coalesced, so a
+    cache hit costs no database round trip.
     """
     
     def authenticate(self, request):
@@ -22,22 +25,33 @@ class ClientTokenAuthentication(authentication.BaseAuthentication):
             return None
 
         try:
-            # Get user and update last active timestamp
-            user = AnonymousUser.objects.get(client_token=client_token)
+            user = get_cached_user(client_token)
+            if user is None:
+                user = AnonymousUser.objects.get(client_token=client_token)
+
+                # Ensure user has a username (set default if missing)
+                if not user.username:
+                    default_username = f"anon_{user.exchange_code or user.id}"
+                    logger.debug(f"Setting default username: {default_username}")
+                    user.username = default_username
+                    user.save(update_fields=['username'])
+
+                cache_user(user)
+
+            # A cached copy is current: save(), QuerySet.update() and delete() on users drop it
+            if not user.is_active:
+                logger.warning(f"Inactive user for client token: {client_token}")
+                raise exceptions.AuthenticationFailed('User inactive or deleted')
+
+            # last_active is written in batches by the background flusher
             user.last_active = timezone.now()
-            
-            # Ensure user has a username (set default if missing)
-            if not user.username:
-                default_username = f"anon_{user.exchange_code or user.id}"
-                logger.debug(f"Setting default username: {default_username}")
-                user.username = default_username
-                user.save(update_fields=['username', 'last_active'])
-            else:
-                user.save(update_fields=['last_active'])
-                
+            last_active_buffer.touch(user.pk, user.last_active)
+
             logger.debug(f"Authenticated user: {user.username} ({user.exchange_code})")
             return (user, None)
             
+        except exceptions.AuthenticationFailed:
+            raise
         except AnonymousUser.DoesNotExist:
             logger.warning(f"Invalid client token provided: {client_token}")
             raise exceptions.AuthenticationFailed('Invalid client token')
@@ -0,0 +1,339 @@
+"""
+Shared chain-client layer.
+
+Every on-chain call in the project goes through `get_web3()` /
+`get_async_web3()`. Clients are cached per chain id (or per explicit URL
+list), so the whole process shares one client for each chain.
+
+- Endpoints: WEB3_RPC_URL and WEB3_RPC_FALLBACK_URLS for the default
+  CHAIN_ID, plus any active `BridgeNetwork.rpc_url` rows for the chain. They
+  are resolved on the first request, not at import. The async client does
+  that lookup in a worker thread, since the ORM refuses to run on the event
+  loop.
+- Pooling: all sync endpoints share one keep-alive `requests.Session` with
+  a sized connection pool.
+- Failover: every endpoint keeps an EWMA latency and a consecutive-failure
+  count. Requests go to the fastest endpoint that is not cooling down. A
+  transport error (connection, timeout, HTTP status) puts the endpoint on a
+  growing cooldown and moves on to the next one. JSON-RPC errors are answers
+  from a healthy node and are returned unchanged.
+- Metrics: request count, error count and latency per RPC method and per
+  endpoint (`get_metrics()`).
+- Simulation: a `sim://<name>` endpoint is served by an in-process
+  MockNode (apps.escrow.mock_node) instead of HTTP, so the escrow flows run
+  and can be load-tested without a real node.
+
+Nothing here touches the network or builds a client at import; modules that
+keep module-level chain objects wrap them in SimpleLazyObject, and contract
+ABIs are parsed once per process with `load_abi()`.
+"""
+import asyncio
+import functools
+import json
+import logging
+import threading
+import time
+from collections import defaultdict
+
+import aiohttp
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from web3 import AsyncHTTPProvider, AsyncWeb3, HTTPProvider, Web3
+from web3.providers import JSONBaseProvider
+from web3.providers.async_base import AsyncJSONBaseProvider
+
+logger = logging.getLogger(__name__)
+
+EWMA_ALPHA = 0.3
+MAX_COOLDOWN = 300  # seconds
+SIM_SCHEME = "sim://"  # in-process MockNode endpoints
+
+_lock = threading.Lock()
+_clients = {}
+_session = None
+_method_stats = defaultdict(lambda: {"requests": 0, "errors": 0, "total_ms": 0.0})
+
+
+def _record_method(method, elapsed, failed):
+    with _lock:
+        stats = _method_stats[method]
+        stats["requests"] += 1
+        stats["total_ms"] += elapsed * 1000
+        if failed:
+            stats["errors"] += 1
+
+
+def _shared_session() -> requests.Session:
+    global _session
+    with _lock:
+        if _session is None:
+            pool_size = settings.XUSDT_SETTINGS["RPC_POOL_SIZE"]
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+# ---------------------------------------------------------------------------
+# Endpoint health
+# ---------------------------------------------------------------------------
+
+class Endpoint:
+    def __init__(self, url, provider):
+        self.url = url
+        self.provider = provider
+        self.latency = None  # EWMA, seconds
+        self.failures = 0
+        self.cooldown_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    @property
+    def available(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def score(self):
+        # Unknown latency sorts first so every endpoint gets measured
+        return (self.failures, self.latency if self.latency is not None else 0.0)
+
+    def record_success(self, elapsed):
+        with self._lock:
+            self.requests += 1
+            self.failures = 0
+            self.cooldown_until = 0.0
+            if self.latency is None:
+                self.latency = elapsed
+            else:
+                self.latency = EWMA_ALPHA * elapsed + (1 - EWMA_ALPHA) * self.latency
+
+    def record_failure(self, error):
+        with self._lock:
+            self.requests += 1
+            self.errors += 1
+            self.failures += 1
+            cooldown = min(settings.XUSDT_SETTINGS["RPC_COOLDOWN"] * 2 ** (self.failures - 1), MAX_COOLDOWN)
+            self.cooldown_until = time.monotonic() + cooldown
+        logger.warning("RPC endpoint %s failed (%s); cooling down %ss", self.url, error, cooldown)
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "latency_ms": round(self.latency * 1000, 2) if self.latency is not None else None,
+            "healthy": self.available,
+        }
+
+
+class _FailoverMixin:
+    def __init__(self, resolve_urls, **kwargs):
+        super().__init__(**kwargs)
+        self._resolve_urls = resolve_urls
+        self._endpoints = None
+        self._endpoints_lock = threading.Lock()
+
+    @property
+    def endpoint_uri(self):
+        # Identifies the client (e.g. in cache keys) without resolving endpoints
+        return self._resolve_urls.key
+
+    @property
+    def endpoints(self):
+        if self._endpoints is None:
+            self._set_endpoints(self._resolve_urls())
+        return self._endpoints
+
+    def _set_endpoints(self, urls):
+        if not urls:
+            raise ValueError(f"No RPC endpoints configured for {self._resolve_urls.key}")
+        with self._endpoints_lock:
+            if self._endpoints is None:
+                self._endpoints = [Endpoint(url, self._make_provider(url)) for url in urls]
+
+    @staticmethod
+    def _ordered(endpoints):
+        available = sorted((e for e in endpoints if e.available), key=Endpoint.score)
+        # If everything is cooling down, try the least-recently failed first
+        return available or sorted(endpoints, key=lambda e: e.cooldown_until)
+
+
+class FailoverHTTPProvider(_FailoverMixin, JSONBaseProvider):
+    def _make_provider(self, url):
+        if url.startswith(SIM_SCHEME):
+            from apps.escrow.mock_node import SimProvider, get_node
+
+            return SimProvider(get_node(url))
+        return HTTPProvider(
+            url,
+            session=_shared_session(),
+            request_kwargs={"timeout": settings.XUSDT_SETTINGS["RPC_TIMEOUT"]},
+            exception_retry_configuration=None,  # we retry on another endpoint
+        )
+
+    def _call(self, label, send):
+        last_error = None
+        for endpoint in self._ordered(self.endpoints):
+            start = time.perf_counter()
+            try:
+                response = send(endpoint.provider)
+            except (requests.RequestException, OSError) as e:
+                elapsed = time.perf_counter() - start
+                endpoint.record_failure(e)
+                _record_method(label, elapsed, failed=True)
+                last_error = e
+                continue
+            elapsed = time.perf_counter() - start
+            endpoint.record_success(elapsed)
+            _record_method(label, elapsed, failed=False)
+            return response
+        raise last_error
+
+    def make_request(self, method, params):
+        return self._call(method, lambda provider: provider.make_request(method, params))
+
+    def make_batch_request(self, batch_requests):
+        label = f"batch:{batch_requests[0][0]}" if batch_requests else "batch"
+        return self._call(label, lambda provider: provider.make_batch_request(batch_requests))
+
+
+class AsyncFailoverHTTPProvider(_FailoverMixin, AsyncJSONBaseProvider):
+    def _make_provider(self, url):
+        if url.startswith(SIM_SCHEME):
+            from apps.escrow.mock_node import AsyncSimProvider, get_node
+
+            return AsyncSimProvider(get_node(url))
+        # aiohttp sessions are bound to an event loop; web3 pools them per loop
+        return AsyncHTTPProvider(
+            url,
+            request_kwargs={"timeout": aiohttp.ClientTimeout(total=settings.XUSDT_SETTINGS["RPC_TIMEOUT"])},
+            exception_retry_configuration=None,
+        )
+
+    async def _aendpoints(self):
+        if self._endpoints is None:
+            # The URLs come from BridgeNetwork rows, which must not be read on the event loop
+            self._set_endpoints(await sync_to_async(self._resolve_urls)())
+        return self._endpoints
+
+    async def _call(self, label, send):
+        last_error = None
+        for endpoint in self._ordered(await self._aendpoints()):
+            start = time.perf_counter()
+            try:
+                response = await send(endpoint.provider)
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                elapsed = time.perf_counter() - start
+                endpoint.record_failure(e)
+                _record_method(label, elapsed, failed=True)
+                last_error = e
+                continue
+            elapsed = time.perf_counter() - start
+            endpoint.record_success(elapsed)
+            _record_method(label, elapsed, failed=False)
+            return response
+        raise last_error
+
+    async def make_request(self, method, params):
+        return await self._call(method, lambda provider: provider.make_request(method, params))
+
+    async def make_batch_request(self, batch_requests):
+        label = f"batch:{batch_requests[0][0]}" if batch_requests else "batch"
+        return await self._call(label, lambda provider: provider.make_batch_request(batch_requests))
+
+
+# ---------------------------------------------------------------------------
+# Endpoint resolution and client registry
+# ---------------------------------------------------------------------------
+
+class _ChainURLs:
+    """Callable returning the endpoint URLs of a chain, looked up lazily."""
+
+    def __init__(self, chain_id):
+        self.chain_id = chain_id
+        self.key = f"chain:{chain_id}"
+
+    def __call__(self):
+        urls = []
+        if self.chain_id == settings.CHAIN_ID:
+            urls += [settings.WEB3_RPC_URL] + list(settings.WEB3_RPC_FALLBACK_URLS)
+
+        from apps.bridge.models import BridgeNetwork
+        try:
+            urls += list(
+                BridgeNetwork.objects.filter(chain_id=self.chain_id, is_active=True)
+                .values_list("rpc_url", flat=True)
+            )
+        except Exception:
+            logger.exception("Could not load BridgeNetwork endpoints for chain %s", self.chain_id)
+        return list(dict.fromkeys(url for url in urls if url))
+
+
+class _StaticURLs:
+    def __init__(self, urls):
+        self.urls = list(urls)
+        self.key = "urls:" + ",".join(self.urls)
+
+    def __call__(self):
+        return self.urls
+
+
+def _resolver(chain_id, urls):
+    return _StaticURLs(urls) if urls else _ChainURLs(chain_id or settings.CHAIN_ID)
+
+
+def get_web3(chain_id=None, urls=None) -> Web3:
+    """Shared Web3 client for a chain (default CHAIN_ID) or explicit endpoint URLs."""
+    resolver = _resolver(chain_id, urls)
+    key = ("sync", resolver.key)
+    with _lock:
+        if key not in _clients:
+            _clients[key] = Web3(FailoverHTTPProvider(resolver))
+        return _clients[key]
+
+
+def get_async_web3(chain_id=None, urls=None) -> AsyncWeb3:
+    """Shared AsyncWeb3 client; same endpoint resolution as get_web3()."""
+    resolver = _resolver(chain_id, urls)
+    key = ("async", resolver.key)
+    with _lock:
+        if key not in _clients:
+            _clients[key] = AsyncWeb3(AsyncFailoverHTTPProvider(resolver))
+        return _clients[key]
+
+
+@functools.lru_cache(maxsize=None)
+def load_abi(path) -> list:
+    """Parse a contract ABI file once; callers share the result, do not mutate it."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def get_metrics() -> dict:
+    """Per-method and per-endpoint request counters for this process."""
+    with _lock:
+        methods = {
+            method: dict(stats, avg_ms=round(stats["total_ms"] / stats["requests"], 2))
+            for method, stats in _method_stats.items()
+        }
+        clients = list(_clients.items())
+    endpoints = {}
+    for (kind, name), client in clients:
+        provider = client.provider
+        if provider._endpoints:
+            endpoints[f"{kind}:{name}"] = {e.url: e.stats() for e in provider._endpoints}
+    return {"methods": methods, "endpoints": endpoints}
+
+
+def reset():
+    """Drop cached clients and counters (settings changes, tests)."""
+    global _session
+    with _lock:
+        _clients.clear()
+        _method_stats.clear()
+        if _session is not None:
+            _session.close()
+            _session = None
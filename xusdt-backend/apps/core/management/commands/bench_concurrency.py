@@ -0,0 +1,254 @@
+import asyncio
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from decimal import Decimal
+
+import aiohttp
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import setup_databases, teardown_databases
+from eth_account import Account
+
+from apps.core.models import AnonymousUser
+from apps.escrow.models import EscrowWallet, TransactionQueue
+
+PASSWORD = "Bench-Passw0rd!"
+SERVERS = {
+    'gunicorn': "{python} -m gunicorn config.wsgi:application -k sync -w {workers} -b 127.0.0.1:{port}",
+    'uvicorn': "{python} -m uvicorn config.asgi:application --workers {workers} --host 127.0.0.1 --port {port}",
+}
+ENDPOINTS = ('status', 'fund')
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(port, process, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise CommandError(f"Server exited with code {process.returncode}")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f"Nothing listening on port {port} after {timeout:.0f}s")
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrency benchmark for the chain-bound escrow endpoints: serve the app "
+        "with gunicorn (sync workers) and with uvicorn (ASGI) against a mock node "
+        "with fixed RPC latency, fire concurrent requests at each and compare "
+        "throughput and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=200, help="Requests in flight")
+        parser.add_argument('--requests', type=int, default=1000, help="Requests per server and endpoint")
+        parser.add_argument('--latency-ms', type=float, default=100.0, help="Mock node latency per RPC request")
+        parser.add_argument('--workers', type=int, default=1, help="Worker processes per server")
+        parser.add_argument('--servers', default=','.join(SERVERS), help="Comma-separated: gunicorn,uvicorn")
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help="Comma-separated: status,fund")
+
+    def handle(self, *args, **options):
+        servers = [name for name in options['servers'].split(',') if name]
+        endpoints = [name for name in options['endpoints'].split(',') if name]
+        unknown = set(servers) - set(SERVERS) | set(endpoints) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown server or endpoint: {', '.join(sorted(unknown))}")
+
+        workdir = tempfile.mkdtemp(prefix="bench-concurrency-")
+        database = os.path.join(workdir, "bench.sqlite3")
+        node_port = _free_port()
+        node = subprocess.Popen(
+            [sys.executable, "manage.py", "mock_node", "--port", str(node_port), "--block-time", "0",
+             "--chain-id", str(settings.CHAIN_ID), "--latency-ms", str(options['latency_ms'])],
+            cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        node_url = f"http://127.0.0.1:{node_port}"
+        connections['default'].settings_dict['TEST']['NAME'] = database
+        old_config = None
+        results = []
+        try:
+            _wait_for_port(node_port, node)
+            old_config = setup_databases(verbosity=0, interactive=False)
+            paths = self._seed(node_url)
+            connections.close_all()
+
+            env = dict(
+                os.environ,
+                DATABASE_URL=f"sqlite:///{database}",
+                WEB3_RPC_URL=node_url,
+                WEB3_RPC_FALLBACK_URLS="",
+                DJANGO_DEBUG="False",
+                DJANGO_SECURE_SSL_REDIRECT="False",
+                # A single worker can use its own token cache; several need CACHE_URL
+                AUTH_CACHE_ALLOW_LOCAL=str(options['workers'] == 1),
+            )
+            for server in servers:
+                for endpoint in endpoints:
+                    results.append((server, endpoint, self._bench(server, env, paths[endpoint], options)))
+        finally:
+            if old_config is not None:
+                teardown_databases(old_config, verbosity=0)
+            node.terminate()
+            node.wait()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        self._report(results, options)
+
+    # ------------------------------------------------------------------ #
+    # Fixture                                                            #
+    # ------------------------------------------------------------------ #
+
+    def _seed(self, node_url):
+        """A user, an escrow awaiting deposit and a mined release; returns the request per endpoint."""
+        user = AnonymousUser.objects.create_user("BNCHCONC", PASSWORD, username="bench_concurrency")
+        escrow = EscrowWallet.objects.create(
+            address=Account.create().address,
+            user_token=user.user_token,
+            balance_commitment='0' * 64,
+        )
+
+        sender = Account.create()
+        rpc = lambda method, *params: requests.post(  # noqa: E731
+            node_url, json={"jsonrpc": "2.0", "id": 1, "method": method, "params": list(params)}, timeout=10
+        ).json()["result"]
+        rpc("mock_setBalance", sender.address, 10 ** 18)
+        signed = sender.sign_transaction({
+            "to": settings.USDT_ADDR, "value": 0, "gas": 21000, "nonce": 0, "chainId": settings.CHAIN_ID,
+            "maxFeePerGas": 10 ** 11, "maxPriorityFeePerGas": 10 ** 9, "data": "0x",
+        })
+        tx_hash = rpc("eth_sendRawTransaction", "0x" + signed.raw_transaction.hex())
+        rpc("evm_mine", 2)
+
+        released = EscrowWallet.objects.create(
+            address=Account.create().address,
+            user_token=user.user_token,
+            balance_commitment='0' * 64,
+            amount=Decimal('100'),
+            status=EscrowWallet.STATUS_RELEASING,
+        )
+        queued = TransactionQueue.objects.create(
+            tx_type='release',
+            escrow=released,
+            to_address=sender.address,
+            amount=Decimal('99'),
+            fee=Decimal('1'),
+            tx_hash=tx_hash,
+            status=TransactionQueue.PROCESSING,
+        )
+        headers = {"X-Client-Token": user.client_token}
+        return {
+            'status': ("GET", f"/api/escrow/transactions/{queued.pk}/", None, headers),
+            'fund': ("POST", f"/api/escrow/fund/{escrow.pk}/", {"min_amount": "100"}, headers),
+        }
+
+    # ------------------------------------------------------------------ #
+    # Load                                                               #
+    # ------------------------------------------------------------------ #
+
+    def _bench(self, server, env, request, options):
+        port = _free_port()
+        command = SERVERS[server].format(python=sys.executable, workers=options['workers'], port=port)
+        process = subprocess.Popen(
+            command.split(), cwd=settings.BASE_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            _wait_for_port(port, process)
+            base = f"http://127.0.0.1:{port}"
+            asyncio.run(self._load(base, request, 1, 1))  # warm up: imports, chain client, auth cache
+            return asyncio.run(self._load(base, request, options['requests'], options['concurrency']))
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    async def _load(self, base, request, total, concurrency):
+        method, path, data, headers = request
+        latencies, statuses = [], {}
+        queue = asyncio.Queue()
+        for _ in range(total):
+            queue.put_nowait(None)
+
+        async def worker(session):
+            while not queue.empty():
+                queue.get_nowait()
+                started = time.perf_counter()
+                try:
+                    async with session.request(method, base + path, json=data, headers=headers) as response:
+                        await response.read()
+                        code = response.status
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    code = 'error'
+                latencies.append(time.perf_counter() - started)
+                statuses[code] = statuses.get(code, 0) + 1
+
+        timeout = aiohttp.ClientTimeout(total=120)
+        async with aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=concurrency), timeout=timeout
+        ) as session:
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(session) for _ in range(min(concurrency, total))))
+            elapsed = time.perf_counter() - started
+
+        return {
+            'statuses': statuses,
+            'elapsed': elapsed,
+            'rps': total / elapsed,
+            'p50': statistics.median(latencies) * 1000,
+            'p95': _percentile(latencies, 0.95) * 1000,
+            'max': max(latencies) * 1000,
+        }
+
+    def _report(self, results, options):
+        self.stdout.write(
+            f"{options['requests']} requests per run, {options['concurrency']} in flight, "
+            f"{options['workers']} worker(s), mock node latency {options['latency_ms']:.0f} ms"
+        )
+        self.stdout.write(
+            f"{'server':<10}{'endpoint':<10}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}  statuses"
+        )
+        for server, endpoint, result in results:
+            statuses = ', '.join(f"{code}={n}" for code, n in sorted(result['statuses'].items(), key=str))
+            self.stdout.write(
+                f"{server:<10}{endpoint:<10}{result['rps']:>9.1f}{result['p50']:>10.1f}"
+                f"{result['p95']:>10.1f}{result['max']:>10.1f}  {statuses}"
+            )
+
+        by_endpoint = {}
+        for server, endpoint, result in results:
+            by_endpoint.setdefault(endpoint, {})[server] = result
+        for endpoint, runs in by_endpoint.items():
+            if 'gunicorn' in runs and 'uvicorn' in runs:
+                ratio = runs['uvicorn']['rps'] / runs['gunicorn']['rps']
+                self.stdout.write(f"{endpoint}: uvicorn serves {ratio:.1f}x the requests/s of gunicorn sync")
+
+        failed = [
+            f"{server}/{endpoint}" for server, endpoint, result in results
+            if set(result['statuses']) - {200, 202}
+        ]
+        if failed:
+            raise CommandError(f"Non-2xx responses from: {', '.join(failed)}")
+        self.stdout.write(self.style.SUCCESS("All requests answered with 2xx"))
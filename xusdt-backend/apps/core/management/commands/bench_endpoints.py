@@ -0,0 +1,695 @@
+import gc
+import hashlib
+import json
+import logging
+import random
+import statistics
+import time
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from cryptography.fernet import Fernet
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import (
+    CaptureQueriesContext,
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.urls import get_resolver, resolve
+from django.urls.resolvers import URLResolver
+from django.utils import timezone
+from django.views.static import serve
+from rest_framework.test import APIClient
+
+from apps.core import chain
+from apps.core.auth_cache import cache_user
+from apps.core.models import AnonymousUser, SecurityEvent, SecurityQuestion, derive_user_token
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmarks" / "endpoints_baseline.json"
+PASSWORD = "Bench-Passw0rd!"
+SCALE_OPTIONS = ("users", "listings", "trades", "escrows", "quotes")
+
+# `path` and `data` are plain values; `auth` is 'user', 'peer', 'staff' or None
+Scenario = namedtuple("Scenario", "label method path data auth", defaults=(None, "user"))
+
+
+def _p95(samples):
+    return statistics.quantiles(samples, n=20)[18] if len(samples) > 1 else samples[0]
+
+
+def _routes(patterns, prefix=""):
+    """Every routable URL pattern, joined the way ResolverMatch.route is."""
+    for pattern in patterns:
+        route = str(pattern.pattern)
+        if prefix:
+            route = prefix + route.removeprefix("^")
+        if isinstance(pattern, URLResolver):
+            if route != "admin/":
+                yield from _routes(pattern.url_patterns, route)
+        elif pattern.callback is not serve and "format" not in pattern.pattern.regex.groupindex:
+            yield route
+
+
+class Fixture:
+    """Deterministic data set sized by the scale options, plus the handles scenarios need."""
+
+    def __init__(self, scale, seed, rpc_url):
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.rpc_url = rpc_url
+
+    def _hex(self, nbytes):
+        return "0x" + "".join(self.rng.choice("0123456789abcdef") for _ in range(nbytes * 2))
+
+    def _amount(self, low=10, high=5000):
+        return Decimal(self.rng.randint(low * 100, high * 100)) / 100
+
+    def seed(self):
+        self._users()
+        self._escrow_and_p2p()
+        self._wallet()
+        self._swap()
+        self._bridge()
+        return self
+
+    # ------------------------------------------------------------------ #
+    # Users                                                              #
+    # ------------------------------------------------------------------ #
+
+    def _exchange_code(self, n):
+        prefix = settings.XUSDT_SETTINGS["EXCHANGE_CODE_PREFIX"]
+        digits = settings.XUSDT_SETTINGS["EXCHANGE_CODE_LENGTH"] - len(prefix)
+        return f"{prefix}{n:0{digits}d}"
+
+    def _users(self):
+        manager = AnonymousUser.objects
+        self.user = manager.create_user(self._exchange_code(1), PASSWORD, username="bench_user")
+        self.peer = manager.create_user(self._exchange_code(2), PASSWORD, username="bench_peer")
+        self.staff = manager.create_user(self._exchange_code(3), PASSWORD, username="bench_staff", is_staff=True)
+
+        # Hashing is the slow part of create_user; the others share the first hash
+        others = []
+        for n in range(4, self.scale["users"] + 4):
+            other = AnonymousUser(
+                exchange_code=self._exchange_code(n),
+                username=f"bench_{n}",
+                password=self.user.password,
+                password_hash=self.user.password_hash,
+                session_salt=hashlib.sha256(f"bench-{n}".encode()).hexdigest()[:32],
+            )
+            other.client_token = hashlib.sha3_256(f"{other.session_salt}{other.password_hash}".encode()).hexdigest()
+            other.user_token = derive_user_token(other.client_token)
+            others.append(other)
+        AnonymousUser.objects.bulk_create(others)
+        self.tokens = [self.user.user_token, self.peer.user_token] + [o.user_token for o in others]
+
+        self.question = SecurityQuestion.objects.create(user=self.user)
+        self.question.set_question_answer("First pet?", "rex")
+        for event_type in (1, 2, 4):
+            SecurityEvent.log_event(
+                event_type=event_type,
+                actor_token=self.user.client_token,
+                ip_address="127.0.0.1",
+                details={"action": "bench"},
+            )
+
+    def principals(self):
+        return {"user": self.user, "peer": self.peer, "staff": self.staff}
+
+    # ------------------------------------------------------------------ #
+    # Escrow, listings, trades, disputes                                 #
+    # ------------------------------------------------------------------ #
+
+    def _escrow(self, owner, status, **fields):
+        from apps.escrow.models import EscrowWallet
+
+        return EscrowWallet(
+            address=self._hex(20),
+            user_token=owner,
+            balance_commitment=self._hex(32)[2:],
+            status=status,
+            amount=fields.pop("amount", self._amount()),
+            **fields,
+        )
+
+    def _listing(self, seller, status, escrow=None, **fields):
+        from apps.p2p.models import P2PListing
+
+        amount = fields.pop("amount", self._amount())
+        return P2PListing(
+            seller_token=seller,
+            crypto_type=self.rng.choice(["buy", "sell"]),
+            fiat_currency=self.rng.choice(["USD", "EUR", "AED"]),
+            payment_method=self.rng.choice([1, 2, 3]),
+            usdt_amount=amount,
+            crypto_amount=amount,
+            price=Decimal("1.00") + Decimal(self.rng.randint(-300, 300)) / 10000,
+            escrow_wallet=escrow,
+            status=status,
+            expires_at=timezone.now() + timedelta(hours=self.rng.randint(1, 72)),
+            **fields,
+        )
+
+    def _trade(self, listing, buyer, status):
+        from apps.p2p.models import P2PTrade
+
+        trade = P2PTrade(
+            listing=listing,
+            buyer_token=buyer,
+            seller_token=listing.seller_token,
+            escrow_tx_hash=self._hex(32),
+            usdt_amount=listing.usdt_amount,
+            status=status,
+        )
+        trade.calculate_fee()
+        return trade
+
+    def _escrow_and_p2p(self):
+        from apps.disputes.models import TradeDispute
+        from apps.escrow.models import EscrowWallet, SystemWallet, TransactionQueue
+        from apps.p2p.models import P2PListing, P2PTrade, StatusTransition
+
+        user, peer = self.user.user_token, self.peer.user_token
+        created, funded = EscrowWallet.STATUS_CREATED, EscrowWallet.STATUS_FUNDED
+
+        self.escrow_created = self._escrow(user, created)
+        self.escrow_funded = self._escrow(user, funded, buyer_address=self._hex(20))
+        self.escrow_for_sale = self._escrow(peer, funded)
+        self.escrow_for_release = self._escrow(user, funded)
+        escrows = [self.escrow_created, self.escrow_funded, self.escrow_for_sale, self.escrow_for_release]
+        escrows += [
+            self._escrow(self.rng.choice(self.tokens), self.rng.choice([created, funded]))
+            for _ in range(self.scale["escrows"])
+        ]
+        EscrowWallet.objects.bulk_create(escrows)
+        SystemWallet.objects.create(address=self._hex(20), private_key_enc="")
+
+        self.listing_open = self._listing(user, 1, self.escrow_created)
+        self.listing_for_sale = self._listing(peer, 2, self.escrow_for_sale)
+        listing_paid = self._listing(user, 3, self.escrow_for_release)
+        listing_funded = self._listing(peer, 3)
+        listings = [self.listing_open, self.listing_for_sale, listing_paid, listing_funded]
+        listings += [
+            self._listing(self.rng.choice(self.tokens), self.rng.choice([1, 1, 2, 3, 4]))
+            for _ in range(self.scale["listings"])
+        ]
+        P2PListing.objects.bulk_create(listings)
+
+        # Trades over the generic listings; the user is on one side of about a third of them
+        self.trade_funded = self._trade(listing_funded, user, 1)
+        self.trade_paid = self._trade(listing_paid, peer, 2)
+        self.trade_disputed = self._trade(self._listing(peer, 3), user, 4)
+        P2PListing.objects.bulk_create([self.trade_disputed.listing])
+        trades = [self.trade_funded, self.trade_paid, self.trade_disputed]
+        pool = listings[4:]
+        for n in range(self.scale["trades"]):
+            listing = pool[n % len(pool)] if pool else listing_funded
+            buyer = user if n % 3 == 0 and listing.seller_token != user else self.rng.choice(self.tokens)
+            trades.append(self._trade(listing, buyer, self.rng.choice([1, 2, 3, 3, 5])))
+        P2PTrade.objects.bulk_create(trades)
+
+        self.dispute = TradeDispute.objects.create(
+            trade=self.trade_disputed, initiator_token=user, evidence_hashes='["0xabc"]'
+        )
+        self.queued = TransactionQueue.objects.create(
+            tx_type="release",
+            escrow=self.escrow_funded,
+            to_address=self.escrow_funded.buyer_address,
+            amount=self.escrow_funded.amount,
+        )
+        now = timezone.now()
+        StatusTransition.objects.bulk_create([
+            StatusTransition(
+                entity=entity, object_id=pk, transition=name,
+                from_status=src, to_status=dst, actor=user, created_at=now,
+            )
+            for entity, pk, name, src, dst in [
+                (StatusTransition.ENTITY_ESCROW, self.escrow_for_release.pk, "fund", created, funded),
+                (StatusTransition.ENTITY_LISTING, listing_funded.pk, "fund", "1", "2"),
+                (StatusTransition.ENTITY_LISTING, listing_funded.pk, "reserve", "2", "3"),
+            ]
+        ])
+
+    # ------------------------------------------------------------------ #
+    # Custodial wallet                                                   #
+    # ------------------------------------------------------------------ #
+
+    def _wallet(self):
+        from apps.wallet.models import Currency, DepositAddress, ExchangeRate, Transaction, Wallet, WithdrawalLimit
+
+        self.currencies = {
+            code: Currency.objects.create(code=code, name=code, type=kind, min_withdrawal=Decimal("10"))
+            for code, kind in [("USD", "fiat"), ("USDT", "crypto"), ("BTC", "crypto"), ("ETH", "crypto")]
+        }
+        usd = self.currencies["USD"]
+        for code, rate in [("USDT", "1"), ("BTC", "65000"), ("ETH", "3200")]:
+            ExchangeRate.objects.create(base_currency=self.currencies[code], quote_currency=usd, rate=Decimal(rate))
+        ExchangeRate.objects.create(
+            base_currency=self.currencies["BTC"], quote_currency=self.currencies["USDT"], rate=Decimal("65000")
+        )
+
+        wallets = {
+            code: Wallet.objects.create(user=self.user, currency=currency, balance=self._amount())
+            for code, currency in self.currencies.items()
+        }
+        self.wallet = wallets["USDT"]
+        Transaction.objects.bulk_create([
+            Transaction(
+                user=self.user,
+                wallet=wallet,
+                currency=wallet.currency,
+                amount=self._amount(1, 100),
+                type=self.rng.choice(["deposit", "withdrawal"]),
+                status=self.rng.choice(["pending", "completed"]),
+            )
+            for wallet in self.rng.choices(list(wallets.values()), k=max(self.scale["trades"] // 10, 1))
+        ])
+        self.transaction = Transaction.objects.create(
+            user=self.user, wallet=self.wallet, currency=self.wallet.currency,
+            amount=Decimal("5"), type="deposit", status="pending",
+        )
+        self.deposit_address = DepositAddress.objects.create(
+            user=self.user, currency=self.wallet.currency, address=self._hex(20)
+        )
+        self.withdrawal_limit = WithdrawalLimit.objects.create(
+            user=self.user, currency=self.wallet.currency, limit_24h=Decimal("10000")
+        )
+
+    # ------------------------------------------------------------------ #
+    # Swap and bridge                                                    #
+    # ------------------------------------------------------------------ #
+
+    def _swap(self):
+        from apps.swap.models import (
+            MarketStats, SwapAllowance, SwapPrice, SwapQuote, SwapRoute, SwapToken, SwapTransaction,
+        )
+
+        tokens = [
+            SwapToken.objects.create(symbol=symbol, name=symbol, network="Ethereum", contract_address=self._hex(20))
+            for symbol in ("USDT", "ETH", "BTC")
+        ]
+        self.swap_tokens = tokens
+        for token_in in tokens:
+            for token_out in tokens:
+                if token_in != token_out:
+                    SwapRoute.objects.create(
+                        token_in=token_in, token_out=token_out,
+                        min_amount_in=Decimal("1"), max_amount_in=Decimal("1000000"),
+                    )
+            SwapPrice.objects.create(token=token_in, price_usd=self._amount())
+        MarketStats.objects.create(
+            token_pair="ETH_USDT", volume_24h=self._amount(), high_24h=Decimal("3300"),
+            low_24h=Decimal("3100"), change_24h=Decimal("1.5"),
+        )
+        SwapAllowance.objects.create(
+            user_token=self.user.client_token, token=tokens[0], contract_address=self._hex(20),
+            allowance_amount=Decimal("100"),
+        )
+
+        valid_until = timezone.now() + timedelta(days=1)
+        quotes = []
+        for _ in range(self.scale["quotes"]):
+            token_in, token_out = self.rng.sample(tokens, 2)
+            amount = self._amount()
+            quotes.append(SwapQuote(
+                token_in=token_in, token_out=token_out, amount_in=amount, amount_out=amount,
+                rate=Decimal("1"), fee_amount=amount * Decimal("0.003"), valid_until=valid_until,
+            ))
+        SwapQuote.objects.bulk_create(quotes)
+        self.swap_quote = quotes[0]
+        swaps = SwapTransaction.objects.bulk_create([
+            SwapTransaction(
+                user_token=self.user.client_token, quote=quote, status="completed",
+                from_address=self._hex(20), to_address=self._hex(20),
+            )
+            for quote in quotes[: max(len(quotes) // 4, 1)]
+        ])
+        self.swap = swaps[0]
+
+    def _bridge(self):
+        from apps.bridge.models import (
+            BridgeFee, BridgeNetwork, BridgeQuote, BridgeStats, BridgeToken, BridgeTokenNetwork, BridgeTransaction,
+        )
+
+        # Every network points at the local stub, so nothing can reach a real node
+        networks = [
+            BridgeNetwork.objects.create(
+                name=name, chain_id=chain_id, native_token_symbol=symbol,
+                rpc_url=self.rpc_url, explorer_url=f"https://{name.lower()}.example",
+            )
+            for name, chain_id, symbol in [("Ethereum", 9001, "ETH"), ("BSC", 9056, "BNB"), ("Polygon", 9137, "MATIC")]
+        ]
+        self.networks = networks
+        self.bridge_token = BridgeToken.objects.create(symbol="USDT", name="Tether", contract_address=self._hex(20))
+        for network in networks:
+            BridgeTokenNetwork.objects.create(token=self.bridge_token, network=network, contract_address=self._hex(20))
+        for source in networks:
+            for target in networks:
+                if source != target:
+                    BridgeFee.objects.create(
+                        from_network=source, to_network=target, token=self.bridge_token,
+                        fee_percentage=Decimal("0.10"), min_fee=Decimal("1"), max_fee=Decimal("50"),
+                    )
+                    BridgeStats.objects.create(
+                        network_pair=f"{source.name}-{target.name}", total_volume=self._amount(),
+                        total_transactions=self.rng.randint(1, 1000), avg_completion_time=30,
+                    )
+
+        valid_until = timezone.now() + timedelta(days=1)
+        quotes = []
+        for _ in range(self.scale["quotes"]):
+            source, target = self.rng.sample(networks, 2)
+            amount = self._amount()
+            quotes.append(BridgeQuote(
+                token=self.bridge_token, amount=amount, from_network=source, to_network=target,
+                fee_amount=amount / 1000, estimated_time=30, valid_until=valid_until,
+            ))
+        BridgeQuote.objects.bulk_create(quotes)
+        self.bridge_quote = quotes[0]
+        bridges = BridgeTransaction.objects.bulk_create([
+            BridgeTransaction(
+                user_token=self.user.client_token, quote=quote, status="completed",
+                from_address=self._hex(20), to_address=self._hex(20),
+            )
+            for quote in quotes[: max(len(quotes) // 4, 1)]
+        ])
+        self.bridge = bridges[0]
+
+
+def scenarios(fx):
+    """One or more requests per route in config/urls.py, against the seeded fixture."""
+    address = "0x" + "ab" * 20
+    avatar = SimpleUploadedFile("avatar.png", b"\x89PNG\r\n\x1a\n" + b"\0" * 512, content_type="image/png")
+    return [
+        # core
+        Scenario("auth.register", "post", "/api/auth/register/", {"password": PASSWORD}, None),
+        Scenario("auth.login", "post", "/api/auth/login/",
+                 {"exchange_code": fx.user.exchange_code, "password": PASSWORD}, None),
+        Scenario("auth.me", "get", "/api/auth/me/"),
+        Scenario("auth.update_profile", "patch", "/api/auth/update-profile/", {"bio": "benchmark"}),
+        Scenario("auth.profile", "get", "/api/auth/profile/"),
+        Scenario("auth.profile.update", "patch", "/api/auth/profile/", {"location": "Dubai"}),
+        Scenario("auth.change_password", "post", "/api/auth/change-password/", {
+            "current_password": PASSWORD, "new_password": "N3w-" + PASSWORD, "confirm_password": "N3w-" + PASSWORD,
+        }),
+        Scenario("auth.avatar", "post", "/api/auth/profile/avatar/", {"avatar": avatar}),
+        Scenario("auth.security_events", "get", "/api/auth/security-events/"),
+        Scenario("auth.security_questions", "get", "/api/auth/security-questions/"),
+        Scenario("auth.setup_security_question", "post", "/api/auth/setup-security-question/",
+                 {"question": "City of birth?", "answer": "Kabul"}),
+        Scenario("auth.verify_security_question", "post", "/api/auth/verify-security-question/",
+                 {"question_id": fx.question.pk, "answer": "rex"}, None),
+        Scenario("auth.recovery.initiate", "post", "/api/auth/recovery/initiate/",
+                 {"exchange_code": fx.user.exchange_code}, None),
+        Scenario("auth.recovery.questions", "get", f"/api/auth/recovery/questions/{fx.user.exchange_code}/", None, None),
+        Scenario("auth.recovery.verify", "post", "/api/auth/recovery/verify/",
+                 {"question_id": fx.question.pk, "answer": "wrong"}, None),
+        Scenario("auth.recovery.complete", "post", "/api/auth/recovery/complete/",
+                 {"exchange_code": fx.user.exchange_code, "new_password": "N3w-" + PASSWORD}, None),
+        # escrow
+        Scenario("escrow.wallet.create", "post", "/api/escrow/wallets/", {"balance_commitment": "0" * 64}),
+        Scenario("escrow.wallet.detail", "get", f"/api/escrow/wallets/{fx.escrow_funded.pk}/"),
+        Scenario("escrow.system_wallets", "get", "/api/escrow/system-wallets/", None, "staff"),
+        Scenario("escrow.wallet.list", "get", "/api/escrow/wallets/list/"),
+        Scenario("escrow.fund", "post", f"/api/escrow/fund/{fx.escrow_created.pk}/", {"min_amount": "100"}),
+        Scenario("escrow.release", "post", f"/api/escrow/release/{fx.escrow_funded.pk}/"),
+        Scenario("escrow.dispute", "post", f"/api/escrow/dispute/{fx.escrow_funded.pk}/"),
+        Scenario("escrow.update", "patch", f"/api/escrow/update/{fx.escrow_created.pk}/", {"buyer_address": address}),
+        Scenario("escrow.status", "get", f"/api/escrow/status/{fx.listing_open.pk}/"),
+        Scenario("escrow.by_listing", "get", f"/api/escrow/wallets/by-listing/{fx.listing_open.pk}/"),
+        Scenario("escrow.listing.fund", "post", f"/api/escrow/listings/{fx.listing_open.pk}/fund/",
+                 {"merchant_wallet": address}),
+        Scenario("escrow.trade.release", "post", f"/api/escrow/trades/{fx.trade_paid.pk}/release/",
+                 {"buyer_wallet": address}),
+        Scenario("escrow.transaction", "get", f"/api/escrow/transactions/{fx.queued.pk}/"),
+        # p2p
+        Scenario("p2p.listings", "get", "/api/p2p/listings/"),
+        Scenario("p2p.listings.create", "post", "/api/p2p/listings/", {
+            "crypto_type": "sell", "crypto_currency": "USDT", "crypto_amount": "100", "fiat_currency": "USD",
+            "usdt_amount": "100", "payment_method": 1,
+        }),
+        Scenario("p2p.listing.detail", "get", f"/api/p2p/listings/{fx.listing_open.pk}/"),
+        Scenario("p2p.trade.create", "post", "/api/p2p/trades/",
+                 {"listing": str(fx.listing_for_sale.pk), "escrow_tx_hash": "0x" + "cd" * 32}),
+        Scenario("p2p.trade.detail", "get", f"/api/p2p/trades/{fx.trade_funded.pk}/"),
+        Scenario("p2p.trade.mark_paid", "post", f"/api/p2p/trades/{fx.trade_funded.pk}/mark-paid/"),
+        Scenario("p2p.trade.timeline", "get", f"/api/p2p/trades/{fx.trade_funded.pk}/timeline/"),
+        Scenario("p2p.my_trades", "get", "/api/p2p/my-trades/"),
+        Scenario("p2p.market_stats", "get", "/api/p2p/market-stats/", None, None),
+        Scenario("p2p.orderbook", "get", "/api/p2p/orderbook/?fiat_currency=USD", None, None),
+        Scenario("p2p.specific_user", "get", "/api/p2p/specific-user/"),
+        # disputes
+        Scenario("disputes.list", "get", "/api/disputes/"),
+        Scenario("disputes.create", "post", "/api/disputes/create/", {"trade": str(fx.trade_funded.pk)}),
+        Scenario("disputes.detail", "get", f"/api/disputes/{fx.dispute.pk}/"),
+        # wallet
+        Scenario("wallet.root", "get", "/api/"),
+        Scenario("wallet.currencies", "get", "/api/currencies/"),
+        Scenario("wallet.currency", "get", f"/api/currencies/{fx.wallet.currency_id}/"),
+        Scenario("wallet.wallets", "get", "/api/wallets/"),
+        Scenario("wallet.wallet", "get", f"/api/wallets/{fx.wallet.pk}/"),
+        Scenario("wallet.wallets.balances", "get", "/api/wallets/balances/"),
+        Scenario("wallet.balances", "get", "/api/wallet/balances/"),
+        Scenario("wallet.transactions", "get", "/api/transactions/"),
+        Scenario("wallet.transactions.create", "post", "/api/transactions/",
+                 {"currency": fx.wallet.currency_id, "amount": "1", "type": "withdrawal", "address": address}),
+        Scenario("wallet.transaction", "get", f"/api/transactions/{fx.transaction.pk}/"),
+        Scenario("wallet.transaction.cancel", "post", f"/api/transactions/{fx.transaction.pk}/cancel/"),
+        Scenario("wallet.deposit_addresses", "get", "/api/deposit-addresses/"),
+        Scenario("wallet.deposit_addresses.create", "post", "/api/deposit-addresses/",
+                 {"currency": fx.wallet.currency_id}),
+        Scenario("wallet.deposit_address", "get", f"/api/deposit-addresses/{fx.deposit_address.pk}/"),
+        Scenario("wallet.withdrawal_limits", "get", "/api/withdrawal-limits/"),
+        Scenario("wallet.withdrawal_limit", "get", f"/api/withdrawal-limits/{fx.withdrawal_limit.pk}/"),
+        Scenario("wallet.exchange_rates", "get", "/api/exchange-rates/"),
+        Scenario("wallet.exchange_rate", "get", f"/api/exchange-rates/{fx.withdrawal_limit.currency_id}/"),
+        Scenario("wallet.exchange_rates.ticker", "get", "/api/exchange-rates/ticker/?base=BTC&quote=USDT"),
+        Scenario("wallet.portfolio", "get", "/api/portfolio/summary/"),
+        # swap
+        Scenario("swap.tokens", "get", "/swap/tokens/"),
+        Scenario("swap.routes", "get", "/swap/routes/?token_in=USDT&token_out=ETH"),
+        Scenario("swap.quote", "post", "/swap/quote/", {"token_in": "USDT", "token_out": "ETH", "amount_in": "250"}),
+        Scenario("swap.execute", "post", "/swap/execute/",
+                 {"quote_id": str(fx.swap_quote.pk), "from_address": address, "to_address": address}),
+        Scenario("swap.status", "get", f"/swap/status/{fx.swap.pk}/"),
+        Scenario("swap.history", "get", "/swap/history/"),
+        Scenario("swap.prices", "get", "/swap/prices/"),
+        Scenario("swap.market_stats", "get", "/swap/market-stats/"),
+        Scenario("swap.allowance", "get", "/swap/allowance/"),
+        Scenario("swap.allowance.update", "post", "/swap/allowance/",
+                 {"token": "USDT", "contract_address": address, "amount": "500"}),
+        # bridge
+        Scenario("bridge.networks", "get", "/bridge/networks/"),
+        Scenario("bridge.tokens", "get", f"/bridge/tokens/?network_id={fx.networks[0].pk}"),
+        # The route takes a UUID while BridgeToken ids are integers
+        Scenario("bridge.token_networks", "get", f"/bridge/tokens/{uuid.UUID(int=fx.bridge_token.pk)}/networks/"),
+        Scenario("bridge.quote", "post", "/bridge/quote/", {
+            "token": fx.bridge_token.pk, "amount": "250",
+            "from_network": fx.networks[0].pk, "to_network": fx.networks[1].pk,
+        }),
+        Scenario("bridge.initiate", "post", "/bridge/initiate/",
+                 {"quote_id": str(fx.bridge_quote.pk), "from_address": address, "to_address": address}),
+        Scenario("bridge.status", "get", f"/bridge/status/{fx.bridge.pk}/"),
+        Scenario("bridge.history", "get", "/bridge/history/"),
+        Scenario("bridge.estimate_time", "get",
+                 f"/bridge/estimate-time/?from_network={fx.networks[0].pk}&to_network={fx.networks[1].pk}"),
+        Scenario("bridge.fees", "get", "/bridge/fees/"),
+        Scenario("bridge.stats", "get", "/bridge/stats/"),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive every API route against a seeded test database, with the chain "
+        "served by a local stub, and record query count, p50/p95 latency and "
+        "response size per endpoint. Fails on regressions against the baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help="Users besides the three benchmark principals")
+        parser.add_argument('--listings', type=int, default=500, help="Listings")
+        parser.add_argument('--trades', type=int, default=500, help="Trades")
+        parser.add_argument('--escrows', type=int, default=200, help="Escrow wallets")
+        parser.add_argument('--quotes', type=int, default=200, help="Swap and bridge quotes (each)")
+        parser.add_argument('--seed', type=int, default=20, help="Random seed for the fixture")
+        parser.add_argument('--runs', type=int, default=20, help="Measured requests per endpoint")
+        parser.add_argument('--only', help="Only run endpoints whose label starts with this prefix")
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help="Baseline JSON to compare against")
+        parser.add_argument('--tolerance', type=float, default=0.5, help="Allowed p50 slowdown over the baseline")
+        parser.add_argument('--slack-ms', type=float, default=5.0, help="Absolute latency slack, for very fast endpoints")
+        parser.add_argument('--save', action='store_true', help="Write the results as the new baseline")
+
+    def handle(self, *args, **options):
+        if options['runs'] < 2:
+            raise CommandError("--runs must be at least 2")
+        scale = {name: options[name] for name in SCALE_OPTIONS}
+
+        from apps.escrow import key_pool
+        from apps.escrow.mock_node import MockNode
+
+        node = MockNode(settings.USDT_ADDR, chain_id=settings.CHAIN_ID)
+        server, url = node.serve_in_thread()
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        logging.disable(logging.CRITICAL)  # 4xx/5xx responses would otherwise log tracebacks
+        try:
+            # One process: the locmem token and stats caches behave like the shared ones in production
+            xusdt = dict(settings.XUSDT_SETTINGS, AUTH_CACHE_ALLOW_LOCAL=True, MARKET_STATS_ALLOW_LOCAL=True)
+            # Pooled escrow keys are stored encrypted
+            escrow_key = settings.ESCROW_WALLET_ENCRYPTION_KEY or Fernet.generate_key().decode()
+            with override_settings(
+                WEB3_RPC_URL=url, WEB3_RPC_FALLBACK_URLS=[], XUSDT_SETTINGS=xusdt,
+                ESCROW_WALLET_ENCRYPTION_KEY=escrow_key,
+            ):
+                chain.reset()
+                fixture = Fixture(scale, options['seed'], url).seed()
+                # Listings claim pooled keys as in production instead of generating them inline
+                key_pool.fill(size=10)
+                for escrow in (fixture.escrow_funded, fixture.escrow_for_sale, fixture.escrow_for_release):
+                    node.set_token_balance(escrow.address, int(escrow.amount * 10**6))
+                results = self._run(fixture, options)
+        finally:
+            logging.disable(logging.NOTSET)
+            chain.reset()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            server.shutdown()
+
+        self._report(results, node)
+        self._compare(results, scale, options)
+
+    def _run(self, fx, options):
+        plan = scenarios(fx)
+        self._check_coverage(plan)
+        if options['only']:
+            plan = [s for s in plan if s.label.startswith(options['only'])]
+
+        client = APIClient(raise_request_exception=False)
+        principals = fx.principals()
+        results = {}
+        for scenario in plan:
+            headers = {}
+            if scenario.auth:
+                headers['HTTP_X_CLIENT_TOKEN'] = principals[scenario.auth].client_token
+            gc.collect()
+            timings, counts = [], []
+            for run in range(options['runs'] + 1):  # the first request warms caches
+                response, queries, elapsed = self._request(client, scenario, headers, principals)
+                if run:
+                    timings.append(elapsed)
+                    counts.append(queries)
+            results[scenario.label] = {
+                'method': scenario.method.upper(),
+                'status': response.status_code,
+                # A cache expiring mid-run costs one rebuild; report the usual count
+                'queries': statistics.median_low(counts),
+                'p50_ms': round(statistics.median(timings), 2),
+                'p95_ms': round(_p95(timings), 2),
+                'bytes': len(response.content),
+            }
+        return results
+
+    def _request(self, client, scenario, headers, principals):
+        # Steady state: authentication served from cache, no throttle history
+        for user in principals.values():
+            cache_user(user)
+        idents = ["127.0.0.1"] + [user.pk for user in principals.values()]
+        cache.delete_many([
+            f"throttle_{scope}_{ident}"
+            for scope in settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']
+            for ident in idents
+        ])
+        data = scenario.data
+        if data and 'avatar' in data:
+            data['avatar'].seek(0)
+        send = getattr(client, scenario.method)
+        kwargs = {} if scenario.method == 'get' else {'format': 'multipart' if data and 'avatar' in data else 'json'}
+
+        # The query log is capped; a full log would make every capture look empty
+        connection.queries_log.clear()
+        gc.disable()
+        try:
+            # Every request is rolled back, so each run sees the same rows
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = send(scenario.path, data, **kwargs, **headers)
+                    elapsed = (time.perf_counter() - started) * 1000
+                transaction.set_rollback(True)
+        finally:
+            gc.enable()
+        return response, len(queries), elapsed
+
+    def _check_coverage(self, plan):
+        covered = {resolve(s.path.split('?')[0]).route for s in plan}
+        missing = []
+        for route in sorted(set(_routes(get_resolver().url_patterns)) - covered):
+            # A literal route matched earlier by another pattern can never be reached
+            if not any(c in route for c in '<(^$') and resolve('/' + route).route != route:
+                self.stdout.write(f"Skipping /{route}: shadowed by /{resolve('/' + route).route}")
+                continue
+            missing.append(route)
+        if missing:
+            raise CommandError("Routes without a benchmark scenario:\n  " + "\n  ".join(missing))
+
+    def _report(self, results, node):
+        self.stdout.write(f"{'endpoint':<36} {'method':<6} {'status':>6} {'queries':>7} {'p50 ms':>8} {'p95 ms':>8} {'bytes':>8}")
+        for label, row in results.items():
+            self.stdout.write(
+                f"{label:<36} {row['method']:<6} {row['status']:>6} {row['queries']:>7} "
+                f"{row['p50_ms']:>8.2f} {row['p95_ms']:>8.2f} {row['bytes']:>8}"
+            )
+        self.stdout.write(f"Chain stub: {node.http_requests} JSON-RPC requests")
+
+    def _compare(self, results, scale, options):
+        baseline_path = Path(options['baseline'])
+        if options['save']:
+            if options['only']:
+                raise CommandError("--save records every endpoint; drop --only")
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline = {'scale': scale, 'runs': options['runs'], 'endpoints': results}
+            baseline_path.write_text(json.dumps(baseline, indent=2) + "\n")
+            self.stdout.write(f"Baseline written to {baseline_path}")
+            return
+
+        if not baseline_path.exists():
+            return
+        baseline = json.loads(baseline_path.read_text())
+        if baseline['scale'] != scale:
+            raise CommandError(
+                f"Baseline was recorded at {baseline['scale']}; rerun at that scale or --save a new baseline"
+            )
+        regressions = []
+        for label, row in results.items():
+            base = baseline['endpoints'].get(label)
+            if base is None:
+                self.stdout.write(f"  {label}: not in the baseline")
+                continue
+            if row['status'] != base['status']:
+                regressions.append(f"{label}: HTTP {row['status']} vs baseline {base['status']}")
+            if row['queries'] > base['queries']:
+                regressions.append(f"{label}: {row['queries']} queries vs baseline {base['queries']}")
+            if row['p50_ms'] > base['p50_ms'] * (1 + options['tolerance']) + options['slack_ms']:
+                regressions.append(f"{label}: p50 {row['p50_ms']} ms vs baseline {base['p50_ms']} ms")
+            elif row['p95_ms'] > base['p95_ms'] * (1 + options['tolerance']) + options['slack_ms']:
+                # One slow sample moves the p95 of a few dozen runs, so the tail only warns
+                self.stdout.write(self.style.WARNING(
+                    f"  {label}: p95 {row['p95_ms']} ms vs baseline {base['p95_ms']} ms"
+                ))
+            if row['bytes'] > base['bytes'] * 1.1:
+                regressions.append(f"{label}: {row['bytes']} bytes vs baseline {base['bytes']}")
+        if regressions:
+            raise CommandError("Endpoint regression:\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(results)} endpoints within the query and {options['tolerance']:.0%} latency budget of {baseline_path}"
+        ))
@@ -0,0 +1,108 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_BASELINE = Path(settings.BASE_DIR) / "benchmarks" / "startup_baseline.json"
+SETUP_MARKER = "--bench-startup-setup-done--"
+
+# Runs in a fresh interpreter per sample, under `python -X importtime`
+CHILD = f"""
+import json, sys, time
+t0 = time.perf_counter()
+import django
+django.setup()
+t1 = time.perf_counter()
+sys.stderr.write({SETUP_MARKER!r} + "\\n")
+sys.stderr.flush()
+from django.test import Client
+response = Client().get(sys.argv[1], HTTP_HOST="localhost")
+t2 = time.perf_counter()
+print(json.dumps({{"setup_ms": (t1 - t0) * 1000, "first_request_ms": (t2 - t0) * 1000, "status": response.status_code}}))
+"""
+
+IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+METRICS = ("setup_import_ms", "setup_ms", "first_request_ms", "wall_ms")
+
+
+def _parse_importtime(stderr):
+    """Top-level cumulative import time (ms) before and after django.setup()."""
+    phase, totals, modules = "setup", {"setup": 0.0, "request": 0.0}, []
+    for line in stderr.splitlines():
+        if line == SETUP_MARKER:
+            phase = "request"
+            continue
+        match = IMPORT_LINE.match(line)
+        if not match or match.group(3) != " ":
+            continue
+        cumulative = int(match.group(2)) / 1000
+        totals[phase] += cumulative
+        modules.append((cumulative, match.group(4), phase))
+    return totals, modules
+
+
+class Command(BaseCommand):
+    help = "Measure import time and time-to-first-request of a fresh Django process."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help="Fresh processes to sample (median is reported)")
+        parser.add_argument('--url', default='/api/p2p/market-stats/', help="Path of the first request")
+        parser.add_argument('--top', type=int, default=10, help="Slowest top-level imports to list")
+        parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help="Baseline JSON to compare against")
+        parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown over the baseline")
+        parser.add_argument('--save', action='store_true', help="Write the results as the new baseline")
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get("DJANGO_SETTINGS_MODULE", "config.settings"))
+        samples = {metric: [] for metric in METRICS}
+        modules = []
+        for _ in range(options['runs']):
+            start = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, "-X", "importtime", "-c", CHILD, options['url']],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+            )
+            wall = (time.perf_counter() - start) * 1000
+            if proc.returncode != 0:
+                raise CommandError(f"Child process failed:\n{proc.stderr[-2000:]}")
+
+            result = json.loads(proc.stdout.strip().splitlines()[-1])
+            totals, modules = _parse_importtime(proc.stderr)
+            samples["setup_import_ms"].append(totals["setup"])
+            samples["setup_ms"].append(result["setup_ms"])
+            samples["first_request_ms"].append(result["first_request_ms"])
+            samples["wall_ms"].append(wall)
+
+        results = {metric: round(statistics.median(values), 1) for metric, values in samples.items()}
+        self.stdout.write(f"Median of {options['runs']} runs (first request: GET {options['url']}, HTTP {result['status']})")
+        for metric in METRICS:
+            self.stdout.write(f"  {metric:<18} {results[metric]:>9.1f}")
+        self.stdout.write(f"Slowest top-level imports (last run):")
+        for cumulative, name, phase in sorted(modules, reverse=True)[:options['top']]:
+            self.stdout.write(f"  {cumulative:>9.1f} ms  {name}  ({phase})")
+
+        baseline_path = Path(options['baseline'])
+        if options['save']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(results, indent=2) + "\n")
+            self.stdout.write(f"Baseline written to {baseline_path}")
+            return
+
+        if not baseline_path.exists():
+            return
+        baseline = json.loads(baseline_path.read_text())
+        regressions = [
+            f"{metric}: {results[metric]} ms vs baseline {baseline[metric]} ms"
+            for metric in METRICS
+            if metric in baseline and results[metric] > baseline[metric] * (1 + options['tolerance'])
+        ]
+        if regressions:
+            raise CommandError("Startup regression:\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"Within {options['tolerance']:.0%} of {baseline_path}"))
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-17 00:01
+
+import hashlib
+import hmac
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_user_tokens(apps, schema_editor):
+    AnonymousUser = apps.get_model('core', 'AnonymousUser')
+    hmac_key = settings.XUSDT_SETTINGS['USER_TOKEN_HMAC_KEY'].encode()
+
+    users = list(AnonymousUser.objects.only('id', 'client_token'))
+    for user in users:
+        user.user_token = hmac.new(hmac_key, user.client_token.encode(), hashlib.sha256).hexdigest()
+    AnonymousUser.objects.bulk_update(users, ['user_token'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_securityevent_anonymous_user'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='anonymoususer',
+            name='user_token',
+            field=models.CharField(editable=False, help_text='HMAC-SHA256(client_token), kept in sync with the salt', max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(populate_user_tokens, migrations.RunPython.noop),
+    ]
@@ -13,12 +13,45 @@ from django.contrib.auth.models import (
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 
+from .auth_cache import invalidate_client_token
+
 
 # ---------------------------------------------------------------------------
 # AnonymousUser
 # ---------------------------------------------------------------------------
 
-class AnonymousUserManager(BaseUserManager):
+def derive_user_token(client_token: str) -> str:
+    """HMAC-SHA256 of the client token; the pseudonymous id stored on listings/trades."""
+    hmac_key = settings.XUSDT_SETTINGS["USER_TOKEN_HMAC_KEY"].encode()
+    return hmac.new(hmac_key, client_token.encode(), hashlib.sha256).hexdigest()
+
+
+class AnonymousUserQuerySet(models.QuerySet):
+    """
+    Bulk writes bypass `AnonymousUser.save()`, so they drop the cached copies
+    of the rows they touch themselves. Only the last_active flush is exempt:
+    a cached user never serves that column back to the database.
+    """
+
+    UNCACHED_FIELDS = {"last_active"}
+
+    def update(self, **kwargs):
+        if set(kwargs) <= self.UNCACHED_FIELDS:
+            return super().update(**kwargs)
+        # Read the tokens first: the update may change them or the filter's matches
+        tokens = list(self.values_list("client_token", flat=True))
+        rows = super().update(**kwargs)
+        for client_token in tokens:
+            invalidate_client_token(client_token)
+        return rows
+
+    def delete(self):
+        for client_token in self.values_list("client_token", flat=True):
+            invalidate_client_token(client_token)
+        return super().delete()
+
+
+class AnonymousUserManager(BaseUserManager.from_queryset(AnonymousUserQuerySet)):
     def create_user(self, exchange_code, password, **extra_fields):
         if not exchange_code:
             raise ValueError("The Exchange Code must be set")
@@ -51,6 +84,13 @@ class AnonymousUser(AbstractBaseUser, PermissionsMixin):
         editable=False,
         help_text="SHA3-256(salt + password_hash)",
     )
+    user_token = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        editable=False,
+        help_text="HMAC-SHA256(client_token), kept in sync with the salt",
+    )
 
     username = models.CharField(max_length=50, blank=True, null=True)
     email = models.EmailField(blank=True, null=True)
@@ -87,11 +127,18 @@ class AnonymousUser(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return f"User {self.exchange_code}"
 
+    # Columns set_password() writes, for save(update_fields=...)
+    PASSWORD_FIELDS = [
+        "password", "password_hash", "session_salt",
+        "client_token", "user_token", "last_active",
+    ]
+
     def set_password(self, raw_password):
         """
         Override to (a) capture Django’s hashed password in `password_hash`
         and (b) generate a session salt + client-token combo.
         """
+        invalidate_client_token(self.client_token)             # old token is dead
         super().set_password(raw_password)                     # sets .password
         self.password_hash = self.password                     # keep a copy
 
@@ -101,15 +148,27 @@ class AnonymousUser(AbstractBaseUser, PermissionsMixin):
         # client token = SHA3-256(salt + password_hash)
         blob = f"{self.session_salt}{self.password_hash}".encode()
         self.client_token = hashlib.sha3_256(blob).hexdigest()
+        self.user_token = derive_user_token(self.client_token)
 
         self.last_active = timezone.now()
 
     def rotate_session_salt(self):
         """Rotate salt on login so the client token can be refreshed."""
+        invalidate_client_token(self.client_token)
         self.session_salt = hashlib.sha256(uuid.uuid4().bytes).hexdigest()[:32]
         blob = f"{self.session_salt}{self.password_hash}".encode()
         self.client_token = hashlib.sha3_256(blob).hexdigest()
-        self.save(update_fields=["session_salt", "client_token"])
+        self.user_token = derive_user_token(self.client_token)
+        self.save(update_fields=["session_salt", "client_token", "user_token"])
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Cached copies used by ClientTokenAuthentication are now stale
+        invalidate_client_token(self.client_token)
+
+    def delete(self, *args, **kwargs):
+        invalidate_client_token(self.client_token)
+        return super().delete(*args, **kwargs)
 
     class Meta:
         indexes = [
@@ -0,0 +1,155 @@
+"""
+Keyset (seek) pagination.
+
+The cursor holds the ordering values of the last row served. The next page
+filters on those values (`WHERE (created_at, id) < (:created_at, :id)`)
+instead of using OFFSET. With an index that matches the ordering, every
+page costs the same however deep the client scrolls. Pages only go forward,
+which is all an infinite-scroll client needs.
+
+A view can also define `get_keyset_branches()`, returning filters whose
+union is the result set (e.g. "trades where I am the buyer" and "... the
+seller"). Each branch then gets its own seek and LIMIT, so each can use its
+own index. That replaces an OR, which usually cannot use either index. The
+page is taken from the union of the branches' first rows. On backends that
+allow LIMIT inside a compound statement this is one UNION query for the ids
+and one query for the rows. Elsewhere (SQLite) the branches are fetched
+separately and merged. Either way the query count does not depend on the
+page size.
+"""
+import base64
+import json
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    page_size = 50
+    max_page_size = 200
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    # Every field must sort in the same direction and the last one must be unique
+    ordering = ('-created_at', '-id')
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    # ------------------------------------------------------------------ #
+    # Cursor encoding                                                    #
+    # ------------------------------------------------------------------ #
+
+    @property
+    def _fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def encode_cursor(self, obj) -> str:
+        values = [str(getattr(obj, name)) for name in self._fields]
+        return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            if not isinstance(values, list) or len(values) != len(self._fields):
+                raise ValueError(values)
+            return [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self._fields, values)
+            ]
+        except Exception:
+            raise NotFound("Invalid cursor")
+
+    def _seek(self, values) -> Q:
+        """Rows strictly after `values` in the pagination order."""
+        op = 'lt' if self.ordering[0].startswith('-') else 'gt'
+        condition = Q()
+        for i, name in enumerate(self._fields):
+            equal = {field: value for field, value in zip(self._fields[:i], values[:i])}
+            condition |= Q(**equal, **{f'{name}__{op}': values[i]})
+        # Redundant inclusive bound on the leading column gives the planner an
+        # index range to seek to, rather than an OR it may scan for
+        return Q(**{f'{self._fields[0]}__{op}e': values[0]}) & condition
+
+    def _union_rows(self, queryset, branches, cursor, limit):
+        parts = []
+        for condition in branches:
+            part = queryset.filter(condition)
+            if cursor is not None:
+                part = part.filter(self._seek(cursor))
+            parts.append(part)
+
+        if connections[queryset.db].features.supports_slicing_ordering_in_compound:
+            ids = [part.values_list('pk', flat=True)[:limit] for part in parts]
+            return list(queryset.filter(pk__in=list(ids[0].union(*ids[1:])))[:limit])
+
+        merged = {}
+        for part in parts:
+            for row in part[:limit]:
+                merged[row.pk] = row
+        descending = self.ordering[0].startswith('-')
+        return sorted(
+            merged.values(),
+            key=lambda row: tuple(getattr(row, name) for name in self._fields),
+            reverse=descending,
+        )[:limit]
+
+    # ------------------------------------------------------------------ #
+    # BasePagination API                                                 #
+    # ------------------------------------------------------------------ #
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = self.decode_cursor(request, queryset.model)
+        # One extra row tells us whether there is a next page without a COUNT
+        limit = page_size + 1
+        branches = view.get_keyset_branches() if hasattr(view, 'get_keyset_branches') else None
+        if branches:
+            rows = self._union_rows(queryset, branches, cursor, limit)
+        else:
+            if cursor is not None:
+                queryset = queryset.filter(self._seek(cursor))
+            rows = list(queryset[:limit])
+        self.page_size_used = page_size
+        self.next_cursor = self.encode_cursor(rows[page_size - 1]) if len(rows) > page_size else None
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'cursor': self.next_cursor,
+            'page_size': self.page_size_used,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'cursor': {'type': 'string', 'nullable': True},
+                'page_size': {'type': 'integer'},
+                'results': schema,
+            },
+        }
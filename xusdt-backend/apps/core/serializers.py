@@ -93,7 +93,20 @@ class PasswordResetSerializer(serializers.Serializer):
         return attrs
     
     
-class UpdateProfileSerializer(serializers.ModelSerializer):
+class ProfileUpdateMixin:
+    """
+    Save only the submitted fields: the instance is request.user, which may be
+    a cached copy, and a full save would write its stale columns back.
+    """
+
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=list(validated_data))
+        return instance
+
+
+class UpdateProfileSerializer(ProfileUpdateMixin, serializers.ModelSerializer):
     class Meta:
         model = AnonymousUser
         fields = ['username', 'email', 'phone', 'location', 'bio']  # Add fields you want to update
@@ -109,7 +122,7 @@ class UpdateProfileSerializer(serializers.ModelSerializer):
         return value
 
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(ProfileUpdateMixin, serializers.ModelSerializer):
     class Meta:
         model = AnonymousUser
         fields = [
@@ -1,3 +1,58 @@
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from .auth_cache import cache_user, get_cached_user, get_metrics
+from .models import AnonymousUser
+
+
+class CachedAuthTests(TestCase):
+    """Every write to a user drops its cached copy, and views never write a stale copy back."""
+
+    def setUp(self):
+        xusdt = dict(settings.XUSDT_SETTINGS, AUTH_CACHE_ALLOW_LOCAL=True)
+        self.enterContext(override_settings(XUSDT_SETTINGS=xusdt))
+        cache.clear()
+        self.user = AnonymousUser.objects.create_user('EX-01001', 'auth-tests-password')
+        self.token = self.user.client_token
+
+    def get_me(self):
+        return self.client.get(reverse('user-detail'), headers={'X-Client-Token': self.token})
+
+    def test_user_deactivated_by_queryset_update_is_rejected(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        self.assertIsNotNone(get_cached_user(self.token))
+
+        AnonymousUser.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(get_cached_user(self.token))
+        self.assertEqual(self.get_me().json()['detail'], 'User inactive or deleted')
+
+    def test_deleted_user_is_rejected(self):
+        self.assertEqual(self.get_me().status_code, 200)
+        AnonymousUser.objects.filter(pk=self.user.pk).delete()
+        self.assertEqual(self.get_me().json()['detail'], 'Invalid client token')
+
+    def test_last_active_flush_keeps_the_cached_copy(self):
+        self.get_me()
+        invalidations = get_metrics()['cache_invalidations']
+        AnonymousUser.objects.bulk_update(
+            [AnonymousUser(id=self.user.id, last_active=timezone.now())], ['last_active'],
+        )
+        self.assertEqual(get_metrics()['cache_invalidations'], invalidations)
+        self.assertIsNotNone(get_cached_user(self.token))
+
+    def test_profile_update_saves_only_submitted_fields(self):
+        stale = AnonymousUser.objects.get(pk=self.user.pk)
+        # A change the cached copy below does not know about
+        AnonymousUser.objects.filter(pk=self.user.pk).update(trust_score=5)
+        cache_user(stale)
+
+        response = self.client.patch(
+            reverse('user-profile'), {'bio': 'hello'},
+            content_type='application/json', headers={'X-Client-Token': self.token},
+        )
+        self.assertEqual(response.status_code, 200, response.content[:200])
+        user = AnonymousUser.objects.get(pk=self.user.pk)
+        self.assertEqual((user.bio, user.trust_score), ('hello', 5))
@@ -287,7 +287,7 @@ class CompletePasswordResetView(generics.GenericAPIView):
         new_password = serializer.validated_data['new_password']
         
         user.set_password(new_password)
-        user.save()
+        user.save(update_fields=AnonymousUser.PASSWORD_FIELDS)
         
         SecurityEvent.log_event(
             event_type=3,
@@ -370,7 +370,7 @@ class ChangePasswordView(generics.GenericAPIView):
             )
         
         user.set_password(new_password)
-        user.save()
+        user.save(update_fields=AnonymousUser.PASSWORD_FIELDS)
         
         SecurityEvent.log_event(
             event_type=3,
@@ -428,7 +428,7 @@ class AvatarUploadView(APIView):
             # For now, we'll just store a placeholder
             avatar_url = f"/media/avatars/user_{user.id}/{avatar.name}"
             user.avatar_url = avatar_url
-            user.save()
+            user.save(update_fields=['avatar_url'])
             
             SecurityEvent.log_event(
                 event_type=4,
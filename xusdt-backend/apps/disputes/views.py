@@ -4,8 +4,6 @@ from rest_framework.exceptions import PermissionDenied, ValidationError
 from django.conf import settings
 from django.db.models import Q
 from django.utils import timezone
-import hmac
-import hashlib
 import json
 
 from .models import TradeDispute
@@ -38,9 +36,7 @@ class TradeDisputeCreateView(generics.CreateAPIView):
         return super().create(request, *args, **kwargs)
 
     def perform_create(self, serializer):
-        client_token = self.request.user.client_token
-        hmac_key = settings.XUSDT_SETTINGS["USER_TOKEN_HMAC_KEY"].encode()
-        initiator_token = hmac.new(hmac_key, client_token.encode(), hashlib.sha256).hexdigest()
+        initiator_token = self.request.user.user_token
 
         # Validate evidence_hashes if provided
         evidence_hashes = serializer.validated_data.get("evidence_hashes")
@@ -65,9 +61,7 @@ class TradeDisputeDetailView(generics.RetrieveUpdateAPIView):
     lookup_url_kwarg = "pk"
 
     def get_queryset(self):
-        client_token = self.request.user.client_token
-        hmac_key = settings.XUSDT_SETTINGS["USER_TOKEN_HMAC_KEY"].encode()
-        user_token = hmac.new(hmac_key, client_token.encode(), hashlib.sha256).hexdigest()
+        user_token = self.request.user.user_token
 
         return TradeDispute.objects.filter(
             Q(trade__buyer_token=user_token)
@@ -105,9 +99,7 @@ class TradeDisputeListView(generics.ListAPIView):
     ordering = ["-created_at"]
 
     def get_queryset(self):
-        client_token = self.request.user.client_token
-        hmac_key = settings.XUSDT_SETTINGS["USER_TOKEN_HMAC_KEY"].encode()
-        user_token = hmac.new(hmac_key, client_token.encode(), hashlib.sha256).hexdigest()
+        user_token = self.request.user.user_token
 
         qs = TradeDispute.objects.filter(
             Q(trade__buyer_token=user_token)
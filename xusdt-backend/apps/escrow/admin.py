@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.db.models import Sum
+from apps.p2p.state_machine import escrow_machine
 from .models import (
     EscrowWallet,
     SystemWallet,
@@ -93,18 +94,18 @@ class EscrowWalletAdmin(admin.ModelAdmin):
 
     # Bulk actions
     def mark_as_funded(self, request, queryset):
-        updated = queryset.update(status='funded')
-        self.message_user(request, f"{updated} escrow(s) marked as funded")
+        updated = escrow_machine.apply('fund', queryset, actor=f"admin:{request.user.pk}")
+        self.message_user(request, f"{len(updated)} escrow(s) marked as funded")
     mark_as_funded.short_description = "Mark selected as funded"
 
     def mark_as_released(self, request, queryset):
-        updated = queryset.update(status='released')
-        self.message_user(request, f"{updated} escrow(s) marked as released")
+        updated = escrow_machine.apply('release', queryset, actor=f"admin:{request.user.pk}")
+        self.message_user(request, f"{len(updated)} escrow(s) marked as released")
     mark_as_released.short_description = "Mark selected as released"
 
     def mark_as_disputed(self, request, queryset):
-        updated = queryset.update(status='disputed')
-        self.message_user(request, f"{updated} escrow(s) marked as disputed")
+        updated = escrow_machine.apply('dispute', queryset, actor=f"admin:{request.user.pk}")
+        self.message_user(request, f"{len(updated)} escrow(s) marked as disputed")
     mark_as_disputed.short_description = "Mark selected as disputed"
 
     def get_actions(self, request):
@@ -0,0 +1,295 @@
+"""
+Async views for the chain-bound escrow endpoints.
+
+Served natively by an ASGI worker (`uvicorn config.asgi:application`).
+Chain reads go through the shared AsyncWeb3 client and lookups through
+Django's async ORM, so one worker keeps answering other requests while
+these wait on the node. Writes that must be atomic (state-machine
+transitions, queueing a release) run in a thread via sync_to_async, because
+the async ORM has no transactions. Under WSGI Django still serves them, one
+request at a time per worker thread.
+
+DRF's APIView is synchronous, so these are plain Django views. AsyncAPIView
+authenticates with the same ClientTokenAuthentication (a cache hit costs no
+query), returns DRF-style 403s and encodes responses with DRF's JSON encoder.
+"""
+import json
+import logging
+from decimal import Decimal, InvalidOperation
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import JsonResponse
+from django.urls import reverse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.core.authentication import ClientTokenAuthentication
+from apps.p2p.models import P2PListing, P2PTrade
+from apps.p2p.state_machine import escrow_machine, listing_machine
+from .exceptions import EscrowError
+from .models import EscrowAuditLog, EscrowWallet, TransactionQueue
+
+# `.services` is imported inside the handlers, as in `.views`, so web3 is
+# only loaded once a chain-bound request arrives.
+
+logger = logging.getLogger(__name__)
+
+
+def _response(data, status_code=status.HTTP_200_OK):
+    return JsonResponse(data, status=status_code, encoder=JSONEncoder)
+
+
+def _not_found(model):
+    return _response({"detail": f"No {model.__name__} matches the given query."}, status.HTTP_404_NOT_FOUND)
+
+
+class AsyncAPIView(View):
+    authentication = ClientTokenAuthentication()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token-authenticated like DRF's APIView, so no CSRF cookie check
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            result = await sync_to_async(self.authentication.authenticate)(request)
+        except exceptions.AuthenticationFailed as e:
+            return _response({"detail": str(e.detail)}, status.HTTP_403_FORBIDDEN)
+        if result is None:
+            return _response(
+                {"detail": "Authentication credentials were not provided."}, status.HTTP_403_FORBIDDEN
+            )
+        request.user = result[0]
+        try:
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.ParseError as e:
+            return _response({"detail": str(e.detail)}, status.HTTP_400_BAD_REQUEST)
+
+    @staticmethod
+    def data(request) -> dict:
+        """Request body as a dict; malformed JSON or a body that is not an object is a ParseError (400)."""
+        if request.content_type == "application/json":
+            try:
+                data = json.loads(request.body or b"{}")
+            except ValueError:
+                raise exceptions.ParseError("Malformed JSON body")
+            if not isinstance(data, dict):
+                raise exceptions.ParseError("JSON body must be an object")
+            return data
+        return request.POST
+
+    @staticmethod
+    def decimal(data, field, default=0) -> Decimal:
+        """`data[field]` as a finite Decimal; anything else is a ParseError (400)."""
+        try:
+            value = Decimal(str(data.get(field, default)))
+        except (InvalidOperation, TypeError, ValueError):
+            raise exceptions.ParseError(f"{field} must be a number")
+        if not value.is_finite():
+            raise exceptions.ParseError(f"{field} must be a finite number")
+        return value
+
+
+class EscrowFundView(AsyncAPIView):
+    async def post(self, request, escrow_id):
+        escrow = await EscrowWallet.objects.filter(id=escrow_id).afirst()
+        if escrow is None:
+            return _not_found(EscrowWallet)
+
+        # Verify user owns this escrow
+        if escrow.user_token != request.user.user_token:
+            return _response({"error": "Unauthorized"}, status.HTTP_403_FORBIDDEN)
+
+        from .services import adeposited_amount, awatch_for_deposit
+
+        # Hand the wallet to the deposit watcher and let the client poll
+        try:
+            min_amount = self.decimal(self.data(request), 'min_amount')
+            await awatch_for_deposit(escrow, min_amount)
+        except EscrowError as e:
+            return _response({"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+
+        try:
+            deposited = await adeposited_amount(escrow.address)
+        except Exception as e:
+            logger.warning("Balance read for escrow %s failed: %s", escrow.pk, e)
+            deposited = None
+
+        return _response(
+            {
+                "id": str(escrow.id),
+                "status": "waiting_for_deposit",
+                "escrow_address": escrow.address,
+                "deposited": deposited,
+                "status_url": reverse('escrow-wallet-detail', args=[escrow.id]),
+            },
+            status.HTTP_202_ACCEPTED,
+        )
+
+
+class EscrowReleaseView(AsyncAPIView):
+    async def post(self, request, escrow_id):
+        escrow = await EscrowWallet.objects.filter(id=escrow_id).afirst()
+        if escrow is None:
+            return _not_found(EscrowWallet)
+
+        # Verify user owns this escrow
+        if escrow.user_token != request.user.user_token:
+            return _response({"error": "Unauthorized"}, status.HTTP_403_FORBIDDEN)
+
+        if escrow.status != "funded":
+            return _response({"error": "Escrow not in fundable state"}, status.HTTP_400_BAD_REQUEST)
+
+        if not escrow.buyer_address:
+            return _response({"error": "Buyer address not set"}, status.HTTP_400_BAD_REQUEST)
+
+        from .services import enqueue_release
+
+        fee_percent = Decimal(str(settings.XUSDT_SETTINGS['ESCROW_FEE_PERCENT'])) / Decimal(100)
+        try:
+            queued = await sync_to_async(enqueue_release)(
+                wallet=escrow,
+                to_address=escrow.buyer_address,
+                amount=escrow.amount,
+                fee=fee_percent * escrow.amount,
+            )
+        except EscrowError as e:
+            return _response({"error": str(e)}, status.HTTP_409_CONFLICT)
+
+        return _response(
+            {
+                "transaction_id": queued.id,
+                "status": "queued",
+                "status_url": reverse('escrow-transaction-detail', args=[queued.id]),
+            },
+            status.HTTP_202_ACCEPTED,
+        )
+
+
+@transaction.atomic
+def _fund_listing(listing, escrow, amount, actor) -> bool:
+    if not escrow_machine.transition(escrow, 'fund', actor=actor, amount=amount):
+        return False
+    listing_machine.transition(listing, 'fund', actor=actor)
+    EscrowAuditLog.objects.create(
+        escrow_id=escrow.pk,
+        action='FUND',
+        details={"amount": str(amount), "source": "fund_endpoint"},
+    )
+    return True
+
+
+class FundEscrowView(AsyncAPIView):
+    """
+    Confirm the merchant's deposit: the escrow's on-chain balance is read
+    now and, once it covers the listing, the escrow and listing are funded.
+    The merchant transfers from their own wallet; nothing is signed here.
+    """
+
+    async def post(self, request, listing_id):
+        listing = await P2PListing.objects.select_related('escrow_wallet').filter(id=listing_id).afirst()
+        if listing is None:
+            return _not_found(P2PListing)
+
+        # Verify user owns this listing
+        if listing.seller_token != request.user.user_token:
+            return _response({"error": "Unauthorized"}, status.HTTP_403_FORBIDDEN)
+
+        escrow = listing.escrow_wallet
+        if not escrow:
+            return _response({"error": "No escrow wallet"}, status.HTTP_400_BAD_REQUEST)
+
+        if escrow.status != EscrowWallet.STATUS_CREATED:
+            return _response({"error": f"Escrow is already {escrow.status}"}, status.HTTP_400_BAD_REQUEST)
+
+        from .services import adeposited_amount
+
+        try:
+            deposited = await adeposited_amount(escrow.address)
+        except Exception as e:
+            return _response({"error": f"Balance check failed: {e}"}, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        body = {"escrow_address": escrow.address, "deposited": deposited, "required": listing.crypto_amount}
+        if deposited < listing.crypto_amount:
+            return _response(dict(body, status="waiting_for_deposit"), status.HTTP_202_ACCEPTED)
+
+        if not await sync_to_async(_fund_listing)(listing, escrow, deposited, request.user.user_token):
+            return _response({"error": "Escrow was funded or closed concurrently"}, status.HTTP_409_CONFLICT)
+        return _response(dict(body, status="funded"))
+
+
+class ReleaseEscrowView(AsyncAPIView):
+    async def post(self, request, trade_id):
+        trade = await P2PTrade.objects.select_related('listing__escrow_wallet').filter(id=trade_id).afirst()
+        if trade is None:
+            return _not_found(P2PTrade)
+        listing = trade.listing
+
+        # Verify user is the merchant
+        if listing.seller_token != request.user.user_token:
+            return _response({"error": "Unauthorized"}, status.HTTP_403_FORBIDDEN)
+
+        if trade.status != 2:  # Must be in PaymentSent state
+            return _response({"error": "Trade must be in PaymentSent state"}, status.HTTP_400_BAD_REQUEST)
+
+        if not listing.escrow_wallet:
+            return _response({"error": "No escrow wallet"}, status.HTTP_400_BAD_REQUEST)
+
+        from .services import enqueue_release
+
+        try:
+            # Trade and listing are completed by the queue worker once mined
+            queued = await sync_to_async(enqueue_release)(
+                wallet=listing.escrow_wallet,
+                to_address=self.data(request).get('buyer_wallet'),
+                amount=listing.crypto_amount,
+                fee=trade.fee_amount,
+                trade=trade,
+            )
+        except EscrowError as e:
+            return _response({"error": str(e)}, status.HTTP_400_BAD_REQUEST)
+
+        return _response(
+            {
+                "status": "queued",
+                "transaction_id": queued.id,
+                "status_url": reverse('escrow-transaction-detail', args=[queued.id]),
+            },
+            status.HTTP_202_ACCEPTED,
+        )
+
+
+class TransactionStatusView(AsyncAPIView):
+    """Queue status of a release, plus its receipt once it has been broadcast."""
+
+    async def get(self, request, pk):
+        queued = await TransactionQueue.objects.filter(
+            pk=pk, escrow__user_token=request.user.user_token
+        ).afirst()
+        if queued is None:
+            return _not_found(TransactionQueue)
+
+        from .services import acheck_transaction_status
+
+        receipt = None
+        if queued.tx_hash:
+            try:
+                receipt = await acheck_transaction_status(queued.tx_hash)
+            except EscrowError as e:
+                logger.warning("Receipt lookup for %s failed: %s", queued.tx_hash, e)
+
+        return _response({
+            "transaction_id": queued.id,
+            "type": queued.tx_type,
+            "status": queued.get_status_display().lower(),
+            "tx_hash": queued.tx_hash or None,
+            "retry_count": queued.retry_count,
+            "last_error": queued.last_error or None,
+            "processed_at": queued.processed_at,
+            "receipt": receipt,
+        })
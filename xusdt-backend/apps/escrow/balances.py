@@ -0,0 +1,74 @@
+"""
+Batched ERC-20 balance reads.
+
+Packs many `balanceOf` eth_calls into JSON-RPC batch requests, so checking N
+escrow wallets costs ceil(N / chunk_size) HTTP round trips instead of N.
+"""
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+
+from .exceptions import EscrowError
+
+BALANCE_OF_SELECTOR = "0x70a08231"
+
+
+def _chunk_size(chunk_size):
+    return chunk_size or settings.XUSDT_SETTINGS["BALANCE_BATCH_SIZE"]
+
+
+def _balance_of_request(token_address: str, owner: str):
+    data = BALANCE_OF_SELECTOR + owner.lower().replace("0x", "").rjust(64, "0")
+    return ("eth_call", [{"to": token_address, "data": data}, "latest"])
+
+
+def _parse_batch(owners: List[str], responses) -> Dict[str, int]:
+    if not isinstance(responses, list):
+        # A failed batch comes back as a single error object
+        error = responses.get("error") if isinstance(responses, dict) else responses
+        raise EscrowError(f"Batch balance request failed: {error}")
+
+    balances = {}
+    for owner, response in zip(owners, responses):
+        if response.get("error"):
+            raise EscrowError(f"balanceOf({owner}) failed: {response['error']}")
+        result = response.get("result") or "0x0"
+        balances[owner] = int(result, 16) if result != "0x" else 0
+    return balances
+
+
+def _chunks(addresses: List[str], size: int):
+    for start in range(0, len(addresses), size):
+        yield addresses[start:start + size]
+
+
+def read_balances(w3, addresses: Iterable[str], token_address=None, chunk_size=None) -> Dict[str, int]:
+    """Return {address: raw token balance} using one batch request per chunk."""
+    token_address = token_address or settings.USDT_ADDR
+    owners = list(dict.fromkeys(addresses))
+
+    balances = {}
+    for chunk in _chunks(owners, _chunk_size(chunk_size)):
+        responses = w3.provider.make_batch_request(
+            [_balance_of_request(token_address, owner) for owner in chunk]
+        )
+        balances.update(_parse_batch(chunk, responses))
+    return balances
+
+
+async def aread_balances(w3, addresses: Iterable[str], token_address=None, chunk_size=None) -> Dict[str, int]:
+    """Async variant of read_balances for AsyncWeb3 instances."""
+    token_address = token_address or settings.USDT_ADDR
+    owners = list(dict.fromkeys(addresses))
+
+    balances = {}
+    for chunk in _chunks(owners, _chunk_size(chunk_size)):
+        responses = await w3.provider.make_batch_request(
+            [_balance_of_request(token_address, owner) for owner in chunk]
+        )
+        balances.update(_parse_batch(chunk, responses))
+    return balances
+
+
+def read_balance(w3, address: str, token_address=None) -> int:
+    return read_balances(w3, [address], token_address=token_address)[address]
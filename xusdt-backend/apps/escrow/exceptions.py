@@ -1,3 +1,7 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
 class EscrowError(Exception):
     """Base exception for escrow-related errors"""
     pass
@@ -16,4 +20,10 @@ class WalletError(EscrowError):
 
 class TimeoutError(EscrowError):
     """Raised when an operation times out"""
-    pass
\ No newline at end of file
+    pass
+
+class EscrowUnavailable(APIException):
+    """503 for a view that cannot get an escrow address (a WalletError from create_escrow_wallet)"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "No escrow address is available right now. Try again later."
+    default_code = "escrow_unavailable"
@@ -0,0 +1,112 @@
+"""
+EIP-1559 fee oracle.
+
+Samples `eth_feeHistory` and keeps the next block's base fee plus priority
+fee percentiles in a GasSample row per chain id, so every process sees the
+same sample (as with ChainHead in `tx_status`). Transaction builders call
+`fee_fields()`, which reads the stored sample, so they get maxFeePerGas and
+maxPriorityFeePerGas without an RPC per transaction. The `gas_oracle`
+management command refreshes the sample on a schedule. Without it, the first
+caller after GAS_ORACLE_TTL refreshes it inline.
+
+Fees above MAX_GAS_PRICE_GWEI raise GasPriceTooHighError. Callers such as the
+transaction queue treat that as a retryable failure.
+"""
+import logging
+import statistics
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from web3 import Web3
+
+from .exceptions import EscrowError
+from .models import GasSample
+
+logger = logging.getLogger(__name__)
+
+REWARD_PERCENTILES = {"slow": 10, "standard": 50, "fast": 90}
+
+
+class GasPriceTooHighError(EscrowError):
+    """Raised when network fees exceed MAX_GAS_PRICE_GWEI"""
+    pass
+
+
+class GasOracle:
+    def __init__(self, w3, block_count=None, ttl=None, chain_id=None):
+        self.w3 = w3
+        self.block_count = block_count or settings.XUSDT_SETTINGS["GAS_FEE_HISTORY_BLOCKS"]
+        self.ttl = ttl or settings.XUSDT_SETTINGS["GAS_ORACLE_TTL"]
+        self._chain_id = chain_id
+
+    @property
+    def chain_id(self) -> int:
+        # Asked of the node once, so an oracle built on any endpoint keys its own chain
+        if self._chain_id is None:
+            self._chain_id = self.w3.eth.chain_id
+        return self._chain_id
+
+    @property
+    def ceiling(self) -> int:
+        return Web3.to_wei(settings.XUSDT_SETTINGS["MAX_GAS_PRICE_GWEI"], "gwei")
+
+    @staticmethod
+    def _as_dict(row) -> dict:
+        return {
+            "base_fee": row.base_fee,
+            "priority_fees": row.priority_fees,
+            "block": row.block,
+            "sampled_at": row.sampled_at,
+        }
+
+    def refresh(self) -> dict:
+        """Sample eth_feeHistory and store the result for every process."""
+        history = self.w3.eth.fee_history(
+            self.block_count, "latest", list(REWARD_PERCENTILES.values())
+        )
+        rewards = [row for row in history["reward"] if row] or [[0] * len(REWARD_PERCENTILES)]
+        sample = {
+            # The last entry is the base fee of the next (pending) block
+            "base_fee": history["baseFeePerGas"][-1],
+            "priority_fees": {
+                speed: int(statistics.median(row[i] for row in rewards))
+                for i, speed in enumerate(REWARD_PERCENTILES)
+            },
+            "block": history["oldestBlock"] + len(history["baseFeePerGas"]) - 2,
+            "sampled_at": timezone.now(),
+        }
+        # The row outlives its TTL, so a failed refresh can fall back to it
+        GasSample.objects.bulk_create(
+            [GasSample(chain_id=self.chain_id, **sample)], update_conflicts=True, unique_fields=["chain_id"],
+            update_fields=["base_fee", "priority_fees", "block", "sampled_at"],
+        )
+        return sample
+
+    def sample(self) -> dict:
+        row = GasSample.objects.filter(pk=self.chain_id).first()
+        if row is not None and timezone.now() - row.sampled_at < timedelta(seconds=self.ttl):
+            return self._as_dict(row)
+        try:
+            return self.refresh()
+        except Exception as e:
+            if row is None:
+                raise EscrowError(f"Fee history unavailable: {e}")
+            sample = self._as_dict(row)
+            logger.warning("Fee history refresh failed, using sample from block %s: %s", sample["block"], e)
+            return sample
+
+    def fee_fields(self, speed: str = "standard") -> dict:
+        """EIP-1559 fee fields for build_transaction()."""
+        sample = self.sample()
+        base_fee = sample["base_fee"]
+        priority_fee = sample["priority_fees"][speed]
+        if base_fee + priority_fee > self.ceiling:
+            raise GasPriceTooHighError(
+                f"Base fee {base_fee} + tip {priority_fee} wei exceeds the {self.ceiling} wei ceiling"
+            )
+        # Room for the base fee to double before the transaction is priced out
+        return {
+            "maxFeePerGas": min(2 * base_fee + priority_fee, self.ceiling),
+            "maxPriorityFeePerGas": priority_fee,
+        }
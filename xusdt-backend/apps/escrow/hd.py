@@ -0,0 +1,99 @@
+"""
+BIP-32/44 derivation of escrow keys from a single encrypted seed.
+
+ESCROW_HD_SEED_ENC holds the BIP-39 seed, hex encoded and Fernet encrypted
+with ESCROW_WALLET_ENCRYPTION_KEY (`manage.py create_escrow_seed`). Escrow
+keys are the soft children of ESCROW_HD_PATH, so escrow #i signs with
+m/44'/60'/0'/0/i by default, and an EscrowWallet only stores its index.
+
+The seed is decrypted and the parent node derived once per process. After
+that each child costs one HMAC-SHA512 and one point multiplication, and
+`derive_addresses()` derives a whole index range from the same parent.
+"""
+import hashlib
+import hmac
+import threading
+
+from cryptography.fernet import Fernet
+from django.conf import settings
+from eth_account.hdaccount.deterministic import Node, derive_child_key
+from eth_keys import keys
+
+from .exceptions import WalletError
+
+SECP256K1_N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+MAX_INDEX = 2 ** 31 - 1  # soft children only
+
+_lock = threading.Lock()
+_parent = None  # (key, chain code, compressed public key) at ESCROW_HD_PATH
+
+
+def is_configured() -> bool:
+    return bool(settings.ESCROW_HD_SEED_ENC)
+
+
+def encrypt_seed(seed: bytes) -> str:
+    """ESCROW_HD_SEED_ENC value for a BIP-39 seed."""
+    if not settings.ESCROW_WALLET_ENCRYPTION_KEY:
+        raise WalletError("ESCROW_WALLET_ENCRYPTION_KEY is not configured")
+    return Fernet(settings.ESCROW_WALLET_ENCRYPTION_KEY).encrypt(seed.hex().encode()).decode()
+
+
+def _derive_parent():
+    if not is_configured():
+        raise WalletError("ESCROW_HD_SEED_ENC is not configured")
+    if not settings.ESCROW_WALLET_ENCRYPTION_KEY:
+        raise WalletError("ESCROW_WALLET_ENCRYPTION_KEY is not configured")
+    seed = bytes.fromhex(
+        Fernet(settings.ESCROW_WALLET_ENCRYPTION_KEY).decrypt(settings.ESCROW_HD_SEED_ENC.encode()).decode()
+    )
+    master = hmac.new(b"Bitcoin seed", seed, hashlib.sha512).digest()
+    key, chain_code = master[:32], master[32:]
+    parts = settings.ESCROW_HD_PATH.split("/")
+    if parts[0] != "m":
+        raise WalletError(f"Invalid ESCROW_HD_PATH: {settings.ESCROW_HD_PATH}")
+    for part in parts[1:]:
+        key, chain_code = derive_child_key(key, chain_code, Node.decode(part))
+    return key, chain_code, keys.PrivateKey(key).public_key.to_compressed_bytes()
+
+
+def _parent_node():
+    global _parent
+    with _lock:
+        if _parent is None:
+            _parent = _derive_parent()
+        return _parent
+
+
+def reset():
+    """Forget the derived parent node, e.g. after the seed settings change."""
+    global _parent
+    with _lock:
+        _parent = None
+
+
+def _child_key(index: int) -> keys.PrivateKey:
+    if not 0 <= index <= MAX_INDEX:
+        raise WalletError(f"Derivation index out of range: {index}")
+    key, chain_code, public_key = _parent_node()
+    digest = hmac.new(chain_code, public_key + index.to_bytes(4, "big"), hashlib.sha512).digest()
+    tweak = int.from_bytes(digest[:32], "big")
+    child = (tweak + int.from_bytes(key, "big")) % SECP256K1_N
+    if tweak >= SECP256K1_N or child == 0:
+        # BIP-32: probability below 2**-127; the index is simply unusable
+        raise WalletError(f"No valid key at derivation index {index}")
+    return keys.PrivateKey(child.to_bytes(32, "big"))
+
+
+def derive_key(index: int) -> str:
+    """Hex private key of escrow `index`."""
+    return "0x" + _child_key(index).to_bytes().hex()
+
+
+def derive_address(index: int) -> str:
+    return _child_key(index).public_key.to_checksum_address()
+
+
+def derive_addresses(start: int, count: int) -> list:
+    """Checksum addresses of indexes start .. start + count - 1."""
+    return [derive_address(index) for index in range(start, start + count)]
@@ -0,0 +1,214 @@
+"""
+USDT Transfer log indexer.
+
+Instead of asking the node for every open escrow's balance on each block, it
+pulls the token's `Transfer` logs for new block ranges with eth_getLogs and
+keeps the ones sent to an open escrow address. Only the recipients of the
+fetched logs are looked up, so the work per poll grows with the number of
+logs, not with the number of escrows.
+
+On first start the cursor is placed just before the block in which the
+oldest open escrow was created, so deposits made before the indexer ever
+ran are picked up.
+
+Only blocks at least TRANSFER_CONFIRMATIONS deep are indexed. The cursor
+stores the hash of the last indexed block. If the node later reports a
+different hash for that block, a reorg went deeper than the confirmation
+depth, so the indexer drops the rows above a rewind point and indexes again.
+"""
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+from web3 import Web3
+
+from apps.p2p.models import P2PListing
+from apps.p2p.state_machine import escrow_machine, listing_machine
+from .models import EscrowAuditLog, EscrowWallet, TokenTransfer, TransferIndexCursor
+from .services import USDT, USDT_DECIMALS
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NAME = "usdt"
+
+
+class TransferIndexer:
+    def __init__(self, token=None, confirmations=None, max_range=None):
+        self.token = token or USDT
+        self.w3 = self.token.w3
+        self.transfer_event = self.token.events.Transfer()
+        self.confirmations = (
+            settings.XUSDT_SETTINGS["TRANSFER_CONFIRMATIONS"] if confirmations is None else confirmations
+        )
+        self.max_range = max_range or settings.XUSDT_SETTINGS["TRANSFER_LOG_RANGE"]
+
+    # ------------------------------------------------------------------ #
+    # Public API                                                         #
+    # ------------------------------------------------------------------ #
+
+    def run_once(self) -> int:
+        """Index every confirmed block past the cursor; returns escrows funded."""
+        safe_head = self.w3.eth.block_number - self.confirmations
+        cursor = self._get_cursor(safe_head)
+        self._check_reorg(cursor)
+        if cursor.last_block >= safe_head:
+            return 0
+
+        funded = 0
+        start = cursor.last_block + 1
+        while start <= safe_head:
+            end = min(start + self.max_range - 1, safe_head)
+            logs = self.w3.eth.get_logs({
+                "address": self.token.address,
+                "topics": [self.transfer_event.topic],
+                "fromBlock": start,
+                "toBlock": end,
+            })
+            funded += self._index_range(cursor, logs, end)
+            start = end + 1
+        return funded
+
+    def reset(self, from_block: int):
+        """Restart indexing at `from_block`; already stored transfers are kept."""
+        TransferIndexCursor.objects.update_or_create(
+            name=CURSOR_NAME,
+            defaults={"last_block": max(from_block - 1, 0), "last_block_hash": None},
+        )
+
+    @staticmethod
+    def open_escrows(addresses) -> dict:
+        """Lowercase address -> id of the open escrows among `addresses`."""
+        if not addresses:
+            return {}
+        # Stored addresses are checksummed, older rows may be lowercase
+        candidates = set(addresses) | {address.lower() for address in addresses}
+        return {
+            address.lower(): escrow_id
+            for escrow_id, address in EscrowWallet.objects.filter(
+                status=EscrowWallet.STATUS_CREATED, address__in=candidates
+            ).values_list("id", "address")
+        }
+
+    # ------------------------------------------------------------------ #
+    # Internals                                                          #
+    # ------------------------------------------------------------------ #
+
+    def _get_cursor(self, safe_head):
+        cursor = TransferIndexCursor.objects.filter(name=CURSOR_NAME).first()
+        if cursor is None:
+            cursor, _ = TransferIndexCursor.objects.get_or_create(
+                name=CURSOR_NAME, defaults={"last_block": self._start_block(max(safe_head, 0))}
+            )
+            logger.info("Transfer indexer starting after block %s", cursor.last_block)
+        return cursor
+
+    def _start_block(self, safe_head) -> int:
+        """Last block mined before the oldest open escrow was created (`safe_head` if none)."""
+        oldest = (
+            EscrowWallet.objects.filter(status=EscrowWallet.STATUS_CREATED)
+            .order_by("created_at").values_list("created_at", flat=True).first()
+        )
+        if oldest is None:
+            return safe_head
+        created = int(oldest.timestamp())
+        # Binary search for the last block with a timestamp before `created`
+        low, high = 0, safe_head
+        while low < high:
+            middle = (low + high + 1) // 2
+            if self.w3.eth.get_block(middle)["timestamp"] < created:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def _block_hash(self, number):
+        return Web3.to_hex(self.w3.eth.get_block(number)["hash"])
+
+    def _check_reorg(self, cursor):
+        if not cursor.last_block_hash:
+            return
+        if self._block_hash(cursor.last_block) == cursor.last_block_hash:
+            return
+
+        rewind_to = max(cursor.last_block - 2 * max(self.confirmations, 1), 0)
+        logger.warning(
+            "Reorg below confirmation depth at block %s; rewinding to %s",
+            cursor.last_block, rewind_to,
+        )
+        with transaction.atomic():
+            orphaned = TokenTransfer.objects.filter(block_number__gt=rewind_to)
+            funded = set(
+                orphaned.filter(escrow__status=EscrowWallet.STATUS_FUNDED).values_list("escrow_id", flat=True)
+            )
+            orphaned.delete()
+            cursor.last_block = rewind_to
+            cursor.last_block_hash = self._block_hash(rewind_to)
+            cursor.save(update_fields=["last_block", "last_block_hash", "updated_at"])
+        if funded:
+            # Funding is not reverted automatically; the re-indexed logs decide
+            logger.error("Escrows funded from orphaned transfers, review: %s", sorted(map(str, funded)))
+
+    @transaction.atomic
+    def _index_range(self, cursor, logs, end_block) -> int:
+        events = [self.transfer_event.process_log(log) for log in logs]
+        open_escrows = self.open_escrows({event.args.to for event in events})
+        rows = []
+        for event in events:
+            escrow_id = open_escrows.get(event.args.to.lower())
+            if escrow_id is None:
+                continue
+            rows.append(TokenTransfer(
+                tx_hash=Web3.to_hex(event.transactionHash),
+                log_index=event.logIndex,
+                block_number=event.blockNumber,
+                block_hash=Web3.to_hex(event.blockHash),
+                from_address=event.args["from"],
+                to_address=event.args.to,
+                value=event.args.value,
+                escrow_id=escrow_id,
+            ))
+        if rows:
+            TokenTransfer.objects.bulk_create(rows, ignore_conflicts=True)
+
+        funded = self._fund({row.escrow_id for row in rows}, end_block)
+
+        cursor.last_block = end_block
+        cursor.last_block_hash = self._block_hash(end_block)
+        cursor.save(update_fields=["last_block", "last_block_hash", "updated_at"])
+        return funded
+
+    def _fund(self, escrow_ids, block) -> int:
+        """Mark escrows whose indexed deposits reached the expected amount."""
+        if not escrow_ids:
+            return 0
+
+        totals = dict(
+            TokenTransfer.objects.filter(escrow_id__in=escrow_ids)
+            .values("escrow_id")
+            .annotate(total=Sum("value"))
+            .values_list("escrow_id", "total")
+        )
+        funded = 0
+        wallets = EscrowWallet.objects.filter(
+            id__in=escrow_ids, status=EscrowWallet.STATUS_CREATED
+        ).only("id", "address", "expected_amount")
+        for wallet in wallets:
+            amount = Decimal(totals.get(wallet.id) or 0) / Decimal(10 ** USDT_DECIMALS)
+            if amount <= 0 or amount < (wallet.expected_amount or Decimal(0)):
+                continue
+
+            if not escrow_machine.transition(wallet, 'fund', actor='transfer_indexer', amount=amount):
+                continue
+
+            listing_machine.apply(
+                'fund', P2PListing.objects.filter(escrow_wallet_id=wallet.pk), actor='transfer_indexer'
+            )
+            EscrowAuditLog.objects.create(
+                escrow_id=wallet.pk,
+                action='FUND',
+                details={"amount": str(amount), "block": block, "source": "transfer_indexer"},
+            )
+            funded += 1
+        return funded
@@ -0,0 +1,154 @@
+"""
+Pool of pre-generated escrow addresses.
+
+Key generation is kept off the request path. `manage.py fill_escrow_pool`
+tops the pool up to ESCROW_KEY_POOL_SIZE unclaimed addresses whenever it
+drops below ESCROW_KEY_POOL_LOW_WATER, with ESCROW_KEY_POOL_BATCH_SIZE rows
+per bulk_create. With an HD seed configured (`hd`), the rows are the next
+derivation indexes and no key is stored. Without one, they are random keys
+encrypted with ESCROW_WALLET_ENCRYPTION_KEY.
+
+`claim()` takes one free key with a single statement:
+
+    UPDATE escrow_escrowkey SET claimed_at = :now
+    WHERE id = (SELECT id ... WHERE claimed_at IS NULL ORDER BY id LIMIT 1
+                [FOR UPDATE SKIP LOCKED])
+      AND claimed_at IS NULL
+    RETURNING address, private_key_enc, derivation_index
+
+so concurrent listing creations never get the same key. The claim belongs
+to the caller's transaction, so a rolled-back listing puts its key back.
+When the pool is empty `create_escrow_wallet()` falls back to generating a
+key inline and counts a miss. The next fill prunes claimed rows, because
+their address and key (or index) now live on the escrow wallet.
+
+Counters are KeyPoolCounter rows, so `fill_escrow_pool --stats` sees the
+misses of the web workers. Claims are not written on the request path:
+they are the claimed rows still in the pool plus the ones fills pruned.
+"""
+import logging
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Max
+from django.utils import timezone
+from eth_account import Account
+
+from . import hd
+from .exceptions import WalletError
+from .models import EscrowKey, EscrowWallet, KeyPoolCounter
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("misses", "generated", "fills", "pruned")
+
+
+def _incr(name, amount=1):
+    counter = KeyPoolCounter.objects.filter(name=name)
+    if not counter.update(value=F("value") + amount):
+        KeyPoolCounter.objects.bulk_create([KeyPoolCounter(name=name)], ignore_conflicts=True)
+        counter.update(value=F("value") + amount)
+
+
+def available() -> int:
+    return EscrowKey.objects.filter(claimed_at__isnull=True).count()
+
+
+def get_metrics() -> dict:
+    """Pool size, watermarks and the claim/miss/fill counters of all processes."""
+    counters = dict.fromkeys(COUNTERS, 0)
+    counters.update(KeyPoolCounter.objects.values_list("name", "value"))
+    free = available()
+    low_water = settings.XUSDT_SETTINGS["ESCROW_KEY_POOL_LOW_WATER"]
+    metrics = {
+        "claims": counters.pop("pruned") + EscrowKey.objects.filter(claimed_at__isnull=False).count(),
+        **counters,
+    }
+    metrics.update(
+        available=free,
+        size=settings.XUSDT_SETTINGS["ESCROW_KEY_POOL_SIZE"],
+        low_water=low_water,
+        below_low_water=free < low_water,
+    )
+    return metrics
+
+
+def _claim_sql() -> str:
+    table = connection.ops.quote_name(EscrowKey._meta.db_table)
+    lock = " FOR UPDATE SKIP LOCKED" if connection.features.has_select_for_update_skip_locked else ""
+    return (
+        f"UPDATE {table} SET claimed_at = %s "
+        f"WHERE id = (SELECT id FROM {table} WHERE claimed_at IS NULL ORDER BY id LIMIT 1{lock}) "
+        f"AND claimed_at IS NULL "
+        f"RETURNING address, private_key_enc, derivation_index"
+    )
+
+
+def claim():
+    """An unsaved EscrowWallet holding a pooled address, or None when the pool is empty."""
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    with connection.cursor() as cursor:
+        cursor.execute(_claim_sql(), [now])
+        row = cursor.fetchone()
+    if row is None:
+        _incr("misses")
+        logger.warning("Escrow key pool is empty; generating a key on the request path")
+        return None
+    address, private_key_enc, derivation_index = row
+    return EscrowWallet(address=address, private_key_enc=private_key_enc or None, derivation_index=derivation_index)
+
+
+def next_index() -> int:
+    """First derivation index not used by a pooled key or an escrow."""
+    used = [
+        model.objects.aggregate(last=Max("derivation_index"))["last"]
+        for model in (EscrowKey, EscrowWallet)
+    ]
+    used = [index for index in used if index is not None]
+    return max(used) + 1 if used else 0
+
+
+def _generate(count):
+    """`count` unsaved pool rows: the next HD indexes, or encrypted random keys."""
+    if hd.is_configured():
+        start = next_index()
+        return [
+            EscrowKey(address=address, derivation_index=start + offset)
+            for offset, address in enumerate(hd.derive_addresses(start, count))
+        ]
+    accounts = [Account.create() for _ in range(count)]
+    return [
+        EscrowKey(address=account.address, private_key_enc=EscrowWallet.encrypt_private_key(account.key.hex()))
+        for account in accounts
+    ]
+
+
+def fill(size=None, batch_size=None) -> int:
+    """Top the pool up to `size` free keys and prune claimed rows; returns keys added."""
+    if not settings.ESCROW_WALLET_ENCRYPTION_KEY:
+        raise WalletError("ESCROW_WALLET_ENCRYPTION_KEY is not configured")
+    size = size or settings.XUSDT_SETTINGS["ESCROW_KEY_POOL_SIZE"]
+    batch_size = batch_size or settings.XUSDT_SETTINGS["ESCROW_KEY_POOL_BATCH_SIZE"]
+
+    claimed = EscrowKey.objects.filter(claimed_at__isnull=False)
+    last = claimed.aggregate(last=Max("derivation_index"))["last"]
+    if last is not None:
+        # The highest claimed index stays as a high-water mark so indexes are never reused
+        claimed = claimed.exclude(derivation_index=last)
+    pruned, _ = claimed.delete()
+    if pruned:
+        _incr("pruned", pruned)
+    missing = size - available()
+    added = 0
+    while added < missing:
+        rows = EscrowKey.objects.bulk_create(_generate(min(batch_size, missing - added)))
+        added += len(rows)
+    if added:
+        _incr("fills")
+        _incr("generated", added)
+        logger.info("Escrow key pool filled with %d keys", added)
+    return added
+
+
+def needs_fill() -> bool:
+    return available() < settings.XUSDT_SETTINGS["ESCROW_KEY_POOL_LOW_WATER"]
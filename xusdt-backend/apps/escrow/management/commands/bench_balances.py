@@ -0,0 +1,61 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from eth_account import Account
+from web3 import Web3
+
+from apps.core.chain import get_web3, load_abi
+
+from apps.escrow.balances import read_balances
+from apps.escrow.mock_node import MockNode
+from apps.escrow.services import ABI_PATH
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-wallet balanceOf calls with batched balance reads against an "
+        "in-process mock node and report HTTP round trips and wall time."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wallets', type=int, default=200)
+        parser.add_argument('--batch-size', type=int, help="Defaults to XUSDT_SETTINGS['BALANCE_BATCH_SIZE']")
+
+    def handle(self, *args, **options):
+        count = options['wallets']
+        batch_size = options['batch_size'] or settings.XUSDT_SETTINGS["BALANCE_BATCH_SIZE"]
+
+        node = MockNode(token_address=settings.USDT_ADDR)
+        addresses = [Account.create().address for _ in range(count)]
+        for i, address in enumerate(addresses):
+            node.set_token_balance(address, i * 10**6)
+
+        server, url = node.serve_in_thread()
+        try:
+            w3 = get_web3(urls=[url])
+            usdt = w3.eth.contract(address=Web3.to_checksum_address(settings.USDT_ADDR), abi=load_abi(ABI_PATH))
+
+            node.reset_counters()
+            start = time.perf_counter()
+            single = {address: usdt.functions.balanceOf(address).call() for address in addresses}
+            single_time = time.perf_counter() - start
+            single_requests = node.http_requests
+
+            node.reset_counters()
+            start = time.perf_counter()
+            batched = read_balances(w3, addresses, chunk_size=batch_size)
+            batched_time = time.perf_counter() - start
+            batched_requests = node.http_requests
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        if single != batched:
+            raise CommandError("Batched balances differ from per-wallet balances")
+
+        self.stdout.write(f"{count} wallets, batch size {batch_size}")
+        self.stdout.write(f"  per-wallet: {single_requests:>6} HTTP requests  {single_time:8.3f}s")
+        self.stdout.write(f"  batched:    {batched_requests:>6} HTTP requests  {batched_time:8.3f}s")
+        if batched_time:
+            self.stdout.write(f"  speedup:    {single_time / batched_time:.1f}x")
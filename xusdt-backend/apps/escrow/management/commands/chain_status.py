@@ -0,0 +1,31 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.chain import get_metrics, get_web3
+
+
+class Command(BaseCommand):
+    help = "Probe every RPC endpoint of a chain and print health and per-method metrics."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chain-id', type=int, help="Defaults to settings.CHAIN_ID")
+        parser.add_argument('--probes', type=int, default=3, help="eth_blockNumber calls per endpoint")
+
+    def handle(self, *args, **options):
+        w3 = get_web3(chain_id=options['chain_id'])
+        for endpoint in w3.provider.endpoints:
+            for _ in range(options['probes']):
+                start = time.perf_counter()
+                try:
+                    response = endpoint.provider.make_request("eth_blockNumber", [])
+                except Exception as e:
+                    endpoint.record_failure(e)
+                    self.stderr.write(f"{endpoint.url}: {e}")
+                    break
+                endpoint.record_success(time.perf_counter() - start)
+            else:
+                self.stdout.write(f"{endpoint.url}: block {int(response['result'], 16)}")
+
+        self.stdout.write(json.dumps(get_metrics(), indent=2))
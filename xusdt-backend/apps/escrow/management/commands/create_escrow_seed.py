@@ -0,0 +1,40 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from eth_account.hdaccount import generate_mnemonic, seed_from_mnemonic
+
+from apps.escrow import hd
+from apps.escrow.exceptions import WalletError
+
+
+class Command(BaseCommand):
+    help = (
+        "Create (or import) the BIP-39 seed escrow keys are derived from and "
+        "print the ESCROW_HD_SEED_ENC value, encrypted with ESCROW_WALLET_ENCRYPTION_KEY. "
+        "Write the mnemonic down offline: it is the backup of every HD escrow key."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mnemonic', help="Import an existing mnemonic instead of generating one")
+        parser.add_argument('--words', type=int, default=24, choices=[12, 15, 18, 21, 24])
+        parser.add_argument('--passphrase', default='', help="Optional BIP-39 passphrase")
+
+    def handle(self, *args, **options):
+        if settings.ESCROW_HD_SEED_ENC and not options['mnemonic']:
+            raise CommandError("ESCROW_HD_SEED_ENC is already set; replacing it would orphan the derived escrows")
+
+        mnemonic = options['mnemonic'] or generate_mnemonic(options['words'], 'english')
+        try:
+            seed_enc = hd.encrypt_seed(seed_from_mnemonic(mnemonic, options['passphrase']))
+            with override_settings(ESCROW_HD_SEED_ENC=seed_enc):
+                hd.reset()
+                first = hd.derive_address(0)
+        except (WalletError, ValueError) as e:
+            raise CommandError(str(e))
+        finally:
+            hd.reset()
+
+        if not options['mnemonic']:
+            self.stdout.write(f"Mnemonic: {mnemonic}")
+        self.stdout.write(f"Path: {settings.ESCROW_HD_PATH}/<index>, index 0 = {first}")
+        self.stdout.write(f"ESCROW_HD_SEED_ENC={seed_enc}")
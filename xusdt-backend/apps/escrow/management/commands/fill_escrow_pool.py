@@ -0,0 +1,44 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.escrow import key_pool
+from apps.escrow.exceptions import WalletError
+
+
+class Command(BaseCommand):
+    help = (
+        "Keep the pre-generated escrow key pool filled: whenever the free keys "
+        "drop below ESCROW_KEY_POOL_LOW_WATER, generate encrypted keypairs in "
+        "batches up to ESCROW_KEY_POOL_SIZE."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, help="Free keys to fill up to (defaults to ESCROW_KEY_POOL_SIZE)")
+        parser.add_argument('--batch-size', type=int, help="Keys per bulk insert")
+        parser.add_argument('--poll-interval', type=float, default=5.0, help="Seconds between pool checks")
+        parser.add_argument('--once', action='store_true', help="Fill up to --size once and exit")
+        parser.add_argument('--stats', action='store_true', help="Print pool metrics and exit")
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self.stdout.write(json.dumps(key_pool.get_metrics(), indent=2))
+            return
+
+        try:
+            while True:
+                try:
+                    if options['once'] or key_pool.needs_fill():
+                        added = key_pool.fill(size=options['size'], batch_size=options['batch_size'])
+                        if added:
+                            self.stdout.write(f"{added} keys added, {key_pool.available()} free")
+                except WalletError as e:
+                    raise CommandError(str(e))
+                except Exception as e:
+                    self.stderr.write(f"Pool fill failed: {e}")
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Escrow key pool filler stopped")
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.chain import get_web3
+from apps.escrow.gas import GasOracle
+
+
+class Command(BaseCommand):
+    help = "Sample eth_feeHistory on a schedule and keep the cached fee estimates fresh."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rpc-url', help="Defaults to settings.WEB3_RPC_URL")
+        parser.add_argument('--interval', type=float, help="Seconds between samples, defaults to GAS_ORACLE_TTL / 2")
+        parser.add_argument('--once', action='store_true', help="Sample once, print and exit")
+
+    def handle(self, *args, **options):
+        w3 = get_web3(urls=[options['rpc_url']] if options['rpc_url'] else None)
+        oracle = GasOracle(w3)
+        interval = options['interval'] or oracle.ttl / 2
+
+        try:
+            while True:
+                try:
+                    sample = oracle.refresh()
+                    self.stdout.write(
+                        f"block {sample['block']}: base fee {sample['base_fee']} wei, "
+                        f"tips {sample['priority_fees']}"
+                    )
+                except Exception as e:
+                    self.stderr.write(f"Fee history sample failed: {e}")
+                if options['once']:
+                    return
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            self.stdout.write("Gas oracle stopped")
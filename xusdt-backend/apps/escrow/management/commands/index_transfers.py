@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.chain import get_web3
+from apps.escrow.indexer import TransferIndexer
+from apps.escrow.services import USDT
+
+
+class Command(BaseCommand):
+    help = "Index USDT Transfer logs into escrow addresses and fund escrows from them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rpc-url', help="Defaults to settings.WEB3_RPC_URL")
+        parser.add_argument('--poll-interval', type=float, default=5.0, help="Seconds between runs")
+        parser.add_argument('--confirmations', type=int, help="Defaults to XUSDT_SETTINGS['TRANSFER_CONFIRMATIONS']")
+        parser.add_argument('--from-block', type=int, help="Move the cursor to this block before starting")
+        parser.add_argument('--once', action='store_true', help="Index once and exit")
+
+    def handle(self, *args, **options):
+        token = USDT
+        if options['rpc_url']:
+            w3 = get_web3(urls=[options['rpc_url']])
+            token = w3.eth.contract(address=USDT.address, abi=USDT.abi)
+
+        indexer = TransferIndexer(token=token, confirmations=options['confirmations'])
+        if options['from_block'] is not None:
+            indexer.reset(options['from_block'])
+
+        try:
+            while True:
+                try:
+                    funded = indexer.run_once()
+                    if funded:
+                        self.stdout.write(f"{funded} escrow(s) funded")
+                except Exception as e:
+                    self.stderr.write(f"Indexing failed: {e}")
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Transfer indexer stopped")
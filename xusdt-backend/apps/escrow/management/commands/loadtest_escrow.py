@@ -0,0 +1,282 @@
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from urllib.parse import urlencode
+
+from cryptography.fernet import Fernet
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import (
+    override_settings,
+    setup_databases,
+    setup_test_environment,
+    teardown_databases,
+    teardown_test_environment,
+)
+from django.utils import timezone
+from eth_account import Account
+
+from apps.core import chain
+from apps.escrow.indexer import TransferIndexer
+from apps.escrow.mock_node import MockNode, drop_node, get_node
+from apps.escrow.models import EscrowWallet, SystemWallet, TransactionQueue, TransferIndexCursor
+from apps.escrow.services import USDT_DECIMALS, create_escrow_wallet, enqueue_release
+from apps.escrow.tx_queue import TxQueueWorker
+from apps.p2p.models import P2PListing, P2PTrade
+from apps.p2p.state_machine import trade_machine
+from apps.p2p.trades import create_trade
+
+AMOUNT = Decimal('100')
+UNITS = int(AMOUNT * 10 ** USDT_DECIMALS)
+ETH = 10 ** 18
+
+
+class Command(BaseCommand):
+    help = (
+        "End-to-end escrow load test on the offline chain simulator: fund, trade "
+        "and release escrows through the transfer indexer and the transaction "
+        "queue worker, and report the throughput of each phase. Runs against a "
+        "throwaway test database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escrows', type=int, default=1000, help="Escrows taken through the whole flow")
+        parser.add_argument('--block-time', type=float, default=0.0,
+                            help="Seconds per block; 0 mines one block per indexer/worker round")
+        parser.add_argument('--latency-ms', type=float, default=0.0, help="Delay added to every RPC request")
+        parser.add_argument('--failure-rate', type=float, default=0.0, help="Share of RPC requests dropped")
+        parser.add_argument('--seed', type=int, default=0, help="Seed for accounts and injected failures")
+        parser.add_argument('--batch-size', type=int, default=200,
+                            help="Deposits per block and rows the queue worker claims per run")
+        parser.add_argument('--http', action='store_true',
+                            help="Serve the simulator over HTTP instead of calling it in process")
+        parser.add_argument('--timeout', type=float, default=600.0, help="Seconds allowed for each chain phase")
+
+    def handle(self, *args, **options):
+        if options['escrows'] < 1:
+            raise CommandError("--escrows must be at least 1")
+        if not 0 <= options['failure_rate'] < 1:
+            raise CommandError("--failure-rate must be in [0, 1)")
+
+        node, url, stop = self._start_node(options)
+        xusdt = dict(settings.XUSDT_SETTINGS, TX_RETRY_BACKOFF=0, RPC_COOLDOWN=0)
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        logging.disable(logging.WARNING)  # injected failures would log every retry
+        try:
+            with override_settings(
+                WEB3_RPC_URL=url,
+                WEB3_RPC_FALLBACK_URLS=[],
+                CHAIN_ID=node.chain_id,
+                SYSTEM_WALLET_ENCRYPTION_KEY=Fernet.generate_key().decode(),
+                ESCROW_WALLET_ENCRYPTION_KEY=Fernet.generate_key().decode(),
+                XUSDT_SETTINGS=xusdt,
+            ):
+                chain.reset()
+                phases, releases = self._run(node, options)
+                outcome = self._verify(node, releases)
+        finally:
+            logging.disable(logging.NOTSET)
+            chain.reset()
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+            stop()
+
+        self._report(phases, outcome, node, options)
+
+    def _start_node(self, options):
+        """The simulator, the URL the chain client should use, and a stop callback."""
+        if not options['http']:
+            url = "sim://loadtest?" + urlencode({
+                'latency_ms': options['latency_ms'],
+                'failure_rate': options['failure_rate'],
+                'seed': options['seed'],
+                'block_time': options['block_time'],
+            })
+            drop_node(url)
+            return get_node(url), url, lambda: drop_node(url)
+
+        node = MockNode(
+            settings.USDT_ADDR,
+            chain_id=settings.CHAIN_ID,
+            latency=options['latency_ms'] / 1000,
+            failure_rate=options['failure_rate'],
+            seed=options['seed'],
+        )
+        server, url = node.serve_in_thread()
+        mining = threading.Event()
+        if options['block_time'] > 0:
+            threading.Thread(target=node.auto_mine, args=(options['block_time'], mining), daemon=True).start()
+
+        def stop():
+            mining.set()
+            server.shutdown()
+
+        return node, url, stop
+
+    # ------------------------------------------------------------------ #
+    # Phases                                                             #
+    # ------------------------------------------------------------------ #
+
+    def _run(self, node, options):
+        count = options['escrows']
+        rng = random.Random(options['seed'])
+        self.errors = 0
+        phases = []
+
+        system = Account.from_key(rng.randbytes(32))
+        SystemWallet.objects.create(
+            address=system.address,
+            private_key_enc=SystemWallet.encrypt_private_key(system.key.hex()),
+        )
+        node.set_eth_balance(system.address, count * ETH)
+        node.set_token_balance(system.address, count * UNITS)  # pays out the releases
+        merchant = '0x' + rng.randbytes(20).hex()
+        node.set_token_balance(merchant, count * UNITS)
+
+        started = time.perf_counter()
+        listings = self._create(count)
+        phases.append(('create', count, time.perf_counter() - started))
+
+        started = time.perf_counter()
+        self._fund(node, listings, merchant, options)
+        phases.append(('fund', count, time.perf_counter() - started))
+
+        started = time.perf_counter()
+        releases = self._trade(listings, rng)
+        phases.append(('trade', count, time.perf_counter() - started))
+
+        started = time.perf_counter()
+        self._settle(node, options)
+        phases.append(('release', len(releases), time.perf_counter() - started))
+        return phases, releases
+
+    def _create(self, count):
+        expires_at = timezone.now() + timedelta(days=1)
+        wallets = []
+        for n in range(count):
+            wallet = create_escrow_wallet()
+            wallet.user_token = f"loadtest-seller-{n}"
+            wallet.balance_commitment = '0' * 64
+            wallet.amount = AMOUNT
+            wallet.expected_amount = AMOUNT
+            wallets.append(wallet)
+        EscrowWallet.objects.bulk_create(wallets)
+        return P2PListing.objects.bulk_create([
+            P2PListing(
+                seller_token=wallet.user_token,
+                crypto_type='sell',
+                fiat_currency='USD',
+                payment_method=1,
+                usdt_amount=AMOUNT,
+                crypto_amount=AMOUNT,
+                escrow_wallet=wallet,
+                status=1,
+                expires_at=expires_at,
+            )
+            for wallet in wallets
+        ])
+
+    def _fund(self, node, listings, merchant, options):
+        """Merchant deposits land on chain; the indexer marks escrows and listings funded."""
+        indexer = TransferIndexer()
+        # Place the cursor before the deposits
+        cursor = TransferIndexCursor.objects.all()
+        self._until(node, options, 'index', cursor.exists, indexer.run_once)
+        for start in range(0, len(listings), options['batch_size']):
+            for listing in listings[start:start + options['batch_size']]:
+                node.transfer(merchant, listing.escrow_wallet.address, UNITS)
+            if not options['block_time']:
+                node.mine()
+
+        funded = EscrowWallet.objects.filter(status=EscrowWallet.STATUS_FUNDED)
+        self._until(node, options, 'fund', lambda: funded.count() >= len(listings), indexer.run_once)
+
+    def _trade(self, listings, rng):
+        """Buyers take every listing, mark it paid and the seller queues the release."""
+        releases = {}
+        for n, listing in enumerate(listings):
+            buyer = f"loadtest-buyer-{n}"
+            trade = create_trade(listing.pk, buyer, '0x' + rng.randbytes(32).hex())
+            trade_machine.transition(trade, 'mark_paid', actor=buyer)
+            buyer_address = '0x' + rng.randbytes(20).hex()
+            enqueue_release(
+                trade.listing.escrow_wallet,
+                buyer_address,
+                trade.usdt_amount - trade.fee_amount,
+                trade.fee_amount,
+                trade=trade,
+            )
+            releases[buyer_address] = trade.usdt_amount - trade.fee_amount
+        return releases
+
+    def _settle(self, node, options):
+        worker = TxQueueWorker(batch_size=options['batch_size'])
+        open_rows = TransactionQueue.objects.filter(
+            status__in=[TransactionQueue.PENDING, TransactionQueue.PROCESSING]
+        )
+        self._until(node, options, 'release', lambda: not open_rows.exists(), worker.run_once)
+
+    def _until(self, node, options, phase, done, step):
+        """Run `step` every block until `done()`; dropped requests are counted and retried."""
+        deadline = time.monotonic() + options['timeout']
+        while True:
+            try:
+                step()
+            except Exception:
+                self.errors += 1
+            if done():
+                return
+            if time.monotonic() > deadline:
+                raise CommandError(f"{phase} phase did not finish within {options['timeout']:.0f}s")
+            if options['block_time']:
+                time.sleep(min(options['block_time'], 0.05))
+            else:
+                node.mine()
+
+    # ------------------------------------------------------------------ #
+    # Results                                                            #
+    # ------------------------------------------------------------------ #
+
+    def _verify(self, node, releases):
+        paid = sum(
+            1 for address, amount in releases.items()
+            if node.token_balance(address) == int(amount * 10 ** USDT_DECIMALS)
+        )
+        return {
+            'released': EscrowWallet.objects.filter(status=EscrowWallet.STATUS_RELEASED).count(),
+            'completed': P2PTrade.objects.filter(status=3).count(),
+            'listings_completed': P2PListing.objects.filter(status=4).count(),
+            'failed_txs': TransactionQueue.objects.filter(status=TransactionQueue.FAILED).count(),
+            'paid_out': paid,
+        }
+
+    def _report(self, phases, outcome, node, options):
+        count = options['escrows']
+        mode = 'http' if options['http'] else 'in-process'
+        self.stdout.write(
+            f"{count} escrows, {mode} simulator, block_time={options['block_time']}s, "
+            f"latency={options['latency_ms']}ms, failure_rate={options['failure_rate']}"
+        )
+        self.stdout.write(f"{'phase':<10}{'ops':>8}{'seconds':>10}{'ops/s':>10}")
+        total = 0.0
+        for name, ops, seconds in phases:
+            total += seconds
+            self.stdout.write(f"{name:<10}{ops:>8}{seconds:>10.2f}{ops / seconds if seconds else 0:>10.1f}")
+        self.stdout.write(f"{'total':<10}{count:>8}{total:>10.2f}{count / total if total else 0:>10.1f}")
+
+        methods = ', '.join(f"{method}={n}" for method, n in node.method_counts.most_common(6))
+        self.stdout.write(
+            f"chain: {node.block_number} blocks, {node.http_requests} requests "
+            f"({node.failures} dropped, {self.errors} failed rounds retried); {methods}"
+        )
+        self.stdout.write(', '.join(f"{key}={value}" for key, value in outcome.items()))
+
+        if outcome['released'] != count or outcome['completed'] != count or outcome['paid_out'] != count:
+            raise CommandError(f"Only {outcome['released']} of {count} escrows were released end to end")
+        self.stdout.write(self.style.SUCCESS(
+            f"{count} escrows funded, traded and released in {total:.1f}s ({count / total:.1f} escrows/s)"
+        ))
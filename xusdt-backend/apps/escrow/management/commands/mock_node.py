@@ -0,0 +1,45 @@
+import threading
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.escrow.mock_node import MockNode
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a local mock JSON-RPC node for offline work on the escrow flows. "
+        "Point WEB3_RPC_URL at it and drive balances with mock_setTokenBalance / evm_mine."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8545)
+        parser.add_argument('--chain-id', type=int, default=1337)
+        parser.add_argument('--block-time', type=float, default=2.0, help="Seconds per block, 0 to mine manually")
+        parser.add_argument('--latency-ms', type=float, default=0.0, help="Delay added to every request")
+        parser.add_argument('--failure-rate', type=float, default=0.0, help="Share of requests answered with HTTP 503")
+        parser.add_argument('--seed', type=int, default=0, help="Seed for the injected failures")
+
+    def handle(self, *args, **options):
+        node = MockNode(
+            token_address=settings.USDT_ADDR,
+            chain_id=options['chain_id'],
+            latency=options['latency_ms'] / 1000,
+            failure_rate=options['failure_rate'],
+            seed=options['seed'],
+        )
+        server = node.make_server(options['host'], options['port'])
+
+        stop = threading.Event()
+        if options['block_time'] > 0:
+            threading.Thread(target=node.auto_mine, args=(options['block_time'], stop), daemon=True).start()
+
+        self.stdout.write(f"Mock node listening on http://{options['host']}:{options['port']}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            stop.set()
+            server.server_close()
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.chain import get_web3
+from apps.escrow.services import USDT
+from apps.escrow.tx_queue import TxQueueWorker
+
+
+class Command(BaseCommand):
+    help = "Submit queued escrow transactions and track their receipts."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rpc-url', help="Defaults to settings.WEB3_RPC_URL")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds between runs")
+        parser.add_argument('--batch-size', type=int, help="Rows claimed per run")
+        parser.add_argument('--once', action='store_true', help="Run once and exit")
+
+    def handle(self, *args, **options):
+        token = USDT
+        if options['rpc_url']:
+            w3 = get_web3(urls=[options['rpc_url']])
+            token = w3.eth.contract(address=USDT.address, abi=USDT.abi)
+
+        worker = TxQueueWorker(token=token, batch_size=options['batch_size'])
+        try:
+            while True:
+                try:
+                    submitted, finished = worker.run_once()
+                    if submitted or finished:
+                        self.stdout.write(f"{submitted} submitted, {finished} finished")
+                except Exception as e:
+                    self.stderr.write(f"Queue run failed: {e}")
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Transaction queue worker stopped")
@@ -0,0 +1,47 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from web3 import Web3
+
+from apps.core.chain import get_web3
+from apps.escrow.services import USDT
+from apps.escrow.sweep import SweepEngine
+
+
+class Command(BaseCommand):
+    help = "Sweep leftover USDT from released escrows into the system wallet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rpc-url', help="Defaults to settings.WEB3_RPC_URL")
+        parser.add_argument('--batch-size', type=int, help="Max transactions per run")
+        parser.add_argument('--gas-budget', type=Decimal, help="Max fees per run in ETH")
+        parser.add_argument('--workers', type=int, default=4, help="Signing threads")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be sent and its cost")
+
+    def handle(self, *args, **options):
+        token = USDT
+        if options['rpc_url']:
+            w3 = get_web3(urls=[options['rpc_url']])
+            token = w3.eth.contract(address=USDT.address, abi=USDT.abi)
+
+        budget = options['gas_budget']
+        engine = SweepEngine(
+            token=token,
+            batch_size=options['batch_size'],
+            gas_budget_wei=Web3.to_wei(budget, 'ether') if budget is not None else None,
+            workers=options['workers'],
+        )
+        report = engine.run(dry_run=options['dry_run'])
+
+        prefix = "[dry run] " if options['dry_run'] else ""
+        self.stdout.write(
+            f"{prefix}scanned {report.scanned} escrows, {report.empty} empty, "
+            f"{report.deferred} deferred by batch size / gas budget, "
+            f"{report.waiting} waiting for a gas top-up"
+        )
+        self.stdout.write(
+            f"{prefix}{report.sweeps} sweeps ({report.usdt} USDT), {report.topups} gas top-ups, "
+            f"estimated fees {Web3.from_wei(report.estimated_fee_wei, 'ether')} ETH"
+        )
+        if not options['dry_run']:
+            self.stdout.write(f"{report.submitted} submitted, {report.failed} failed")
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.core.chain import get_web3
+from apps.escrow.tx_status import TxStatusTracker
+
+
+class Command(BaseCommand):
+    help = (
+        "Publish the head block number for transaction status lookups and record "
+        "receipts of tracked hashes until they are final. Run a single instance per chain."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chain-id', type=int, help="Chain to follow; defaults to settings.CHAIN_ID")
+        parser.add_argument('--rpc-url', help="Defaults to the chain's configured endpoints")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds between head checks")
+        parser.add_argument('--batch-size', type=int, help="Defaults to XUSDT_SETTINGS['TX_STATUS_BATCH_SIZE']")
+        parser.add_argument('--once', action='store_true', help="Check the head once and exit")
+
+    def handle(self, *args, **options):
+        w3 = get_web3(urls=[options['rpc_url']]) if options['rpc_url'] else None
+        tracker = TxStatusTracker(w3=w3, chain_id=options['chain_id'], batch_size=options['batch_size'])
+
+        try:
+            while True:
+                try:
+                    changed = tracker.run_once()
+                    if changed:
+                        self.stdout.write(f"Block {tracker.last_head}: {changed} transaction status(es) updated")
+                except Exception as e:
+                    self.stderr.write(f"Tracking failed: {e}")
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Transaction status tracker stopped")
@@ -0,0 +1,26 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from apps.escrow.watcher import DepositWatcher
+
+
+class Command(BaseCommand):
+    help = "Watch escrow wallets in 'created' status and mark them funded once their deposit arrives."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rpc-url', help="Defaults to settings.WEB3_RPC_URL")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds between block checks")
+        parser.add_argument('--batch-size', type=int, help="balanceOf calls per JSON-RPC batch")
+        parser.add_argument('--once', action='store_true', help="Scan a single time and exit")
+
+    def handle(self, *args, **options):
+        watcher = DepositWatcher(
+            rpc_url=options['rpc_url'],
+            poll_interval=options['poll_interval'],
+            batch_size=options['batch_size'],
+        )
+        try:
+            asyncio.run(watcher.run(once=options['once']))
+        except KeyboardInterrupt:
+            self.stdout.write("Deposit watcher stopped")
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0003_alter_escrowwallet_buyer_address_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='escrowwallet',
+            name='expected_amount',
+            field=models.DecimalField(blank=True, decimal_places=6, help_text='Minimum deposit (USDT) the deposit watcher waits for', max_digits=20, null=True),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-17 00:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0004_escrowwallet_expected_amount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TransferIndexCursor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=32, unique=True)),
+                ('last_block', models.PositiveBigIntegerField()),
+                ('last_block_hash', models.CharField(blank=True, max_length=66, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TokenTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tx_hash', models.CharField(max_length=66)),
+                ('log_index', models.PositiveIntegerField()),
+                ('block_number', models.PositiveBigIntegerField()),
+                ('block_hash', models.CharField(max_length=66)),
+                ('from_address', models.CharField(max_length=42)),
+                ('to_address', models.CharField(max_length=42)),
+                ('value', models.DecimalField(decimal_places=0, help_text='Raw token units', max_digits=78)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('escrow', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transfers', to='escrow.escrowwallet')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['block_number'], name='idx_transfer_block')],
+                'constraints': [models.UniqueConstraint(fields=('tx_hash', 'log_index'), name='uniq_transfer_log')],
+            },
+        ),
+    ]
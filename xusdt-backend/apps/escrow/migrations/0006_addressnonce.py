@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-17 00:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0005_transfer_indexer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AddressNonce',
+            fields=[
+                ('address', models.CharField(max_length=42, primary_key=True, serialize=False)),
+                ('next_nonce', models.PositiveBigIntegerField()),
+                ('synced_at', models.DateTimeField(help_text='Last time next_nonce was read from the chain')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
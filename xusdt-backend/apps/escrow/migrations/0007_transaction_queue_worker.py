@@ -0,0 +1,80 @@
+# Generated by Django 5.2.1 on 2026-10-17 00:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0006_addressnonce'),
+        ('p2p', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionqueue',
+            name='amount',
+            field=models.DecimalField(decimal_places=6, default=0, help_text='Amount in USDT', max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='transactionqueue',
+            name='escrow',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='escrow.escrowwallet'),
+        ),
+        migrations.AddField(
+            model_name='transactionqueue',
+            name='fee',
+            field=models.DecimalField(decimal_places=6, default=0, help_text='System fee in USDT', max_digits=20),
+        ),
+        migrations.AddField(
+            model_name='transactionqueue',
+            name='last_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='transactionqueue',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='transactionqueue',
+            name='nonce',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transactionqueue',
+            name='submitted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transactionqueue',
+            name='to_address',
+            field=models.CharField(blank=True, default='', max_length=42),
+        ),
+        migrations.AddField(
+            model_name='transactionqueue',
+            name='trade',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='p2p.p2ptrade'),
+        ),
+        migrations.AlterField(
+            model_name='escrowwallet',
+            name='status',
+            field=models.CharField(choices=[('created', 'Created'), ('funded', 'Funded'), ('releasing', 'Releasing'), ('released', 'Released'), ('disputed', 'Disputed')], default='created', help_text='Current status of the escrow', max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='systemwallet',
+            name='private_key_enc',
+            field=models.TextField(help_text='Fernet-encrypted private key'),
+        ),
+        migrations.AlterField(
+            model_name='transactionqueue',
+            name='tx_hash',
+            field=models.CharField(blank=True, default='', max_length=66),
+        ),
+        migrations.AddIndex(
+            model_name='transactionqueue',
+            index=models.Index(fields=['status', 'next_attempt_at'], name='idx_txqueue_due'),
+        ),
+    ]
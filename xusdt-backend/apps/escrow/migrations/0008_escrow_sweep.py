@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-17 00:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0007_transaction_queue_worker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='escrowwallet',
+            name='private_key_enc',
+            field=models.TextField(blank=True, help_text='Fernet-encrypted private key, needed to sweep leftovers', null=True),
+        ),
+        migrations.AddField(
+            model_name='escrowwallet',
+            name='swept_at',
+            field=models.DateTimeField(blank=True, help_text='When leftover funds were last swept to the system wallet', null=True),
+        ),
+        migrations.AlterField(
+            model_name='escrowauditlog',
+            name='action',
+            field=models.CharField(choices=[('CREATE', 'Create'), ('FUND', 'Fund'), ('RELEASE', 'Release'), ('DISPUTE', 'Dispute'), ('SWEEP', 'Sweep')], max_length=10),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-17 00:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0008_escrow_sweep'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='escrowauditlog',
+            name='action',
+            field=models.CharField(choices=[('CREATE', 'Create'), ('FUND', 'Fund'), ('RELEASE', 'Release'), ('DISPUTE', 'Dispute'), ('SWEEP', 'Sweep'), ('EXPIRE', 'Expire')], max_length=10),
+        ),
+        migrations.AlterField(
+            model_name='escrowwallet',
+            name='status',
+            field=models.CharField(choices=[('created', 'Created'), ('funded', 'Funded'), ('releasing', 'Releasing'), ('released', 'Released'), ('disputed', 'Disputed'), ('expired', 'Expired')], default='created', help_text='Current status of the escrow', max_length=10),
+        ),
+    ]
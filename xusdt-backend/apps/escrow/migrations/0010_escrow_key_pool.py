@@ -0,0 +1,26 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0009_escrow_expired_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EscrowKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(help_text='ETH address', max_length=42, unique=True)),
+                ('private_key_enc', models.TextField(help_text='Fernet-encrypted private key')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('claimed_at__isnull', True)), fields=['id'], name='idx_escrowkey_free')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0010_escrow_key_pool'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='escrowkey',
+            name='derivation_index',
+            field=models.PositiveIntegerField(blank=True, help_text='Child index under ESCROW_HD_PATH, for HD-derived keys', null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='escrowwallet',
+            name='derivation_index',
+            field=models.PositiveIntegerField(blank=True, help_text='Child index under ESCROW_HD_PATH; the key is derived from the HD seed, not stored', null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='escrowkey',
+            name='private_key_enc',
+            field=models.TextField(blank=True, help_text='Fernet-encrypted private key, for random keys'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0011_escrow_hd_derivation'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TxStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tx_hash', models.CharField(help_text='Lowercase 0x-prefixed hash', max_length=66, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('success', 'Success'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('block_number', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('block_hash', models.CharField(blank=True, default='', max_length=66)),
+                ('gas_used', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('final', models.BooleanField(default=False, help_text='Receipt re-checked at TX_FINALITY_CONFIRMATIONS deep')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Tx statuses',
+                'indexes': [models.Index(condition=models.Q(('final', False)), fields=['status', 'created_at'], name='idx_txstatus_open')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0012_tx_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReleasedNonce',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(max_length=42)),
+                ('nonce', models.PositiveBigIntegerField()),
+                ('released_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('address', 'nonce'), name='uniq_released_nonce')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-17 01:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0013_released_nonce'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionqueue',
+            name='max_fee_per_gas',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transactionqueue',
+            name='max_priority_fee_per_gas',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='transactionqueue',
+            name='replaced_hashes',
+            field=models.JSONField(blank=True, default=list, help_text='Earlier hashes of this nonce, any of which may be mined'),
+        ),
+        migrations.AddField(
+            model_name='transactionqueue',
+            name='replacements',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+    ]
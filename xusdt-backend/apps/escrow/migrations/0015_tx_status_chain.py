@@ -0,0 +1,44 @@
+# Generated by Django 5.2.1 on 2026-10-17 03:10
+
+from django.db import migrations, models
+
+
+def forget_statuses(apps, schema_editor):
+    # Rows so far were all read on CHAIN_ID, whatever chain the hash belonged to,
+    # and include unmined and foreign hashes. They are only a cache; lookups rebuild them.
+    apps.get_model('escrow', 'TxStatus').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0014_tx_queue_replacements'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChainHead',
+            fields=[
+                ('chain_id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('block_number', models.PositiveBigIntegerField()),
+                ('subscriber', models.BooleanField(default=False, help_text='Published by manage.py track_tx_status')),
+                ('updated_at', models.DateTimeField()),
+            ],
+        ),
+        migrations.RunPython(forget_statuses, migrations.RunPython.noop),
+        migrations.AddField(
+            model_name='txstatus',
+            name='chain_id',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='txstatus',
+            name='tx_hash',
+            field=models.CharField(help_text='Lowercase 0x-prefixed hash', max_length=66),
+        ),
+        migrations.AddConstraint(
+            model_name='txstatus',
+            constraint=models.UniqueConstraint(fields=('chain_id', 'tx_hash'), name='uniq_txstatus_chain_hash'),
+        ),
+    ]
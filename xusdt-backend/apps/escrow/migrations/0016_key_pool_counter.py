@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-17 02:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0015_tx_status_chain'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KeyPoolCounter',
+            fields=[
+                ('name', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
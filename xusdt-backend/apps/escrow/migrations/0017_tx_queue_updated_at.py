@@ -0,0 +1,20 @@
+# Generated by Django 5.2.1 on 2026-10-17 02:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0016_key_pool_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transactionqueue',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
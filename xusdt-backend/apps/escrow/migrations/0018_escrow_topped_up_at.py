@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 02:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0017_tx_queue_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='escrowwallet',
+            name='topped_up_at',
+            field=models.DateTimeField(blank=True, help_text='When the sweep last sent gas to this escrow', null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-17 02:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0018_escrow_topped_up_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GasSample',
+            fields=[
+                ('chain_id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('base_fee', models.PositiveBigIntegerField(help_text='Base fee of the next block, in wei')),
+                ('priority_fees', models.JSONField(help_text='Median tip per speed, in wei')),
+                ('block', models.PositiveBigIntegerField()),
+                ('sampled_at', models.DateTimeField()),
+            ],
+        ),
+    ]
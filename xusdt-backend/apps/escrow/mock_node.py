@@ -0,0 +1,592 @@
+"""
+Minimal Ethereum JSON-RPC stand-in for running the escrow chain code offline.
+
+It answers the handful of methods the escrow services use (block number,
+`balanceOf` eth_calls against the configured USDT address, Transfer logs) and
+exposes a few `mock_*` control methods so balances, transfers, blocks and
+reorgs can be driven from a shell, a management command or another process.
+
+The token behaves like USDT: 6 decimals, `transfer`, `balanceOf`,
+`totalSupply`, `symbol` and `name`. Blocks are mined on demand or every
+`block_time` seconds (`auto_mine`). A pending transaction can be replaced
+with one that has the same nonce and 10% higher fees, and `mock_dropPending`
+evicts every pending transaction. `latency` delays every request and
+`failure_rate` drops that share of them as transport errors (HTTP 503, or
+SimulatedFailure in process), drawn from a seeded generator so runs repeat.
+
+Besides serving HTTP, a node can run inside the process: endpoint URLs of
+the form `sim://<name>?latency_ms=..&failure_rate=..&block_time=..&seed=..`
+are answered by `get_node(url)` through SimProvider / AsyncSimProvider
+(see apps.core.chain), with no socket in between. Nodes are per process.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from eth_account import Account
+from eth_account._utils.legacy_transactions import Transaction
+from eth_account.typed_transactions import TypedTransaction
+from eth_utils import keccak
+from hexbytes import HexBytes
+from web3.providers import JSONBaseProvider
+from web3.providers.async_base import AsyncJSONBaseProvider
+
+logger = logging.getLogger(__name__)
+
+BALANCE_OF_SELECTOR = "0x70a08231"
+TRANSFER_SELECTOR = "0xa9059cbb"
+DECIMALS_SELECTOR = "0x313ce567"
+TOTAL_SUPPLY_SELECTOR = "0x18160ddd"
+SYMBOL_SELECTOR = "0x95d89b41"
+NAME_SELECTOR = "0x06fdde03"
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+
+
+def _hex(value: int) -> str:
+    return hex(value)
+
+
+def _word(value: int) -> str:
+    return "0x" + value.to_bytes(32, "big").hex()
+
+
+def _string(value: str) -> str:
+    """ABI-encode a single string return value."""
+    data = value.encode()
+    padded = data.ljust((len(data) + 31) // 32 * 32, b"\0")
+    return _word(32) + _word(len(data))[2:] + padded.hex()
+
+
+def _address_topic(address: str) -> str:
+    return "0x" + address.lower().replace("0x", "").rjust(64, "0")
+
+
+def _decode_raw_transaction(raw: str) -> dict:
+    data = HexBytes(raw)
+    if data[0] <= 0x7f:
+        fields = TypedTransaction.from_bytes(data).as_dict()
+    else:
+        fields = Transaction.from_bytes(data).as_dict()
+    return {
+        "hash": "0x" + keccak(data).hex(),
+        "from": Account.recover_transaction(data).lower(),
+        "to": "0x" + bytes(fields["to"]).hex() if fields.get("to") else None,
+        "nonce": fields["nonce"],
+        "data": "0x" + bytes(fields.get("data") or b"").hex(),
+        "gas": fields["gas"],
+        "value": fields.get("value", 0),
+        "max_fee": fields.get("maxFeePerGas", fields.get("gasPrice", 0)),
+        "tip": fields.get("maxPriorityFeePerGas", fields.get("gasPrice", 0)),
+        "type": fields.get("type", 0),
+    }
+
+
+def _block_arg(value, latest: int) -> int:
+    if value in (None, "latest", "safe", "finalized", "pending"):
+        return latest
+    if value == "earliest":
+        return 0
+    return int(value, 16) if isinstance(value, str) else int(value)
+
+
+class RPCError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class SimulatedFailure(ConnectionError):
+    """A transport error injected by `failure_rate`."""
+
+
+class MockNode:
+    def __init__(self, token_address: str, chain_id: int = 1337, latency: float = 0.0,
+                 failure_rate: float = 0.0, seed: int = 0):
+        self.token_address = token_address.lower()
+        self.chain_id = chain_id
+        self.latency = latency  # seconds added to every request
+        self.failure_rate = failure_rate  # share of requests dropped
+        self.failures = 0
+        self._random = random.Random(seed)
+        self.block_number = 0
+        self.block_times = {0: int(time.time())}  # wall-clock seconds a block was mined
+        self.balances = {}
+        self.eth_balances = Counter()
+        self.logs = []
+        self.pending_logs = []
+        self.forks = Counter()
+        self.nonces = Counter()
+        self.pending_txs = []
+        self.receipts = {}
+        self.base_fee = 10**9
+        self.priority_fee = 10**9
+        self.method_counts = Counter()
+        self.http_requests = 0
+        self._lock = threading.RLock()
+
+    # ------------------------------------------------------------------ #
+    # State helpers                                                      #
+    # ------------------------------------------------------------------ #
+
+    def set_token_balance(self, address: str, value: int):
+        with self._lock:
+            self.balances[address.lower()] = int(value)
+
+    def set_eth_balance(self, address: str, value: int):
+        with self._lock:
+            self.eth_balances[address.lower()] = int(value)
+
+    def token_balance(self, address: str) -> int:
+        with self._lock:
+            return self.balances.get(address.lower(), 0)
+
+    def transfer(self, sender: str, to: str, value: int, tx_hash: str = None) -> str:
+        """Move tokens and queue a Transfer log for the next mined block."""
+        with self._lock:
+            sender, to, value = sender.lower(), to.lower(), int(value)
+            self.balances[sender] = self.balances.get(sender, 0) - value
+            self.balances[to] = self.balances.get(to, 0) + value
+            tx_hash = tx_hash or "0x" + hashlib.sha256(
+                f"{sender}:{to}:{value}:{len(self.logs) + len(self.pending_logs)}".encode()
+            ).hexdigest()
+            self.pending_logs.append({"from": sender, "to": to, "value": value, "tx_hash": tx_hash})
+            return tx_hash
+
+    def send_transaction(self, tx: dict) -> str:
+        """Apply a decoded transaction and queue its receipt for the next block."""
+        with self._lock:
+            sender = tx["from"]
+            replaced = next(
+                (p for p in self.pending_txs if p["from"] == sender and p["nonce"] == tx["nonce"]), None
+            )
+            if replaced is not None:
+                if replaced["hash"] == tx["hash"]:
+                    raise RPCError(-32000, "already known")
+                # Like geth: a pending transaction is only replaced for 10% more on both fees
+                if tx["max_fee"] * 10 < replaced["max_fee"] * 11 or tx["tip"] * 10 < replaced["tip"] * 11:
+                    raise RPCError(-32000, "replacement transaction underpriced")
+            elif tx["nonce"] < self.nonces[sender]:
+                raise RPCError(-32000, "nonce too low")
+            elif tx["nonce"] > self.nonces[sender]:
+                raise RPCError(-32000, "nonce too high")
+            # Gas is charged at the full limit, which is close enough here
+            gas_price = min(tx["max_fee"], self.base_fee + tx["tip"])
+            cost = tx["gas"] * gas_price
+            refund = replaced["cost"] + replaced["value"] if replaced else 0
+            if self.eth_balances[sender] + refund < cost + tx["value"]:
+                raise RPCError(-32000, "insufficient funds for gas * price + value")
+            if replaced is not None:
+                self._revert(replaced)
+            else:
+                self.nonces[sender] += 1
+            self.eth_balances[sender] -= cost + tx["value"]
+            if tx["to"]:
+                self.eth_balances[tx["to"]] += tx["value"]
+
+            success = True
+            if tx["to"] == self.token_address and tx["data"].startswith(TRANSFER_SELECTOR):
+                args = tx["data"][len(TRANSFER_SELECTOR):]
+                to, value = "0x" + args[24:64], int(args[64:128], 16)
+                if self.token_balance(sender) < value:
+                    success = False
+                else:
+                    self.transfer(sender, to, value, tx_hash=tx["hash"])
+            self.pending_txs.append(dict(tx, status=1 if success else 0, cost=cost))
+            return tx["hash"]
+
+    def _revert(self, tx: dict):
+        """Undo a pending transaction's effects and take it out of the next block."""
+        self.pending_txs.remove(tx)
+        self.eth_balances[tx["from"]] += tx["cost"] + tx["value"]
+        if tx["to"]:
+            self.eth_balances[tx["to"]] -= tx["value"]
+        for log in [log for log in self.pending_logs if log["tx_hash"] == tx["hash"]]:
+            self.pending_logs.remove(log)
+            self.balances[log["from"]] += log["value"]
+            self.balances[log["to"]] -= log["value"]
+
+    def drop_pending(self) -> int:
+        """Evict every pending transaction, as a node does with ones it will never mine."""
+        with self._lock:
+            dropped = list(self.pending_txs)
+            for tx in dropped:
+                self._revert(tx)
+                self.nonces[tx["from"]] = min(self.nonces[tx["from"]], tx["nonce"])
+            return len(dropped)
+
+    def block_hash(self, number: int) -> str:
+        return "0x" + hashlib.sha256(f"{self.forks[number]}:{number}".encode()).hexdigest()
+
+    def mine(self, blocks: int = 1) -> int:
+        with self._lock:
+            for _ in range(blocks):
+                self.block_number += 1
+                self.block_times[self.block_number] = max(int(time.time()), self.block_times[self.block_number - 1])
+                for log_index, log in enumerate(self.pending_logs):
+                    self.logs.append(dict(log, block=self.block_number, log_index=log_index))
+                for index, tx in enumerate(self.pending_txs):
+                    self.receipts[tx["hash"]] = dict(tx, block=self.block_number, index=index)
+                self.pending_logs = []
+                self.pending_txs = []
+            return self.block_number
+
+    def reorg(self, depth: int) -> int:
+        """
+        Replace the last `depth` blocks with empty ones: their hashes change,
+        their transactions go back to the pending pool (to be mined again by
+        the next `mine()`) and their other transfers are reverted.
+        """
+        with self._lock:
+            first = max(self.block_number - depth + 1, 1)
+            for number in range(first, self.block_number + 1):
+                self.forks[number] += 1
+            orphaned = sorted(
+                (r for r in self.receipts.values() if r["block"] >= first), key=lambda r: (r["block"], r["index"])
+            )
+            for receipt in orphaned:
+                del self.receipts[receipt["hash"]]
+                self.pending_txs.append({k: v for k, v in receipt.items() if k not in ("block", "index")})
+            requeued = {receipt["hash"] for receipt in orphaned}
+            dropped = [log for log in self.logs if log["block"] >= first]
+            self.logs = [log for log in self.logs if log["block"] < first]
+            for log in dropped:
+                if log["tx_hash"] in requeued:
+                    self.pending_logs.append({k: v for k, v in log.items() if k not in ("block", "log_index")})
+                    continue
+                self.balances[log["from"]] = self.balances.get(log["from"], 0) + log["value"]
+                self.balances[log["to"]] = self.balances.get(log["to"], 0) - log["value"]
+            return len(dropped)
+
+    def reset_counters(self):
+        with self._lock:
+            self.method_counts.clear()
+            self.http_requests = 0
+            self.failures = 0
+
+    def _inject(self, payload):
+        """Apply the configured latency and drop `failure_rate` of the requests."""
+        first = payload[0] if isinstance(payload, list) and payload else payload
+        if isinstance(first, dict) and first.get("method", "").startswith(("mock_", "evm_")):
+            return  # control calls are never delayed or dropped
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            dropped = self.failure_rate > 0 and self._random.random() < self.failure_rate
+            if dropped:
+                self.failures += 1
+        if dropped:
+            raise SimulatedFailure("mock node: injected failure")
+
+    # ------------------------------------------------------------------ #
+    # JSON-RPC dispatch                                                  #
+    # ------------------------------------------------------------------ #
+
+    def handle_payload(self, payload):
+        """
+        Handle a decoded JSON-RPC payload (single request or batch). Raises
+        SimulatedFailure for requests dropped by `failure_rate`.
+        """
+        with self._lock:
+            self.http_requests += 1
+        self._inject(payload)
+        if isinstance(payload, list):
+            return [self._handle_one(item) for item in payload]
+        return self._handle_one(payload)
+
+    def _handle_one(self, request):
+        request_id = request.get("id")
+        method = request.get("method", "")
+        params = request.get("params") or []
+        with self._lock:
+            self.method_counts[method] += 1
+        try:
+            handler = getattr(self, "rpc_" + method, None)
+            if handler is None:
+                raise RPCError(-32601, f"Method {method} not found")
+            result = handler(*params)
+        except RPCError as exc:
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": exc.code, "message": exc.message}}
+        except Exception as exc:
+            logger.exception("Mock node failed to handle %s", method)
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32603, "message": str(exc)}}
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    # Standard methods
+
+    def rpc_web3_clientVersion(self):
+        return "xusdt-mock-node/1.0"
+
+    def rpc_eth_chainId(self):
+        return _hex(self.chain_id)
+
+    def rpc_net_version(self):
+        return str(self.chain_id)
+
+    def rpc_eth_blockNumber(self):
+        return _hex(self.block_number)
+
+    def rpc_eth_getBlockByNumber(self, number, full=False):
+        number = _block_arg(number, self.block_number)
+        if number > self.block_number:
+            return None
+        return {
+            "number": _hex(number),
+            "hash": self.block_hash(number),
+            "parentHash": self.block_hash(number - 1) if number else "0x" + "00" * 32,
+            "timestamp": _hex(self.block_times[number]),
+            "gasLimit": _hex(30_000_000),
+            "gasUsed": _hex(0),
+            "baseFeePerGas": _hex(self.base_fee),
+            "transactions": [],
+        }
+
+    def rpc_eth_getLogs(self, log_filter):
+        from_block = _block_arg(log_filter.get("fromBlock"), self.block_number)
+        to_block = _block_arg(log_filter.get("toBlock"), self.block_number)
+        address = log_filter.get("address")
+        addresses = {a.lower() for a in ([address] if isinstance(address, str) else address or [])}
+        topics = log_filter.get("topics") or []
+        if addresses and self.token_address not in addresses:
+            return []
+        if topics and topics[0] not in (None, TRANSFER_TOPIC):
+            return []
+        return [
+            self._format_log(log) for log in self.logs
+            if from_block <= log["block"] <= to_block
+        ]
+
+    def _format_log(self, log):
+        return {
+            "address": self.token_address,
+            "topics": [TRANSFER_TOPIC, _address_topic(log["from"]), _address_topic(log["to"])],
+            "data": _word(log["value"]),
+            "blockNumber": _hex(log["block"]),
+            "blockHash": self.block_hash(log["block"]),
+            "transactionHash": log["tx_hash"],
+            "transactionIndex": _hex(log["log_index"]),
+            "logIndex": _hex(log["log_index"]),
+            "removed": False,
+        }
+
+    def rpc_eth_getBalance(self, address, block="latest"):
+        return _hex(self.eth_balances[address.lower()])
+
+    def rpc_eth_getTransactionCount(self, address, block="latest"):
+        return _hex(self.nonces[address.lower()])
+
+    def rpc_eth_sendRawTransaction(self, raw):
+        return self.send_transaction(_decode_raw_transaction(raw))
+
+    def rpc_eth_getTransactionReceipt(self, tx_hash):
+        receipt = self.receipts.get(tx_hash.lower())
+        if receipt is None:
+            return None
+        return {
+            "transactionHash": receipt["hash"],
+            "transactionIndex": _hex(receipt["index"]),
+            "blockHash": self.block_hash(receipt["block"]),
+            "blockNumber": _hex(receipt["block"]),
+            "from": receipt["from"],
+            "to": receipt["to"],
+            "cumulativeGasUsed": _hex(receipt["gas"]),
+            "gasUsed": _hex(receipt["gas"]),
+            "effectiveGasPrice": _hex(min(receipt["max_fee"], self.base_fee + receipt["tip"])),
+            "contractAddress": None,
+            "logs": [self._format_log(log) for log in self.logs if log["tx_hash"] == receipt["hash"]],
+            "logsBloom": "0x" + "00" * 256,
+            "status": _hex(receipt["status"]),
+            "type": _hex(receipt["type"]),
+        }
+
+    def rpc_eth_gasPrice(self):
+        return _hex(self.base_fee + self.priority_fee)
+
+    def rpc_eth_maxPriorityFeePerGas(self):
+        return _hex(self.priority_fee)
+
+    def rpc_eth_feeHistory(self, block_count, newest_block, percentiles=None):
+        newest = _block_arg(newest_block, self.block_number)
+        count = min(_block_arg(block_count, 0), newest + 1)
+        oldest = newest - count + 1
+        # Flat history: every block at the current base fee, tips spread around priority_fee
+        return {
+            "oldestBlock": _hex(oldest),
+            "baseFeePerGas": [_hex(self.base_fee)] * (count + 1),
+            "gasUsedRatio": [0.5] * count,
+            "reward": [
+                [_hex(self.priority_fee * int(p) // 50) for p in (percentiles or [])]
+                for _ in range(count)
+            ],
+        }
+
+    def rpc_eth_call(self, call, block="latest"):
+        to = (call.get("to") or "").lower()
+        data = call.get("data") or call.get("input") or ""
+        if to != self.token_address:
+            raise RPCError(-32000, "execution reverted: unknown contract")
+        if data.startswith(BALANCE_OF_SELECTOR):
+            owner = "0x" + data[len(BALANCE_OF_SELECTOR):][-40:]
+            return _word(self.token_balance(owner))
+        if data.startswith(DECIMALS_SELECTOR):
+            return _word(6)
+        if data.startswith(TOTAL_SUPPLY_SELECTOR):
+            with self._lock:
+                return _word(sum(value for value in self.balances.values() if value > 0))
+        if data.startswith(SYMBOL_SELECTOR):
+            return _string("USDT")
+        if data.startswith(NAME_SELECTOR):
+            return _string("Tether USD (simulated)")
+        raise RPCError(-32000, "execution reverted: unsupported call")
+
+    # Control methods
+
+    def rpc_mock_setTokenBalance(self, address, value):
+        self.set_token_balance(address, int(value, 16) if isinstance(value, str) else value)
+        return True
+
+    def rpc_mock_transfer(self, sender, to, value):
+        return self.transfer(sender, to, int(value, 16) if isinstance(value, str) else value)
+
+    def rpc_mock_setBalance(self, address, value):
+        self.set_eth_balance(address, int(value, 16) if isinstance(value, str) else value)
+        return True
+
+    def rpc_mock_setBaseFee(self, value):
+        self.base_fee = int(value, 16) if isinstance(value, str) else int(value)
+        return True
+
+    def rpc_mock_dropPending(self):
+        return self.drop_pending()
+
+    def rpc_mock_reorg(self, depth):
+        return self.reorg(int(depth))
+
+    def rpc_mock_setLatency(self, milliseconds):
+        self.latency = float(milliseconds) / 1000
+        return True
+
+    def rpc_mock_setFailureRate(self, rate):
+        self.failure_rate = float(rate)
+        return True
+
+    def rpc_evm_mine(self, blocks=1):
+        return _hex(self.mine(int(blocks)))
+
+    # ------------------------------------------------------------------ #
+    # HTTP transport                                                     #
+    # ------------------------------------------------------------------ #
+
+    def make_server(self, host="127.0.0.1", port=8545):
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                status = 200
+                try:
+                    payload = json.loads(self.rfile.read(length) or b"null")
+                    body = json.dumps(node.handle_payload(payload)).encode()
+                except ValueError:
+                    body = json.dumps({"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Parse error"}}).encode()
+                except SimulatedFailure:
+                    status, body = 503, b"injected failure"
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                logger.debug("mock node: " + fmt, *args)
+
+        return ThreadingHTTPServer((host, port), Handler)
+
+    def serve_in_thread(self, host="127.0.0.1", port=0):
+        """Start the HTTP server on a daemon thread; returns (server, url)."""
+        server = self.make_server(host, port)
+        thread = threading.Thread(target=server.serve_forever, name="mock-node", daemon=True)
+        thread.start()
+        return server, f"http://{host}:{server.server_address[1]}"
+
+    def auto_mine(self, block_time: float, stop_event: threading.Event):
+        while not stop_event.wait(block_time):
+            self.mine()
+
+
+# ---------------------------------------------------------------------- #
+# In-process endpoints (sim:// URLs)                                     #
+# ---------------------------------------------------------------------- #
+
+_nodes = {}
+_nodes_lock = threading.Lock()
+
+
+def get_node(url: str) -> MockNode:
+    """The process-wide node for a sim:// URL, created on first use."""
+    parts = urlsplit(url)
+    name = parts.netloc or "default"
+    with _nodes_lock:
+        if name not in _nodes:
+            from django.conf import settings
+
+            options = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+            node = MockNode(
+                settings.USDT_ADDR,
+                chain_id=int(options.get("chain_id", settings.CHAIN_ID)),
+                latency=float(options.get("latency_ms", 0)) / 1000,
+                failure_rate=float(options.get("failure_rate", 0)),
+                seed=int(options.get("seed", 0)),
+            )
+            block_time = float(options.get("block_time", 0))
+            if block_time > 0:
+                threading.Thread(
+                    target=node.auto_mine, args=(block_time, threading.Event()), name=f"sim-{name}", daemon=True
+                ).start()
+            _nodes[name] = node
+        return _nodes[name]
+
+
+def drop_node(url: str):
+    """Forget a sim:// node; the next get_node() starts a fresh chain."""
+    with _nodes_lock:
+        _nodes.pop(urlsplit(url).netloc or "default", None)
+
+
+class SimProvider(JSONBaseProvider):
+    """Hands requests straight to an in-process MockNode."""
+
+    def __init__(self, node: MockNode, **kwargs):
+        super().__init__(**kwargs)
+        self.node = node
+
+    def make_request(self, method, params):
+        return self.node.handle_payload(json.loads(self.encode_rpc_request(method, params)))
+
+    def make_batch_request(self, batch_requests):
+        return self.node.handle_payload(json.loads(self.encode_batch_rpc_request(batch_requests)))
+
+
+class AsyncSimProvider(AsyncJSONBaseProvider):
+    """Async counterpart of SimProvider; the node runs on a worker thread so latency does not block the loop."""
+
+    def __init__(self, node: MockNode, **kwargs):
+        super().__init__(**kwargs)
+        self.node = node
+
+    async def make_request(self, method, params):
+        payload = json.loads(self.encode_rpc_request(method, params))
+        return await asyncio.to_thread(self.node.handle_payload, payload)
+
+    async def make_batch_request(self, batch_requests):
+        payload = json.loads(self.encode_batch_rpc_request(batch_requests))
+        return await asyncio.to_thread(self.node.handle_payload, payload)
@@ -1,23 +1,27 @@
 import uuid
-import hmac
-import hashlib
+from cryptography.fernet import Fernet
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
 from django.core.validators import MinLengthValidator
+from apps.core.models import derive_user_token
 from .validators import validate_eth_address
 
 class EscrowWallet(models.Model):
     STATUS_CREATED = 'created'
     STATUS_FUNDED = 'funded'
+    STATUS_RELEASING = 'releasing'
     STATUS_RELEASED = 'released'
     STATUS_DISPUTED = 'disputed'
+    STATUS_EXPIRED = 'expired'
     
     STATUS_CHOICES = [
         (STATUS_CREATED, 'Created'),
         (STATUS_FUNDED, 'Funded'),
+        (STATUS_RELEASING, 'Releasing'),
         (STATUS_RELEASED, 'Released'),
         (STATUS_DISPUTED, 'Disputed'),
+        (STATUS_EXPIRED, 'Expired'),
     ]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -62,6 +66,34 @@ class EscrowWallet(models.Model):
         null=True,
         help_text="Amount in USDT"
     )
+    expected_amount = models.DecimalField(
+        max_digits=20,
+        decimal_places=6,
+        blank=True,
+        null=True,
+        help_text="Minimum deposit (USDT) the deposit watcher waits for"
+    )
+    private_key_enc = models.TextField(
+        blank=True,
+        null=True,
+        help_text="Fernet-encrypted private key, needed to sweep leftovers"
+    )
+    derivation_index = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        unique=True,
+        help_text="Child index under ESCROW_HD_PATH; the key is derived from the HD seed, not stored"
+    )
+    swept_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When leftover funds were last swept to the system wallet"
+    )
+    topped_up_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="When the sweep last sent gas to this escrow"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     last_used = models.DateTimeField(auto_now=True)
 
@@ -77,25 +109,40 @@ class EscrowWallet(models.Model):
 
     @classmethod
     def generate_user_token(cls, client_token):
-        """Generate HMAC-SHA256 user token from client token"""
-        hmac_key = settings.XUSDT_SETTINGS['USER_TOKEN_HMAC_KEY'].encode()
-        return hmac.new(hmac_key, client_token.encode(), hashlib.sha256).hexdigest()
+        """Generate HMAC-SHA256 user token from client token.
+
+        Prefer `request.user.user_token`, which is precomputed on the user row.
+        """
+        return derive_user_token(client_token)
+
+    @classmethod
+    def encrypt_private_key(cls, private_key: str) -> str:
+        fernet = Fernet(settings.ESCROW_WALLET_ENCRYPTION_KEY)
+        return fernet.encrypt(private_key.encode()).decode()
+
+    def private_key_dec(self) -> str:
+        if self.derivation_index is not None:
+            from .hd import derive_key
+            return derive_key(self.derivation_index)
+        fernet = Fernet(settings.ESCROW_WALLET_ENCRYPTION_KEY)
+        return fernet.decrypt(self.private_key_enc.encode()).decode()
+
+    # Status changes go through apps.p2p.state_machine (conditional UPDATE + log)
 
     def mark_as_funded(self, amount):
-        """Mark escrow as funded with the given amount"""
-        self.status = self.STATUS_FUNDED
-        self.amount = amount
-        self.save(update_fields=['status', 'amount', 'last_used'])
+        """Mark a created escrow as funded with the given amount"""
+        from apps.p2p.state_machine import escrow_machine
+        return escrow_machine.transition(self, 'fund', amount=amount)
 
     def mark_as_released(self):
-        """Mark escrow as released"""
-        self.status = self.STATUS_RELEASED
-        self.save(update_fields=['status', 'last_used'])
+        """Mark a funded or releasing escrow as released"""
+        from apps.p2p.state_machine import escrow_machine
+        return escrow_machine.transition(self, 'release')
 
     def mark_as_disputed(self):
-        """Mark escrow as disputed"""
-        self.status = self.STATUS_DISPUTED
-        self.save(update_fields=['status', 'last_used'])
+        """Mark a created or funded escrow as disputed"""
+        from apps.p2p.state_machine import escrow_machine
+        return escrow_machine.transition(self, 'dispute')
 
 
 class TransactionQueue(models.Model):
@@ -111,19 +158,52 @@ class TransactionQueue(models.Model):
         (FAILED, 'Failed'),
     ]
     
-    tx_hash = models.CharField(max_length=66)
+    tx_hash = models.CharField(max_length=66, blank=True, default='')
     tx_type = models.CharField(max_length=50)
     status = models.IntegerField(choices=STATUS_CHOICES, default=PENDING)
     retry_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     processed_at = models.DateTimeField(null=True, blank=True)
 
+    # Payload for the queue worker
+    escrow = models.ForeignKey(
+        EscrowWallet,
+        on_delete=models.CASCADE,
+        related_name='transactions',
+        null=True,
+        blank=True
+    )
+    trade = models.ForeignKey(
+        'p2p.P2PTrade',
+        on_delete=models.SET_NULL,
+        related_name='transactions',
+        null=True,
+        blank=True
+    )
+    to_address = models.CharField(max_length=42, blank=True, default='')
+    amount = models.DecimalField(max_digits=20, decimal_places=6, default=0, help_text="Amount in USDT")
+    fee = models.DecimalField(max_digits=20, decimal_places=6, default=0, help_text="System fee in USDT")
+    nonce = models.PositiveBigIntegerField(null=True, blank=True)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    submitted_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    # Fees of the latest broadcast, outbid when a stuck transaction is replaced
+    max_fee_per_gas = models.PositiveBigIntegerField(null=True, blank=True)
+    max_priority_fee_per_gas = models.PositiveBigIntegerField(null=True, blank=True)
+    replacements = models.PositiveSmallIntegerField(default=0)
+    replaced_hashes = models.JSONField(default=list, blank=True, help_text="Earlier hashes of this nonce, any of which may be mined")
+    updated_at = models.DateTimeField(auto_now=True)
+
     class Meta:
         indexes = [
             models.Index(fields=['status'], name='idx_txqueue_status'),
             models.Index(fields=['tx_hash'], name='idx_txqueue_hash'),
+            models.Index(fields=['status', 'next_attempt_at'], name='idx_txqueue_due'),
         ]
 
+    def __str__(self):
+        return f"{self.tx_type} #{self.id} ({self.get_status_display()})"
+
 class EscrowDispute(models.Model):
     OPEN = 1
     IN_REVIEW = 2
@@ -191,7 +271,7 @@ class SystemWallet(models.Model):
         help_text="ETH address"
     )
     private_key_enc = models.TextField(
-        help_text="Age-encrypted private key"
+        help_text="Fernet-encrypted private key"
     )
     current_balance = models.DecimalField(
         max_digits=20,
@@ -212,6 +292,15 @@ class SystemWallet(models.Model):
 
     def __str__(self):
         return f"System Wallet {self.address}"
+
+    @classmethod
+    def encrypt_private_key(cls, private_key: str) -> str:
+        fernet = Fernet(settings.SYSTEM_WALLET_ENCRYPTION_KEY)
+        return fernet.encrypt(private_key.encode()).decode()
+
+    def private_key_dec(self) -> str:
+        fernet = Fernet(settings.SYSTEM_WALLET_ENCRYPTION_KEY)
+        return fernet.decrypt(self.private_key_enc.encode()).decode()
     
 
 class EscrowAuditLog(models.Model):
@@ -220,6 +309,8 @@ class EscrowAuditLog(models.Model):
         ('FUND', 'Fund'),
         ('RELEASE', 'Release'),
         ('DISPUTE', 'Dispute'),
+        ('SWEEP', 'Sweep'),
+        ('EXPIRE', 'Expire'),
     ]
     
     escrow = models.ForeignKey(EscrowWallet, on_delete=models.CASCADE, related_name='audit_logs')
@@ -229,4 +320,157 @@ class EscrowAuditLog(models.Model):
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     
     class Meta:
-        ordering = ['-created_at']
\ No newline at end of file
+        ordering = ['-created_at']
+
+class TransferIndexCursor(models.Model):
+    """Last block the Transfer log indexer has fully processed."""
+    name = models.CharField(max_length=32, unique=True)
+    last_block = models.PositiveBigIntegerField()
+    last_block_hash = models.CharField(max_length=66, blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_block}"
+
+
+class TokenTransfer(models.Model):
+    """USDT Transfer log into an escrow address."""
+    tx_hash = models.CharField(max_length=66)
+    log_index = models.PositiveIntegerField()
+    block_number = models.PositiveBigIntegerField()
+    block_hash = models.CharField(max_length=66)
+    from_address = models.CharField(max_length=42)
+    to_address = models.CharField(max_length=42)
+    value = models.DecimalField(
+        max_digits=78,
+        decimal_places=0,
+        help_text="Raw token units"
+    )
+    escrow = models.ForeignKey(EscrowWallet, on_delete=models.CASCADE, related_name='transfers')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tx_hash', 'log_index'], name='uniq_transfer_log'),
+        ]
+        indexes = [
+            models.Index(fields=['block_number'], name='idx_transfer_block'),
+        ]
+
+    def __str__(self):
+        return f"Transfer {self.tx_hash}:{self.log_index} -> {self.to_address}"
+
+
+class AddressNonce(models.Model):
+    """Next nonce to hand out for an address we send transactions from."""
+    address = models.CharField(max_length=42, primary_key=True)
+    next_nonce = models.PositiveBigIntegerField()
+    synced_at = models.DateTimeField(help_text="Last time next_nonce was read from the chain")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.address} next nonce {self.next_nonce}"
+
+
+class ReleasedNonce(models.Model):
+    """Nonce that was allocated but never broadcast; the next allocation reuses it to close the gap."""
+    address = models.CharField(max_length=42)
+    nonce = models.PositiveBigIntegerField()
+    released_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['address', 'nonce'], name='uniq_released_nonce'),
+        ]
+
+    def __str__(self):
+        return f"{self.address} nonce {self.nonce} (released)"
+
+
+class EscrowKey(models.Model):
+    """Pre-generated escrow address waiting to be claimed (apps.escrow.key_pool)."""
+    address = models.CharField(max_length=42, unique=True, help_text="ETH address")
+    derivation_index = models.PositiveIntegerField(
+        blank=True,
+        null=True,
+        unique=True,
+        help_text="Child index under ESCROW_HD_PATH, for HD-derived keys"
+    )
+    private_key_enc = models.TextField(blank=True, help_text="Fernet-encrypted private key, for random keys")
+    created_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(claimed_at__isnull=True), name='idx_escrowkey_free'),
+        ]
+
+    def __str__(self):
+        return f"{self.address} ({'claimed' if self.claimed_at else 'free'})"
+
+
+class KeyPoolCounter(models.Model):
+    """Escrow key pool counter shared by every process (apps.escrow.key_pool)."""
+    name = models.CharField(max_length=20, primary_key=True)
+    value = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}={self.value}"
+
+
+class TxStatus(models.Model):
+    """Receipt of a transaction hash we report status for (apps.escrow.tx_status)."""
+    PENDING = 'pending'
+    SUCCESS = 'success'
+    FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SUCCESS, 'Success'),
+        (FAILED, 'Failed'),
+    ]
+
+    chain_id = models.PositiveIntegerField()
+    tx_hash = models.CharField(max_length=66, help_text="Lowercase 0x-prefixed hash")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    block_number = models.PositiveBigIntegerField(null=True, blank=True)
+    block_hash = models.CharField(max_length=66, blank=True, default='')
+    gas_used = models.PositiveBigIntegerField(null=True, blank=True)
+    final = models.BooleanField(default=False, help_text="Receipt re-checked at TX_FINALITY_CONFIRMATIONS deep")
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "Tx statuses"
+        constraints = [
+            models.UniqueConstraint(fields=['chain_id', 'tx_hash'], name='uniq_txstatus_chain_hash'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created_at'], condition=models.Q(final=False), name='idx_txstatus_open'),
+        ]
+
+    def __str__(self):
+        return f"{self.tx_hash} on {self.chain_id} ({self.status}{', final' if self.final else ''})"
+
+
+class GasSample(models.Model):
+    """Latest fee history sample of a chain, shared by every process (apps.escrow.gas)."""
+    chain_id = models.PositiveIntegerField(primary_key=True)
+    base_fee = models.PositiveBigIntegerField(help_text="Base fee of the next block, in wei")
+    priority_fees = models.JSONField(help_text="Median tip per speed, in wei")
+    block = models.PositiveBigIntegerField()
+    sampled_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Chain {self.chain_id} fees at block {self.block}"
+
+
+class ChainHead(models.Model):
+    """Latest block number of a chain, shared by every process (apps.escrow.tx_status)."""
+    chain_id = models.PositiveIntegerField(primary_key=True)
+    block_number = models.PositiveBigIntegerField()
+    subscriber = models.BooleanField(default=False, help_text="Published by manage.py track_tx_status")
+    updated_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"Chain {self.chain_id} at block {self.block_number}"
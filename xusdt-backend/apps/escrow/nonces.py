@@ -0,0 +1,188 @@
+"""
+Local nonce allocation for addresses we send transactions from.
+
+Reading `eth_getTransactionCount` before every transaction costs a round trip,
+and two releases that read it at the same time get the same nonce. Instead,
+the next nonce for each address lives in an `AddressNonce` row. Each
+allocation increments that row inside a short transaction (the UPDATE holds
+the row lock), so concurrent senders get distinct nonces without holding
+the lock while they sign, send or wait.
+
+The chain is only consulted the first time an address is seen and after the
+node rejects a nonce ("nonce too low", "already known", "replacement
+underpriced"): then the counter has drifted behind the chain and moves up
+to the pending transaction count. It never moves down, because other
+workers may hold higher nonces that are not pending yet.
+
+Any other failure (building, signing, a rejected transaction) means the
+nonce was never used. It is released into `ReleasedNonce` and handed out by
+the next allocation, so the gap it would leave is filled instead of
+blocking every later transaction of the address. Only the signing belongs
+inside `nonce_for`: once a transaction has been broadcast, a timeout or a
+revert does not free its nonce, so `broadcast` hands it back only when the
+node refused the transaction.
+"""
+import logging
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from web3 import Web3
+from web3.exceptions import Web3RPCError
+
+from .models import AddressNonce, ReleasedNonce
+
+logger = logging.getLogger(__name__)
+
+ALREADY_KNOWN = ("already known", "known transaction")
+NONCE_ERRORS = ("nonce too low", *ALREADY_KNOWN, "replacement transaction underpriced")
+
+
+def is_nonce_error(error) -> bool:
+    """Whether the node rejected a transaction because its nonce is already used."""
+    message = str(error).lower()
+    return any(fragment in message for fragment in NONCE_ERRORS)
+
+
+def is_rejected(error) -> bool:
+    """
+    Whether the node answered a send with an error, so the transaction is
+    not in flight. Timeouts and dropped connections are not rejections: the
+    transaction may have arrived.
+    """
+    if not isinstance(error, Web3RPCError):
+        return False
+    message = str(error).lower()
+    return not any(fragment in message for fragment in ALREADY_KNOWN)
+
+
+class NonceManager:
+    def __init__(self, w3):
+        self.w3 = w3
+
+    def _chain_nonce(self, address: str) -> int:
+        return self.w3.eth.get_transaction_count(address, "pending")
+
+    def allocate(self, address: str) -> int:
+        """Reserve and return the next nonce for `address`."""
+        address = self.w3.to_checksum_address(address)
+        if not AddressNonce.objects.filter(address=address).exists():
+            AddressNonce.objects.get_or_create(
+                address=address,
+                defaults={"next_nonce": self._chain_nonce(address), "synced_at": timezone.now()},
+            )
+
+        reused = self._reuse(address)
+        if reused is not None:
+            return reused
+
+        with transaction.atomic():
+            # The UPDATE takes the row lock up front (and the write lock on
+            # SQLite), so the read below sees our own increment only.
+            AddressNonce.objects.filter(address=address).update(next_nonce=F("next_nonce") + 1)
+            return AddressNonce.objects.values_list("next_nonce", flat=True).get(address=address) - 1
+
+    @staticmethod
+    def _reuse(address: str):
+        """Claim the lowest released nonce of `address`, if any."""
+        for released in ReleasedNonce.objects.filter(address=address).order_by("nonce")[:5]:
+            # Whoever deletes the row owns the nonce
+            deleted, _ = ReleasedNonce.objects.filter(pk=released.pk).delete()
+            if deleted:
+                logger.info("Reusing released nonce %s for %s", released.nonce, address)
+                return released.nonce
+        return None
+
+    def release(self, address: str, nonce: int):
+        """Give back a nonce that was never broadcast."""
+        address = self.w3.to_checksum_address(address)
+        ReleasedNonce.objects.bulk_create([ReleasedNonce(address=address, nonce=nonce)], ignore_conflicts=True)
+        logger.info("Released unused nonce %s for %s", nonce, address)
+
+    def seed(self, addresses):
+        """Create counters for unseen addresses with one batched chain read."""
+        addresses = {self.w3.to_checksum_address(address) for address in addresses}
+        known = set(AddressNonce.objects.filter(address__in=addresses).values_list("address", flat=True))
+        missing = sorted(addresses - known)
+        if not missing:
+            return
+
+        responses = self.w3.provider.make_batch_request(
+            [("eth_getTransactionCount", [address, "pending"]) for address in missing]
+        )
+        if not isinstance(responses, list):
+            # allocate() falls back to reading each address on its own
+            logger.warning("Nonce seed batch failed: %s", responses)
+            return
+        now = timezone.now()
+        rows = [
+            AddressNonce(address=address, next_nonce=int(response["result"], 16), synced_at=now)
+            for address, response in zip(missing, responses)
+            if isinstance(response, dict) and response.get("result")
+        ]
+        AddressNonce.objects.bulk_create(rows, ignore_conflicts=True)
+
+    def resync(self, address: str) -> int:
+        """Move the local counter up to the chain's pending nonce; it is never lowered."""
+        address = self.w3.to_checksum_address(address)
+        chain_nonce = self._chain_nonce(address)
+        now = timezone.now()
+        with transaction.atomic():
+            # max(local, chain) as one conditional UPDATE, so a concurrent allocation is never undone
+            raised = AddressNonce.objects.filter(address=address, next_nonce__lt=chain_nonce).update(
+                next_nonce=chain_nonce, synced_at=now
+            )
+            if not raised:
+                AddressNonce.objects.get_or_create(
+                    address=address, defaults={"next_nonce": chain_nonce, "synced_at": now}
+                )
+            # Released nonces the chain has already used are gone for good
+            ReleasedNonce.objects.filter(address=address, nonce__lt=chain_nonce).delete()
+            next_nonce = AddressNonce.objects.values_list("next_nonce", flat=True).get(address=address)
+        logger.info("Resynced nonce for %s: chain %s, next %s", address, chain_nonce, next_nonce)
+        return next_nonce
+
+    def failed(self, address: str, nonce: int, error):
+        """Handle a transaction that was not accepted with `nonce`."""
+        if is_nonce_error(error):
+            self.resync(address)
+        else:
+            self.release(address, nonce)
+
+    def broadcast(self, address: str, nonce: int, signed_tx) -> str:
+        """
+        Send a transaction signed with `nonce` and return its hash. The nonce
+        is handed back only if the node refuses the transaction; after any
+        other error it may be in flight, and the error is raised as is.
+        """
+        try:
+            return Web3.to_hex(self.w3.eth.send_raw_transaction(signed_tx.raw_transaction))
+        except Exception as e:
+            message = str(e).lower()
+            if any(fragment in message for fragment in ALREADY_KNOWN):
+                return Web3.to_hex(signed_tx.hash)
+            if is_rejected(e):
+                self.failed(address, nonce, e)
+            raise
+
+    @contextmanager
+    def nonce_for(self, address: str):
+        """
+        Yield a nonce for one transaction. If the block raises, the nonce
+        is released for reuse, or the counter resynced on a nonce error.
+        Build and sign inside the block, and broadcast after it:
+
+            with nonces.nonce_for(sender) as nonce:
+                signed_tx = sign(build(..., nonce=nonce))
+            tx_hash = nonces.broadcast(sender, nonce, signed_tx)
+        """
+        nonce = self.allocate(address)
+        try:
+            yield nonce
+        except Exception as e:
+            try:
+                self.failed(address, nonce, e)
+            except Exception:
+                logger.exception("Nonce recovery failed for %s", address)
+            raise
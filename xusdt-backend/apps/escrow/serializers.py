@@ -7,10 +7,11 @@ class EscrowWalletSerializer(serializers.ModelSerializer):
         fields = [
             'id', 'address', 'user_token', 'balance_commitment',
             'status', 'buyer_address', 'seller_address', 'amount',
-            'created_at', 'last_used'
+            'expected_amount', 'created_at', 'last_used'
         ]
         read_only_fields = [
-            'id', 'address', 'user_token', 'created_at', 'last_used'
+            'id', 'address', 'user_token', 'expected_amount',
+            'created_at', 'last_used'
         ]
 
 class SystemWalletSerializer(serializers.ModelSerializer):
@@ -1,45 +1,48 @@
-import json
-import time
 from decimal import Decimal
 from pathlib import Path
 from typing import Optional, Tuple
 
 from django.conf import settings
 from django.db import transaction
+from django.db.models import F
+from django.utils.functional import SimpleLazyObject
 from web3 import Web3
-from web3.exceptions import ContractLogicError, TransactionNotFound
+from web3.exceptions import ContractLogicError
 from web3.types import TxReceipt
 
+from apps.core.chain import get_async_web3, get_web3, load_abi
+from apps.p2p.state_machine import escrow_machine
 
+
+from . import key_pool, tx_status
+from .balances import aread_balances, read_balance
 from .exceptions import (
     EscrowError,
     InsufficientFundsError,
     TransactionFailedError,
     WalletError,
 )
-from .models import EscrowWallet, SystemWallet
+from .models import EscrowWallet, SystemWallet, TransactionQueue
+from .gas import GasOracle
+from .nonces import NonceManager
 
 # Constants
 GAS_LIMIT = 150000
-GAS_PRICE = 5  # gwei
-POLL_INTERVAL = 15  # seconds
-MAX_POLL_ATTEMPTS = 120  # ~30 minutes total
 USDT_DECIMALS = 6
 
-# Load ABI
 ABI_PATH = Path(__file__).resolve().parent / "abi/usdt.json"
-with open(ABI_PATH) as f:
-    USDT_ABI = json.load(f)
 
-# Initialize Web3
-w3 = Web3(Web3.HTTPProvider(settings.WEB3_RPC_URL))
-USDT = w3.eth.contract(address=settings.USDT_ADDR, abi=USDT_ABI)
+# Chain objects are built on first use, not at import
+w3 = SimpleLazyObject(get_web3)
+aw3 = SimpleLazyObject(get_async_web3)  # for the async views
+USDT = SimpleLazyObject(lambda: w3.eth.contract(address=settings.USDT_ADDR, abi=load_abi(ABI_PATH)))
+nonces = SimpleLazyObject(lambda: NonceManager(w3))
+gas_oracle = SimpleLazyObject(lambda: GasOracle(w3))
 
-def _sign_and_send(tx: dict, private_key: str) -> Tuple[str, TxReceipt]:
-    """Sign and send a transaction, returning tx hash and receipt."""
+def _send_and_wait(address: str, nonce: int, signed_tx) -> Tuple[str, TxReceipt]:
+    """Broadcast a transaction signed with a `nonce_for` nonce, returning tx hash and receipt."""
     try:
-        signed_tx = w3.eth.account.sign_transaction(tx, private_key)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction).hex()
+        tx_hash = nonces.broadcast(address, nonce, signed_tx)
         
         # Wait for transaction receipt
         receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
@@ -54,43 +57,58 @@ def _sign_and_send(tx: dict, private_key: str) -> Tuple[str, TxReceipt]:
 
 
 def create_escrow_wallet() -> EscrowWallet:
-    """Create a new escrow wallet with a unique Ethereum address."""
+    """
+    Unsaved escrow wallet with a unique Ethereum address, claimed from the
+    pre-generated key pool (`key_pool`). Generated inline if the pool is empty.
+
+    Raises:
+        WalletError: If the pool is empty and ESCROW_WALLET_ENCRYPTION_KEY is
+            not set, since the generated key could not be stored
+    """
+    wallet = key_pool.claim()
+    if wallet is not None:
+        return wallet
+    if not settings.ESCROW_WALLET_ENCRYPTION_KEY:
+        raise WalletError("Escrow key pool is empty and ESCROW_WALLET_ENCRYPTION_KEY is not configured")
     try:
         acct = w3.eth.account.create()
-        return EscrowWallet(address=acct.address)  # Return unsaved instance
+        # Return unsaved instance
+        return EscrowWallet(address=acct.address, private_key_enc=EscrowWallet.encrypt_private_key(acct.key.hex()))
     except Exception as e:
         raise WalletError(f"Failed to create escrow wallet: {str(e)}")
 
-def wait_for_deposit(wallet: EscrowWallet, min_amount: Decimal) -> None:
+def watch_for_deposit(wallet: EscrowWallet, min_amount: Decimal) -> None:
     """
-    Monitor an escrow wallet for incoming deposits.
-    
+    Register an escrow wallet with the deposit watcher.
+
+    The `watch_deposits` management command picks up every wallet in
+    `created` status and marks it funded once its balance reaches
+    `expected_amount`, so callers return immediately and poll the status.
+
     Args:
         wallet: EscrowWallet instance to monitor
         min_amount: Minimum amount (in USDT) required to consider the wallet funded
-        
-    Raises:
-        EscrowError: If monitoring fails
-        TimeoutError: If max polling attempts reached without funding
     """
-    min_amount_wei = int(min_amount * (10 ** USDT_DECIMALS))
-    
-    for attempt in range(MAX_POLL_ATTEMPTS):
-        try:
-            balance = USDT.functions.balanceOf(wallet.address).call()
-            if balance >= min_amount_wei:
-                with transaction.atomic():
-                    wallet.amount = Decimal(balance) / Decimal(10 ** USDT_DECIMALS)
-                    wallet.status = "funded"
-                    wallet.save(update_fields=["amount", "status"])
-                return
-                
-            time.sleep(POLL_INTERVAL)
-            
-        except Exception as e:
-            raise EscrowError(f"Failed to check balance: {str(e)}")
+    if wallet.status != EscrowWallet.STATUS_CREATED:
+        raise EscrowError(f"Escrow is already {wallet.status}")
+
+    wallet.expected_amount = min_amount
+    wallet.save(update_fields=["expected_amount", "last_used"])
+
+
+async def awatch_for_deposit(wallet: EscrowWallet, min_amount: Decimal) -> None:
+    """Async variant of watch_for_deposit."""
+    if wallet.status != EscrowWallet.STATUS_CREATED:
+        raise EscrowError(f"Escrow is already {wallet.status}")
+
+    wallet.expected_amount = min_amount
+    await wallet.asave(update_fields=["expected_amount", "last_used"])
+
 
-    raise TimeoutError("Funding not detected within timeout period")
+async def adeposited_amount(address: str) -> Decimal:
+    """USDT currently held by `address`, read through the async client."""
+    balances = await aread_balances(aw3, [address])
+    return Decimal(balances[address]) / Decimal(10 ** USDT_DECIMALS)
 
 
 def release_to(buyer_addr: str, wallet: EscrowWallet, amount: Decimal, fee: Decimal) -> str:
@@ -110,7 +128,9 @@ def release_to(buyer_addr: str, wallet: EscrowWallet, amount: Decimal, fee: Deci
         InsufficientFundsError: If escrow has insufficient balance
         EscrowError: If transfer fails
     """
-    system_wallet = SystemWallet.objects.select_for_update().first()
+    # No row lock here: nonces come from the nonce manager and the fee is
+    # added with an F() update, so releases can run in parallel.
+    system_wallet = SystemWallet.objects.first()
     if not system_wallet:
         raise WalletError("No system wallet configured")
 
@@ -119,30 +139,34 @@ def release_to(buyer_addr: str, wallet: EscrowWallet, amount: Decimal, fee: Deci
     
     try:
         # Check balance first
-        balance = USDT.functions.balanceOf(wallet.address).call()
+        balance = read_balance(w3, wallet.address)
         if balance < amount_wei:
             raise InsufficientFundsError("Escrow has insufficient balance")
 
         # Prepare and send transaction
-        tx = USDT.functions.transfer(
-            w3.to_checksum_address(buyer_addr),
-            amount_wei
-        ).build_transaction({
-            'from': system_wallet.address,
-            'gas': GAS_LIMIT,
-            'gasPrice': w3.to_wei(GAS_PRICE, 'gwei'),
-            'nonce': w3.eth.get_transaction_count(system_wallet.address),
-        })
-
-        tx_hash, receipt = _sign_and_send(tx, system_wallet.private_key_dec())
+        private_key = system_wallet.private_key_dec()
+        with nonces.nonce_for(system_wallet.address) as nonce:
+            tx = USDT.functions.transfer(
+                w3.to_checksum_address(buyer_addr),
+                amount_wei
+            ).build_transaction({
+                'from': system_wallet.address,
+                'gas': GAS_LIMIT,
+                **gas_oracle.fee_fields(),
+                'nonce': nonce,
+            })
+            signed_tx = w3.eth.account.sign_transaction(tx, private_key)
+
+        # Outside the nonce block: a receipt timeout or a revert must not free a broadcast nonce
+        tx_hash, receipt = _send_and_wait(system_wallet.address, nonce, signed_tx)
         
         # Update records
         with transaction.atomic():
-            wallet.status = "released"
-            wallet.save(update_fields=["status"])
+            wallet.mark_as_released()
             
-            system_wallet.collected_fees += fee
-            system_wallet.save(update_fields=["collected_fees"])
+            SystemWallet.objects.filter(pk=system_wallet.pk).update(
+                collected_fees=F("collected_fees") + fee
+            )
             
         return tx_hash
         
@@ -152,53 +176,45 @@ def release_to(buyer_addr: str, wallet: EscrowWallet, amount: Decimal, fee: Deci
         raise EscrowError(f"Failed to release funds: {str(e)}")
 
 
-def check_transaction_status(tx_hash: str) -> Optional[dict]:
-    """Check the status of a blockchain transaction."""
-    try:
-        receipt = w3.eth.get_transaction_receipt(tx_hash)
-        if not receipt:
-            return None
-            
-        return {
-            'status': 'success' if receipt.status == 1 else 'failed',
-            'block_number': receipt.blockNumber,
-            'gas_used': receipt.gasUsed,
-            'confirmations': w3.eth.block_number - receipt.blockNumber,
-        }
-    except TransactionNotFound:
-        return None
-    except Exception as e:
-        raise EscrowError(f"Failed to check transaction status: {str(e)}")
-    
+def check_transaction_status(tx_hash: str, chain_id=None, involves=None) -> Optional[dict]:
+    """Check the status of a blockchain transaction (recorded and cached by `tx_status`)."""
+    return tx_status.lookup(tx_hash, chain_id=chain_id, involves=involves)
+
+
+async def acheck_transaction_status(tx_hash: str, chain_id=None, involves=None) -> Optional[dict]:
+    """Async variant of check_transaction_status."""
+    return await tx_status.alookup(tx_hash, chain_id=chain_id, involves=involves)
+
+
+def enqueue_release(wallet: EscrowWallet, to_address: str, amount: Decimal, fee: Decimal,
+                    trade=None, tx_type: str = 'release') -> TransactionQueue:
+    """
+    Queue a release for the `process_tx_queue` worker and return immediately.
+
+    The escrow moves from `funded` to `releasing` in the same transaction, so
+    a second release request for the same escrow is rejected.
+
+    Raises:
+        WalletError: If the recipient address is invalid
+        EscrowError: If the escrow is not funded
+    """
+    if not to_address or not Web3.is_address(to_address):
+        raise WalletError("Invalid recipient address")
+
+    with transaction.atomic():
+        if not escrow_machine.transition(wallet, 'start_release', actor='release_queue', reason=tx_type):
+            raise EscrowError("Escrow is not funded or already being released")
+
+        return TransactionQueue.objects.create(
+            tx_type=tx_type,
+            escrow=wallet,
+            trade=trade,
+            to_address=Web3.to_checksum_address(to_address),
+            amount=amount,
+            fee=fee,
+        )
+
 
-# In escrow/services.py
 def safe_release_funds(buyer_addr, wallet, amount, fee):
-    """Atomic release with proper gas management"""
-    try:
-        # Check gas prices first
-        gas_price = w3.eth.gas_price
-        if gas_price > settings.MAX_GAS_PRICE:
-            raise EscrowError("Gas prices too high")
-            
-        # Verify recipient address
-        if not w3.is_address(buyer_addr):
-            raise WalletError("Invalid recipient address")
-            
-        # Queue transaction
-        with transaction.atomic():
-            tx = TransactionQueue.objects.create(
-                tx_type='release',
-                status=TransactionQueue.PENDING
-            )
-            wallet.status = 'processing'
-            wallet.save()
-            
-        # Process in background (Celery task)
-        process_transaction.delay(tx.id)
-        
-        return tx.id
-        
-    except Exception as e:
-        wallet.status = 'error'
-        wallet.save()
-        raise EscrowError(str(e))
\ No newline at end of file
+    """Queue a release; gas price and nonces are handled by the queue worker."""
+    return enqueue_release(wallet, buyer_addr, amount, fee).id
@@ -0,0 +1,295 @@
+"""
+Batched sweeping of leftover USDT from released escrows into the system wallet.
+
+A run:
+
+1. Reads the USDT and ETH balances of candidate escrows, one JSON-RPC batch
+   for each. Candidates are released escrows with a stored or HD-derived key
+   that have not been swept yet.
+2. Plans a transfer to the system wallet for every escrow with a leftover.
+   An escrow without enough ETH for gas gets a top-up from the system wallet
+   first and is swept on a later run, once the top-up has landed. Until
+   then, or until SWEEP_TOPUP_TIMEOUT passes, it gets no second top-up.
+3. Stops planning once SWEEP_BATCH_SIZE transactions or the gas budget
+   (worst-case fees at the oracle's maxFeePerGas) is reached.
+4. Signs the transactions in a thread pool, then broadcasts them in one
+   batch with nonces from the nonce manager. Each result is written to
+   EscrowAuditLog. If building or signing fails, every allocated nonce is
+   released. If the batch gets no answer, it may still have been sent, so
+   the senders are resynced with the chain instead.
+
+Dry runs stop after step 3 and only report the plan and its expected cost.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from eth_account import Account
+from web3 import Web3
+
+from .balances import read_balances
+from .exceptions import WalletError
+from .gas import GasOracle
+from .models import EscrowAuditLog, EscrowWallet, SystemWallet
+from .nonces import NonceManager
+from .services import GAS_LIMIT, USDT, USDT_DECIMALS
+
+logger = logging.getLogger(__name__)
+
+ETH_TRANSFER_GAS = 21000
+SCAN_FACTOR = 4  # escrows read per planned transaction; most are already empty
+
+
+@dataclass
+class SweepAction:
+    wallet: EscrowWallet
+    kind: str  # "sweep" or "topup"
+    amount: int  # token units for sweeps, wei for top-ups
+    fee_wei: int
+    tx_hash: str = ""
+    error: str = ""
+
+
+@dataclass
+class SweepReport:
+    scanned: int = 0
+    empty: int = 0
+    sweeps: int = 0
+    topups: int = 0
+    deferred: int = 0
+    waiting: int = 0
+    usdt: Decimal = Decimal(0)
+    estimated_fee_wei: int = 0
+    submitted: int = 0
+    failed: int = 0
+
+
+class SweepEngine:
+    def __init__(self, token=None, batch_size=None, gas_budget_wei=None, workers=4):
+        self.token = token or USDT
+        self.w3 = self.token.w3
+        self.nonces = NonceManager(self.w3)
+        self.gas = GasOracle(self.w3)
+        self.batch_size = batch_size or settings.XUSDT_SETTINGS["SWEEP_BATCH_SIZE"]
+        self.gas_budget_wei = gas_budget_wei if gas_budget_wei is not None else Web3.to_wei(
+            Decimal(settings.XUSDT_SETTINGS["SWEEP_GAS_BUDGET_ETH"]), "ether"
+        )
+        self.topup_timeout = settings.XUSDT_SETTINGS["SWEEP_TOPUP_TIMEOUT"]
+        self.workers = workers
+
+    def run(self, dry_run=False) -> SweepReport:
+        system_wallet = SystemWallet.objects.first()
+        if system_wallet is None:
+            raise WalletError("No system wallet configured")
+
+        report = SweepReport()
+        fees = self.gas.fee_fields()
+        actions, empty = self.plan(system_wallet, fees, report)
+        if dry_run:
+            return report
+
+        EscrowWallet.objects.filter(pk__in=[wallet.pk for wallet in empty]).update(swept_at=timezone.now())
+        if actions:
+            self.execute(system_wallet, actions, fees, report)
+        return report
+
+    # ------------------------------------------------------------------ #
+    # Planning                                                           #
+    # ------------------------------------------------------------------ #
+
+    def candidates(self):
+        return list(
+            EscrowWallet.objects.filter(
+                Q(private_key_enc__isnull=False) | Q(derivation_index__isnull=False),
+                status=EscrowWallet.STATUS_RELEASED,
+                swept_at__isnull=True,
+            ).order_by("last_used")[:self.batch_size * SCAN_FACTOR]
+        )
+
+    def _eth_balances(self, addresses):
+        responses = self.w3.provider.make_batch_request(
+            [("eth_getBalance", [address, "latest"]) for address in addresses]
+        )
+        if not isinstance(responses, list):
+            raise WalletError(f"Balance batch failed: {responses}")
+        return {
+            address: int(response.get("result") or "0x0", 16)
+            for address, response in zip(addresses, responses)
+        }
+
+    def plan(self, system_wallet, fees, report):
+        wallets = self.candidates()
+        report.scanned = len(wallets)
+        if not wallets:
+            return [], []
+
+        addresses = [wallet.address for wallet in wallets]
+        token_balances = read_balances(self.w3, addresses, token_address=self.token.address)
+        eth_balances = self._eth_balances(addresses)
+
+        max_fee = fees["maxFeePerGas"]
+        sweep_fee = GAS_LIMIT * max_fee
+        topup_fee = ETH_TRANSFER_GAS * max_fee
+
+        topup_cutoff = timezone.now() - timedelta(seconds=self.topup_timeout)
+        actions, empty, spent = [], [], 0
+        for wallet in wallets:
+            leftover = token_balances[wallet.address]
+            if leftover <= 0:
+                empty.append(wallet)
+                report.empty += 1
+                continue
+
+            needs_gas = eth_balances[wallet.address] < sweep_fee
+            if needs_gas and wallet.topped_up_at and wallet.topped_up_at > topup_cutoff:
+                # The last top-up has not landed yet
+                report.waiting += 1
+                continue
+            # A top-up commits us to the sweep fee as well
+            cost = topup_fee + sweep_fee if needs_gas else sweep_fee
+            if len(actions) >= self.batch_size or spent + cost > self.gas_budget_wei:
+                report.deferred += 1
+                continue
+
+            spent += cost
+            if needs_gas:
+                actions.append(SweepAction(
+                    wallet, "topup", sweep_fee - eth_balances[wallet.address], topup_fee
+                ))
+                report.topups += 1
+            else:
+                actions.append(SweepAction(wallet, "sweep", leftover, sweep_fee))
+                report.sweeps += 1
+                report.usdt += Decimal(leftover) / Decimal(10 ** USDT_DECIMALS)
+
+        report.estimated_fee_wei = spent
+        return actions, empty
+
+    # ------------------------------------------------------------------ #
+    # Execution                                                          #
+    # ------------------------------------------------------------------ #
+
+    def _build(self, action, system_wallet, nonce, chain_id, fees):
+        if action.kind == "topup":
+            return {
+                'from': system_wallet.address,
+                'to': action.wallet.address,
+                'value': action.amount,
+                'gas': ETH_TRANSFER_GAS,
+                'nonce': nonce,
+                'chainId': chain_id,
+                **fees,
+            }
+        return {
+            'from': action.wallet.address,
+            'to': self.token.address,
+            'value': 0,
+            'data': self.token.encode_abi("transfer", args=[system_wallet.address, action.amount]),
+            'gas': GAS_LIMIT,
+            'nonce': nonce,
+            'chainId': chain_id,
+            **fees,
+        }
+
+    @staticmethod
+    def _sign(job):
+        tx, private_key = job
+        return Web3.to_hex(Account.sign_transaction(tx, private_key).raw_transaction)
+
+    def execute(self, system_wallet, actions, fees, report):
+        chain_id = self.w3.eth.chain_id
+        self.nonces.seed([system_wallet.address] + [a.wallet.address for a in actions if a.kind == "sweep"])
+
+        allocated = []
+        try:
+            system_key = system_wallet.private_key_dec() if any(a.kind == "topup" for a in actions) else None
+            jobs = []
+            for action in actions:
+                sender = system_wallet.address if action.kind == "topup" else action.wallet.address
+                nonce = self.nonces.allocate(sender)
+                allocated.append((sender, nonce))
+                key = system_key if action.kind == "topup" else action.wallet.private_key_dec()
+                jobs.append((self._build(action, system_wallet, nonce, chain_id, fees), key))
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                raw_transactions = list(pool.map(self._sign, jobs))
+        except Exception:
+            # Nothing was sent
+            for sender, nonce in allocated:
+                self.nonces.release(sender, nonce)
+            raise
+
+        try:
+            responses = self.w3.provider.make_batch_request(
+                [("eth_sendRawTransaction", [raw]) for raw in raw_transactions]
+            )
+        except Exception as e:
+            # The batch may have reached the node, so its nonces cannot be reused
+            for sender in dict.fromkeys(sender for sender, _ in allocated):
+                try:
+                    self.nonces.resync(sender)
+                except Exception:
+                    logger.exception("Nonce resync failed for %s", sender)
+            for action in actions:
+                action.error = f"Send batch failed: {e}"
+            report.failed += len(actions)
+            self._record(system_wallet, actions)
+            return
+
+        if not isinstance(responses, list):
+            responses = [responses] * len(actions)
+
+        for action, (tx, _), response in zip(actions, jobs, responses):
+            if isinstance(response, dict) and response.get("result"):
+                action.tx_hash = response["result"]
+                report.submitted += 1
+            else:
+                action.error = str(response.get("error") if isinstance(response, dict) else response)
+                # Reuse the nonce, or resync if the node says it is taken
+                self.nonces.failed(tx["from"], tx["nonce"], action.error)
+                report.failed += 1
+
+        self._record(system_wallet, actions)
+
+    @transaction.atomic
+    def _record(self, system_wallet, actions):
+        now = timezone.now()
+        swept = [a for a in actions if a.kind == "sweep" and a.tx_hash]
+        EscrowWallet.objects.filter(pk__in=[a.wallet.pk for a in swept]).update(swept_at=now)
+        EscrowWallet.objects.filter(
+            pk__in=[a.wallet.pk for a in actions if a.kind == "topup" and a.tx_hash]
+        ).update(topped_up_at=now)
+
+        total = sum((Decimal(a.amount) / Decimal(10 ** USDT_DECIMALS) for a in swept), Decimal(0))
+        if swept:
+            SystemWallet.objects.filter(pk=system_wallet.pk).update(
+                current_balance=F("current_balance") + total, last_swept_at=now
+            )
+
+        EscrowAuditLog.objects.bulk_create([
+            EscrowAuditLog(
+                escrow=action.wallet,
+                action='SWEEP',
+                details={
+                    "type": action.kind,
+                    "to": system_wallet.address if action.kind == "sweep" else action.wallet.address,
+                    "amount": (
+                        str(Decimal(action.amount) / Decimal(10 ** USDT_DECIMALS))
+                        if action.kind == "sweep" else str(action.amount)
+                    ),
+                    "max_fee_wei": action.fee_wei,
+                    "tx_hash": action.tx_hash or None,
+                    "error": action.error or None,
+                },
+            )
+            for action in actions
+        ])
+        for action in actions:
+            if action.error:
+                logger.error("Sweep %s for escrow %s failed: %s", action.kind, action.wallet.pk, action.error)
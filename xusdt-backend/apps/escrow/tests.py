@@ -1,3 +1,574 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from cryptography.fernet import Fernet
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from eth_account import Account
+
+from apps.core import chain
+from apps.core.models import AnonymousUser
+from .exceptions import EscrowError
+from .gas import GasOracle, GasPriceTooHighError
+from . import key_pool
+from .mock_node import drop_node, get_node
+from .models import (
+    AddressNonce, EscrowKey, EscrowWallet, GasSample, ReleasedNonce, SystemWallet, TransactionQueue, TxStatus,
+)
+from .nonces import NonceManager
+from .sweep import SweepEngine
+from .services import USDT
+from . import tx_status
+from .tx_queue import TxQueueWorker
+from .tx_status import TxStatusTracker
+
+ETH = 10 ** 18
+
+
+class SimChainMixin:
+    """Runs each test against a fresh in-process MockNode with a funded system wallet."""
+
+    xusdt = {}
+
+    def setUp(self):
+        super().setUp()
+        url = f"sim://{type(self).__name__.lower()}?block_time=0"
+        drop_node(url)
+        self.addCleanup(drop_node, url)
+        self.node = get_node(url)
+        self.enterContext(override_settings(
+            WEB3_RPC_URL=url,
+            WEB3_RPC_FALLBACK_URLS=[],
+            CHAIN_ID=self.node.chain_id,
+            SYSTEM_WALLET_ENCRYPTION_KEY=Fernet.generate_key().decode(),
+            ESCROW_WALLET_ENCRYPTION_KEY=Fernet.generate_key().decode(),
+            XUSDT_SETTINGS=dict(settings.XUSDT_SETTINGS, RPC_COOLDOWN=0, **self.xusdt),
+        ))
+        chain.reset()
+        self.addCleanup(chain.reset)
+        cache.clear()
+
+        self.system = Account.create()
+        SystemWallet.objects.create(
+            address=self.system.address,
+            private_key_enc=SystemWallet.encrypt_private_key(self.system.key.hex()),
+        )
+        self.node.set_eth_balance(self.system.address, 10 * ETH)
+        self.node.set_token_balance(self.system.address, 10 ** 12)
+
+        # The module-level USDT contract stays bound to whichever node it first saw
+        self.w3 = chain.get_web3()
+        self.token = self.w3.eth.contract(address=USDT.address, abi=USDT.abi)
+
+    def chain_nonce(self, block="pending"):
+        return int(self.node.rpc_eth_getTransactionCount(self.system.address, block), 16)
+
+    def foreign_tx(self, nonce):
+        """Send a plain transfer from the system wallet that the queue knows nothing about."""
+        signed = Account.sign_transaction({
+            'to': Account.create().address,
+            'value': 0,
+            'gas': 21000,
+            'nonce': nonce,
+            'chainId': self.node.chain_id,
+            'maxFeePerGas': 100 * 10 ** 9,
+            'maxPriorityFeePerGas': 10 * 10 ** 9,
+        }, self.system.key)
+        return self.w3.eth.send_raw_transaction(signed.raw_transaction)
+
+
+class GasOracleTests(SimChainMixin, TestCase):
+    xusdt = {'MAX_GAS_PRICE_GWEI': 100, 'GAS_ORACLE_TTL': 60}
+    GWEI = 10 ** 9
+
+    def setUp(self):
+        super().setUp()
+        self.oracle = GasOracle(self.w3)
+
+    def test_fees_leave_room_for_the_base_fee_to_double(self):
+        self.node.base_fee, self.node.priority_fee = 10 * self.GWEI, 2 * self.GWEI
+        self.assertEqual(self.oracle.fee_fields(), {
+            "maxFeePerGas": 22 * self.GWEI,
+            "maxPriorityFeePerGas": 2 * self.GWEI,
+        })
+
+    def test_max_fee_is_capped_at_the_ceiling(self):
+        self.node.base_fee, self.node.priority_fee = 60 * self.GWEI, 2 * self.GWEI
+        self.assertEqual(self.oracle.fee_fields()["maxFeePerGas"], 100 * self.GWEI)
+
+    def test_fees_above_the_ceiling_raise(self):
+        self.node.base_fee, self.node.priority_fee = 99 * self.GWEI, 2 * self.GWEI
+        with self.assertRaises(GasPriceTooHighError):
+            self.oracle.fee_fields()
+
+    def test_sample_is_shared_through_the_database(self):
+        self.oracle.refresh()
+        self.node.reset_counters()
+        cache.clear()
+        GasOracle(self.w3, chain_id=self.node.chain_id).fee_fields()
+        self.assertEqual(self.node.method_counts['eth_feeHistory'], 0)
+        self.assertEqual(list(GasSample.objects.values_list('chain_id', flat=True)), [self.node.chain_id])
+
+    def test_samples_are_kept_per_chain(self):
+        self.oracle.refresh()
+        other = GasOracle(self.w3, chain_id=self.node.chain_id + 1)
+        self.node.base_fee = 30 * self.GWEI
+        self.assertEqual(other.sample()["base_fee"], 30 * self.GWEI)
+        self.assertNotEqual(self.oracle.sample()["base_fee"], 30 * self.GWEI)
+
+    def test_stale_sample_is_used_when_the_refresh_fails(self):
+        sample = self.oracle.refresh()
+        GasSample.objects.update(sampled_at=timezone.now() - timedelta(hours=1))
+        with mock.patch.object(self.w3.eth, 'fee_history', side_effect=ConnectionError("down")):
+            self.assertEqual(self.oracle.sample()["base_fee"], sample["base_fee"])
+        GasSample.objects.all().delete()
+        with mock.patch.object(self.w3.eth, 'fee_history', side_effect=ConnectionError("down")):
+            with self.assertRaises(EscrowError):
+                self.oracle.sample()
+
+
+class NonceManagerTests(SimChainMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.nonces = NonceManager(self.w3)
+        self.address = self.system.address
+
+    def sign(self, nonce, max_fee=100 * 10 ** 9):
+        return Account.sign_transaction({
+            'to': Account.create().address,
+            'value': 0,
+            'gas': 21000,
+            'nonce': nonce,
+            'chainId': self.node.chain_id,
+            'maxFeePerGas': max_fee,
+            'maxPriorityFeePerGas': 10 ** 9,
+        }, self.system.key)
+
+    def test_allocations_start_at_the_chain_nonce_and_are_distinct(self):
+        self.foreign_tx(0)
+        self.assertEqual([self.nonces.allocate(self.address) for _ in range(3)], [1, 2, 3])
+
+    def test_released_nonce_is_reused_first(self):
+        first, second = self.nonces.allocate(self.address), self.nonces.allocate(self.address)
+        self.nonces.release(self.address, first)
+        self.assertEqual(self.nonces.allocate(self.address), first)
+        self.assertEqual(self.nonces.allocate(self.address), second + 1)
+
+    def test_resync_only_moves_the_counter_up(self):
+        self.nonces.allocate(self.address)
+        for nonce in range(3):
+            self.foreign_tx(nonce)
+        self.nonces.release(self.address, 1)
+        self.assertEqual(self.nonces.resync(self.address), 3)
+        self.assertFalse(ReleasedNonce.objects.exists())
+
+        AddressNonce.objects.filter(address=self.address).update(next_nonce=10)
+        self.assertEqual(self.nonces.resync(self.address), 10)
+
+    def test_failure_inside_nonce_for_releases_the_nonce(self):
+        with self.assertRaises(ValueError):
+            with self.nonces.nonce_for(self.address) as nonce:
+                raise ValueError("could not build")
+        self.assertEqual(list(ReleasedNonce.objects.values_list('nonce', flat=True)), [nonce])
+
+    def test_broadcast_keeps_the_nonce_after_an_unclear_error(self):
+        with self.nonces.nonce_for(self.address) as nonce:
+            signed_tx = self.sign(nonce)
+        with mock.patch.object(self.w3.eth, 'send_raw_transaction', side_effect=TimeoutError("read timed out")):
+            with self.assertRaises(TimeoutError):
+                self.nonces.broadcast(self.address, nonce, signed_tx)
+        self.assertFalse(ReleasedNonce.objects.exists())
+        self.assertEqual(self.nonces.allocate(self.address), nonce + 1)
+
+    def test_broadcast_releases_the_nonce_the_node_refused(self):
+        self.node.set_eth_balance(self.address, 0)
+        with self.nonces.nonce_for(self.address) as nonce:
+            signed_tx = self.sign(nonce)
+        with self.assertRaisesMessage(Exception, "insufficient funds"):
+            self.nonces.broadcast(self.address, nonce, signed_tx)
+        self.assertEqual(list(ReleasedNonce.objects.values_list('nonce', flat=True)), [nonce])
+
+    def test_broadcast_resyncs_after_a_nonce_error(self):
+        self.foreign_tx(0)
+        self.node.mine()
+        AddressNonce.objects.create(address=self.address, next_nonce=0, synced_at=timezone.now())
+        with self.nonces.nonce_for(self.address) as nonce:
+            signed_tx = self.sign(nonce)
+        with self.assertRaisesMessage(Exception, "nonce too low"):
+            self.nonces.broadcast(self.address, nonce, signed_tx)
+        self.assertEqual(self.nonces.allocate(self.address), 1)
+
+    def test_broadcast_of_a_known_transaction_returns_its_hash(self):
+        with self.nonces.nonce_for(self.address) as nonce:
+            signed_tx = self.sign(nonce)
+        tx_hash = self.nonces.broadcast(self.address, nonce, signed_tx)
+        self.assertEqual(self.nonces.broadcast(self.address, nonce, signed_tx), tx_hash)
+
+
+class TxQueueTests(SimChainMixin, TestCase):
+    xusdt = {'TX_RETRY_BACKOFF': 0, 'TX_RECEIPT_TIMEOUT': 0, 'TX_MAX_REPLACEMENTS': 1}
+
+    def setUp(self):
+        super().setUp()
+        self.worker = TxQueueWorker(token=self.token)
+
+    def release(self):
+        escrow = EscrowWallet.objects.create(
+            address=Account.create().address,
+            user_token='tx-queue-tests',
+            balance_commitment='0' * 64,
+            amount=Decimal('5'),
+            status=EscrowWallet.STATUS_RELEASING,
+        )
+        return TransactionQueue.objects.create(
+            tx_type='release', escrow=escrow, to_address=Account.create().address, amount=Decimal('5'),
+        )
+
+    def test_submitted_transaction_completes_when_mined(self):
+        item = self.release()
+        self.assertEqual(self.worker.submit_pending(), 1)
+        self.node.mine()
+        self.assertEqual(self.worker.track_receipts(), 1)
+
+        item.refresh_from_db()
+        self.assertEqual(item.status, TransactionQueue.COMPLETED)
+        self.assertEqual(item.nonce, 0)
+        self.assertEqual(EscrowWallet.objects.get(pk=item.escrow_id).status, EscrowWallet.STATUS_RELEASED)
+        self.assertEqual(self.node.token_balance(item.to_address), 5 * 10 ** 6)
+
+    def test_unclear_send_error_keeps_the_row_submitted(self):
+        item = self.release()
+        w3 = self.worker.w3
+        send = w3.eth.send_raw_transaction
+
+        def delivered_then_timeout(raw):
+            send(raw)
+            raise TimeoutError("read timed out")
+
+        with mock.patch.object(w3.eth, 'send_raw_transaction', side_effect=delivered_then_timeout):
+            self.assertEqual(self.worker.submit_pending(), 1)
+
+        item.refresh_from_db()
+        self.assertEqual(item.status, TransactionQueue.PROCESSING)
+        self.assertTrue(item.tx_hash)
+        self.assertEqual(item.retry_count, 0)
+        self.assertFalse(ReleasedNonce.objects.exists())
+
+        # The next release gets the next nonce, and the first one is paid exactly once
+        other = self.release()
+        self.worker.submit_pending()
+        other.refresh_from_db()
+        self.assertEqual(other.nonce, item.nonce + 1)
+        self.node.mine()
+        self.worker.track_receipts()
+        item.refresh_from_db()
+        self.assertEqual(item.status, TransactionQueue.COMPLETED)
+        self.assertEqual(self.node.token_balance(item.to_address), 5 * 10 ** 6)
+
+    def test_unclear_send_error_before_delivery_is_rebroadcast(self):
+        item = self.release()
+        w3 = self.worker.w3
+        with mock.patch.object(w3.eth, 'send_raw_transaction', side_effect=ConnectionError("connection reset")):
+            self.worker.submit_pending()
+        item.refresh_from_db()
+        self.assertEqual(item.status, TransactionQueue.PROCESSING)
+        self.assertEqual(self.chain_nonce(), 0)
+
+        # No receipt: the replacement pass sends it again with the same nonce
+        self.worker.track_receipts()
+        self.node.mine()
+        self.worker.track_receipts()
+        item.refresh_from_db()
+        self.assertEqual(item.status, TransactionQueue.COMPLETED)
+        self.assertEqual(item.nonce, 0)
+
+    def test_rejected_send_releases_the_nonce_and_retries(self):
+        self.node.set_eth_balance(self.system.address, 0)
+        item = self.release()
+        self.assertEqual(self.worker.submit_pending(), 0)
+
+        item.refresh_from_db()
+        self.assertEqual(item.status, TransactionQueue.PENDING)
+        self.assertEqual(item.tx_hash, '')
+        self.assertIsNone(item.nonce)
+        self.assertEqual(item.retry_count, 1)
+        self.assertIn("insufficient funds", item.last_error)
+        self.assertEqual(list(ReleasedNonce.objects.values_list('nonce', flat=True)), [0])
+
+        self.node.set_eth_balance(self.system.address, 10 * ETH)
+        self.worker.submit_pending()
+        item.refresh_from_db()
+        self.assertEqual(item.nonce, 0)
+
+    def test_stuck_transaction_is_replaced_with_higher_fees(self):
+        item = self.release()
+        self.worker.submit_pending()
+        item.refresh_from_db()
+        first_hash, first_fee = item.tx_hash, item.max_fee_per_gas
+
+        self.assertEqual(self.worker.track_receipts(), 0)
+        item.refresh_from_db()
+        self.assertEqual(item.replacements, 1)
+        self.assertEqual(item.replaced_hashes, [first_hash])
+        self.assertNotEqual(item.tx_hash, first_hash)
+        self.assertGreater(item.max_fee_per_gas, first_fee * 11 // 10)
+
+        self.node.mine()
+        self.worker.track_receipts()
+        item.refresh_from_db()
+        self.assertEqual(item.status, TransactionQueue.COMPLETED)
+        self.assertEqual(self.node.token_balance(item.to_address), 5 * 10 ** 6)
+
+    def test_dropped_transaction_is_abandoned_and_its_nonce_reused(self):
+        item = self.release()
+        self.worker.submit_pending()
+        for _ in range(2):
+            self.node.drop_pending()
+            self.worker.track_receipts()
+
+        item.refresh_from_db()
+        self.assertEqual(item.status, TransactionQueue.FAILED)
+        self.assertEqual(EscrowWallet.objects.get(pk=item.escrow_id).status, EscrowWallet.STATUS_FUNDED)
+        self.assertEqual(list(ReleasedNonce.objects.values_list('nonce', flat=True)), [item.nonce])
+
+        other = self.release()
+        self.worker.submit_pending()
+        other.refresh_from_db()
+        self.assertEqual(other.nonce, item.nonce)
+
+    def test_nonce_used_by_another_transaction_fails_the_row(self):
+        item = self.release()
+        self.worker.submit_pending()
+        item.refresh_from_db()
+        self.node.drop_pending()
+        self.foreign_tx(item.nonce)
+        self.node.mine()
+
+        self.worker.track_receipts()  # replacement is refused: the nonce is gone
+        self.assertEqual(self.worker.track_receipts(), 1)
+        item.refresh_from_db()
+        self.assertEqual(item.status, TransactionQueue.FAILED)
+        self.assertIn("not one of ours", item.last_error)
+        self.assertFalse(ReleasedNonce.objects.exists())
+
+    def test_row_abandoned_between_claim_and_signing_is_reclaimed(self):
+        item = self.release()
+        self.worker.claim()
+        self.assertEqual(self.worker.reclaim_stale(), 0)
+
+        TransactionQueue.objects.filter(pk=item.pk).update(updated_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.worker.reclaim_stale(), 1)
+        item.refresh_from_db()
+        self.assertEqual(item.status, TransactionQueue.PENDING)
+
+        self.worker.submit_pending()
+        item.refresh_from_db()
+        self.assertTrue(item.tx_hash)
+        self.assertEqual(item.nonce, 0)
+
+
+class SweepTests(SimChainMixin, TestCase):
+    LEFTOVER = 3 * 10 ** 6
+
+    def setUp(self):
+        super().setUp()
+        self.engine = SweepEngine(token=self.token)
+
+    def released_escrow(self, eth=0):
+        account = Account.create()
+        wallet = EscrowWallet.objects.create(
+            address=account.address,
+            private_key_enc=EscrowWallet.encrypt_private_key(account.key.hex()),
+            user_token='sweep-tests',
+            balance_commitment='0' * 64,
+            status=EscrowWallet.STATUS_RELEASED,
+        )
+        self.node.set_token_balance(wallet.address, self.LEFTOVER)
+        self.node.set_eth_balance(wallet.address, eth)
+        return wallet
+
+    def test_escrow_without_gas_is_topped_up_once_then_swept(self):
+        wallet = self.released_escrow()
+        report = self.engine.run()
+        self.assertEqual((report.topups, report.sweeps, report.submitted), (1, 0, 1))
+        wallet.refresh_from_db()
+        self.assertIsNotNone(wallet.topped_up_at)
+
+        # The simulator credits a top-up when it is sent; read it as not mined yet
+        self.node.set_eth_balance(wallet.address, 0)
+        report = self.engine.run()
+        self.assertEqual((report.topups, report.waiting, report.submitted), (0, 1, 0))
+
+        self.node.set_eth_balance(wallet.address, ETH)
+        self.node.mine()
+        report = self.engine.run()
+        self.assertEqual((report.sweeps, report.submitted), (1, 1))
+        self.node.mine()
+        wallet.refresh_from_db()
+        self.assertIsNotNone(wallet.swept_at)
+        self.assertEqual(self.node.token_balance(wallet.address), 0)
+        self.assertEqual(self.node.token_balance(self.system.address), 10 ** 12 + self.LEFTOVER)
+
+    def test_top_up_that_never_lands_is_sent_again_after_the_timeout(self):
+        wallet = self.released_escrow()
+        self.engine.run()
+        self.node.set_eth_balance(wallet.address, 0)
+        EscrowWallet.objects.filter(pk=wallet.pk).update(topped_up_at=timezone.now() - timedelta(hours=1))
+        report = self.engine.run()
+        self.assertEqual((report.topups, report.submitted), (1, 1))
+
+    def test_signing_failure_releases_every_allocated_nonce(self):
+        self.released_escrow(eth=ETH)
+        broken = self.released_escrow(eth=ETH)
+        EscrowWallet.objects.filter(pk=broken.pk).update(private_key_enc='not a fernet token')
+
+        with self.assertRaises(Exception):
+            self.engine.run()
+        self.assertEqual(ReleasedNonce.objects.count(), 2)
+        self.assertEqual(self.node.method_counts['eth_sendRawTransaction'], 0)
+
+    def test_unanswered_batch_resyncs_instead_of_reusing_nonces(self):
+        wallet = self.released_escrow(eth=ETH)
+        provider = self.w3.provider
+        send_batch = provider.make_batch_request
+
+        def sent_then_lost(requests):
+            responses = send_batch(requests)
+            if requests[0][0] == "eth_sendRawTransaction":
+                raise ConnectionError("connection reset")
+            return responses
+
+        with mock.patch.object(provider, 'make_batch_request', side_effect=sent_then_lost):
+            report = self.engine.run()
+        self.assertEqual((report.submitted, report.failed), (0, 1))
+        self.assertFalse(ReleasedNonce.objects.exists())
+        self.assertEqual(AddressNonce.objects.get(address=wallet.address).next_nonce, 1)
+
+
+class TxStatusTests(SimChainMixin, TestCase):
+    """Recorded statuses follow a reorg: back to pending, then the block the transaction lands in."""
+
+    xusdt = {'TX_FINALITY_CONFIRMATIONS': 3, 'HEAD_BLOCK_TTL': 0}
+
+    def setUp(self):
+        super().setUp()
+        self.tx_hash = self.w3.to_hex(self.foreign_tx(0))
+        self.node.mine()
+        self.tracker = TxStatusTracker(w3=self.w3)
+
+    def test_tracker_follows_a_reorg(self):
+        self.assertEqual(tx_status.lookup(self.tx_hash)['block_number'], 1)
+        self.node.mine(3)
+        self.node.reorg(4)
+        self.assertEqual(self.tracker.run_once(), 1)
+        row = TxStatus.objects.get(tx_hash=self.tx_hash)
+        self.assertEqual((row.status, row.block_number, row.block_hash), (TxStatus.PENDING, None, ''))
+        self.assertIsNone(tx_status.lookup(self.tx_hash))
+
+        self.node.mine()
+        self.assertEqual(self.tracker.run_once(), 1)
+        status = tx_status.lookup(self.tx_hash)
+        self.assertEqual((status['block_number'], status['confirmations'], status['final']), (5, 0, False))
+
+        self.node.mine(3)
+        self.tracker.run_once()
+        self.node.reset_counters()
+        status = tx_status.lookup(self.tx_hash)
+        self.assertEqual((status['confirmations'], status['final']), (3, True))
+        self.assertFalse(self.node.method_counts)
+
+    def test_lookup_without_subscriber_rereads_a_due_receipt(self):
+        first = tx_status.lookup(self.tx_hash)
+        self.node.mine(3)
+        self.node.reorg(4)
+        self.node.mine()
+        status = tx_status.lookup(self.tx_hash)
+        self.assertEqual((first['block_number'], status['block_number']), (1, 5))
+        self.assertEqual(TxStatus.objects.get(tx_hash=self.tx_hash).block_hash, self.node.block_hash(5))
+
+    def test_hash_not_involving_us_is_not_recorded(self):
+        self.assertIsNone(tx_status.lookup(self.tx_hash, involves=[Account.create().address]))
+        self.assertFalse(TxStatus.objects.exists())
+        self.assertIsNotNone(tx_status.lookup(self.tx_hash, involves=[self.system.address]))
+
+
+class AsyncBodyTests(TestCase):
+    """Bad request bodies on the async views are answered with 400, not 500."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = AnonymousUser.objects.create_user('EX-24001', 'body-tests-password')
+        cls.escrow = EscrowWallet.objects.create(
+            address=Account.create().address,
+            user_token=cls.user.user_token,
+            balance_commitment='0' * 64,
+        )
+
+    def post(self, body):
+        return self.client.post(
+            reverse('escrow-fund', args=[self.escrow.id]),
+            body,
+            content_type='application/json',
+            headers={'X-Client-Token': self.user.client_token},
+        )
+
+    def test_malformed_json_is_rejected(self):
+        for body in ('{"min_amount": ', 'not json', '{"min_amount": 1,}'):
+            with self.subTest(body=body):
+                response = self.post(body)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json()['detail'], "Malformed JSON body")
+
+    def test_non_object_json_is_rejected(self):
+        self.assertEqual(self.post('[1, 2]').status_code, 400)
+
+    def test_non_finite_amounts_are_rejected(self):
+        for body in ('{"min_amount": "NaN"}', '{"min_amount": "Infinity"}', '{"min_amount": "-inf"}',
+                     '{"min_amount": NaN}', '{"min_amount": Infinity}', '{"min_amount": [1]}'):
+            with self.subTest(body=body):
+                self.assertEqual(self.post(body).status_code, 400)
+        self.escrow.refresh_from_db()
+        self.assertIsNone(self.escrow.expected_amount)
+
+
+class DrainedKeyPoolTests(TestCase):
+    """With the key pool empty and no encryption key, escrow creation answers 503, not 500."""
+
+    LISTING = {
+        "crypto_type": "sell", "crypto_currency": "USDT", "crypto_amount": "100", "fiat_currency": "USD",
+        "usdt_amount": "100", "payment_method": 1,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = AnonymousUser.objects.create_user('EX-22001', 'pool-tests-password')
+
+    def setUp(self):
+        self.enterContext(override_settings(ESCROW_WALLET_ENCRYPTION_KEY=''))
+        self.assertEqual(key_pool.available(), 0)
+
+    def post(self, name, body):
+        return self.client.post(
+            reverse(name), body, content_type='application/json',
+            headers={'X-Client-Token': self.user.client_token},
+        )
+
+    def test_escrow_wallet_create(self):
+        response = self.post('escrow-wallet-create', {"balance_commitment": "0" * 64})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json()['detail'], "No escrow address is available right now. Try again later.")
+        self.assertFalse(EscrowWallet.objects.exists())
+
+    def test_listing_create(self):
+        response = self.post('p2p-listing-list', self.LISTING)
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(EscrowWallet.objects.exists())
+
+    def test_pooled_hd_key_needs_no_encryption_key(self):
+        EscrowKey.objects.create(address=Account.create().address, derivation_index=0)
+        response = self.post('escrow-wallet-create', {"balance_commitment": "0" * 64})
+        self.assertEqual(response.status_code, 201, response.content[:200])
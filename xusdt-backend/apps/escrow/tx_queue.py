@@ -0,0 +1,406 @@
+"""
+TransactionQueue worker.
+
+Release endpoints only insert a `TransactionQueue` row, and this worker
+(`manage.py process_tx_queue`) does the chain work in two phases:
+
+1. Submit. Claim due PENDING rows with SELECT ... FOR UPDATE SKIP LOCKED,
+   which lets several workers run side by side. Each claimed row is marked
+   PROCESSING and signed with a nonce from the nonce manager and EIP-1559
+   fees from the gas oracle. Its hash and nonce are saved before the
+   broadcast, so from then on the row is tracked like any submitted one.
+   Only a send the node rejects outright gives the nonce back and retries
+   the row; a timeout or a dropped connection may still have delivered it,
+   so the row stays submitted and the tracking below settles it. While fees
+   are above the ceiling, rows wait without using up retries. Any other
+   failed submission returns the row to PENDING with exponential backoff,
+   and after TX_MAX_RETRIES it becomes FAILED.
+2. Track. Fetch the receipts of submitted rows in JSON-RPC batches. A mined
+   row becomes COMPLETED, and the escrow/trade bookkeeping happens then. A
+   reverted row becomes FAILED and its escrow returns to `funded`.
+3. Replace. A row with no receipt TX_RECEIPT_TIMEOUT after its broadcast is
+   re-signed with the same nonce and fees at least 12.5% above the previous
+   ones, or rebroadcast unchanged when that would pass the fee ceiling.
+   Earlier hashes stay tracked, since any of them may still be mined. After
+   TX_MAX_REPLACEMENTS, if the nonce is still unmined, the row becomes FAILED,
+   its escrow returns to `funded` and the nonce goes back to the nonce
+   manager, so the next transaction supersedes the stuck one. If the nonce
+   was mined but by none of the row's hashes, something else used it: the
+   row becomes FAILED and the nonce stays used.
+
+A row left PROCESSING without a tx_hash means the worker died between the
+claim and signing, before anything was broadcast. After TX_CLAIM_TIMEOUT
+it goes back to PENDING.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from web3 import Web3
+
+from apps.p2p.models import P2PTrade
+from apps.p2p.state_machine import escrow_machine, listing_machine, trade_machine
+from .exceptions import EscrowError, WalletError
+from .gas import GasOracle, GasPriceTooHighError
+from .models import EscrowAuditLog, SystemWallet, TransactionQueue
+from .nonces import NonceManager, is_rejected
+from .services import GAS_LIMIT, USDT, USDT_DECIMALS
+
+logger = logging.getLogger(__name__)
+
+RECEIPT_BATCH_SIZE = 100
+
+
+def _bump(fee: int) -> int:
+    # Nodes only replace a pending transaction that pays at least 10% more
+    return fee + fee // 8 + 1
+
+
+class TxQueueWorker:
+    def __init__(self, token=None, batch_size=None):
+        self.token = token or USDT
+        self.w3 = self.token.w3
+        self.nonces = NonceManager(self.w3)
+        self.gas = GasOracle(self.w3)
+        self.batch_size = batch_size or settings.XUSDT_SETTINGS["TX_QUEUE_BATCH_SIZE"]
+        self.max_retries = settings.XUSDT_SETTINGS["TX_MAX_RETRIES"]
+        self.backoff = settings.XUSDT_SETTINGS["TX_RETRY_BACKOFF"]
+        self.receipt_timeout = settings.XUSDT_SETTINGS["TX_RECEIPT_TIMEOUT"]
+        self.max_replacements = settings.XUSDT_SETTINGS["TX_MAX_REPLACEMENTS"]
+        self.claim_timeout = settings.XUSDT_SETTINGS["TX_CLAIM_TIMEOUT"]
+        self._chain_id = None
+
+    def run_once(self):
+        """Submit due transactions, track receipts and replace stuck ones; returns (submitted, finished)."""
+        self.reclaim_stale()
+        return self.submit_pending(), self.track_receipts()
+
+    # ------------------------------------------------------------------ #
+    # Submission                                                         #
+    # ------------------------------------------------------------------ #
+
+    def claim(self):
+        with transaction.atomic():
+            items = list(
+                TransactionQueue.objects.select_for_update(skip_locked=True)
+                .filter(status=TransactionQueue.PENDING, next_attempt_at__lte=timezone.now())
+                .order_by("next_attempt_at", "id")[:self.batch_size]
+            )
+            TransactionQueue.objects.filter(pk__in=[item.pk for item in items]).update(
+                status=TransactionQueue.PROCESSING, updated_at=timezone.now()
+            )
+        return items
+
+    def reclaim_stale(self) -> int:
+        """Return rows claimed by a worker that died before signing them to PENDING."""
+        cutoff = timezone.now() - timedelta(seconds=self.claim_timeout)
+        reclaimed = TransactionQueue.objects.filter(
+            status=TransactionQueue.PROCESSING, tx_hash='', updated_at__lt=cutoff
+        ).update(status=TransactionQueue.PENDING, next_attempt_at=timezone.now(), updated_at=timezone.now())
+        if reclaimed:
+            logger.warning("Reclaimed %d transaction(s) left unsigned by a stopped worker", reclaimed)
+        return reclaimed
+
+    def _signer(self):
+        system_wallet = SystemWallet.objects.first()
+        if system_wallet is None:
+            raise WalletError("No system wallet configured")
+        private_key = system_wallet.private_key_dec()
+        if self._chain_id is None:
+            self._chain_id = self.w3.eth.chain_id
+        return system_wallet, private_key
+
+    def _sign(self, item, address, nonce, fees, private_key):
+        tx = self.token.functions.transfer(
+            Web3.to_checksum_address(item.to_address),
+            int(item.amount * (10 ** USDT_DECIMALS)),
+        ).build_transaction({
+            'from': address,
+            'chainId': self._chain_id,
+            'gas': GAS_LIMIT,
+            'nonce': nonce,
+            **fees,
+        })
+        return self.w3.eth.account.sign_transaction(tx, private_key)
+
+    def submit_pending(self) -> int:
+        items = self.claim()
+        if not items:
+            return 0
+
+        try:
+            system_wallet, private_key = self._signer()
+            fees = self.gas.fee_fields()
+        except GasPriceTooHighError as e:
+            # Not the transaction's fault; wait without using up retries
+            for item in items:
+                self._retry(item, e, count=False)
+            return 0
+        except Exception as e:
+            for item in items:
+                self._retry(item, e)
+            return 0
+
+        submitted = 0
+        for item in items:
+            if self._submit(item, system_wallet, private_key, fees):
+                submitted += 1
+        return submitted
+
+    def _submit(self, item, system_wallet, private_key, fees) -> bool:
+        address = system_wallet.address
+        try:
+            with self.nonces.nonce_for(address) as nonce:
+                signed_tx = self._sign(item, address, nonce, fees, private_key)
+        except Exception as e:
+            self._retry(item, e)
+            return False
+
+        # Saved before the broadcast: once it may be in flight, a crash must
+        # leave a hash to track rather than a row that looks unsent
+        item.tx_hash = Web3.to_hex(signed_tx.hash)
+        item.nonce = nonce
+        item.submitted_at = timezone.now()
+        item.max_fee_per_gas = fees["maxFeePerGas"]
+        item.max_priority_fee_per_gas = fees["maxPriorityFeePerGas"]
+        fields = ["tx_hash", "nonce", "submitted_at", "max_fee_per_gas", "max_priority_fee_per_gas"]
+        item.save(update_fields=fields)
+
+        try:
+            self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        except Exception as e:
+            if not is_rejected(e):
+                # It may have reached the node; receipts and replacement settle it
+                item.last_error = str(e)
+                item.save(update_fields=["last_error"])
+                logger.warning("Transaction #%s sent with an unclear result: %s", item.pk, e)
+                return True
+            try:
+                self.nonces.failed(address, nonce, e)
+            except Exception:
+                logger.exception("Nonce recovery failed for %s", address)
+            item.tx_hash = ''
+            item.nonce = item.submitted_at = item.max_fee_per_gas = item.max_priority_fee_per_gas = None
+            item.save(update_fields=fields)
+            self._retry(item, e)
+            return False
+        return True
+
+    def _retry(self, item, error, count=True):
+        if count:
+            item.retry_count += 1
+        item.last_error = str(error)
+        if item.retry_count >= self.max_retries:
+            logger.error("Transaction #%s failed after %d attempts: %s", item.pk, item.retry_count, error)
+            self._fail(item)
+            return
+
+        item.status = TransactionQueue.PENDING
+        item.next_attempt_at = timezone.now() + timedelta(seconds=self.backoff * 2 ** max(item.retry_count - 1, 0))
+        item.save(update_fields=["status", "retry_count", "last_error", "next_attempt_at"])
+        if count:
+            logger.warning("Transaction #%s attempt %d failed: %s", item.pk, item.retry_count, error)
+        else:
+            logger.info("Transaction #%s deferred: %s", item.pk, error)
+
+    # ------------------------------------------------------------------ #
+    # Receipt tracking                                                   #
+    # ------------------------------------------------------------------ #
+
+    def track_receipts(self) -> int:
+        items = list(
+            TransactionQueue.objects.filter(status=TransactionQueue.PROCESSING)
+            .exclude(tx_hash='')
+            .order_by("submitted_at")
+        )
+        cutoff = timezone.now() - timedelta(seconds=self.receipt_timeout)
+        finished, stuck = 0, []
+        for start in range(0, len(items), RECEIPT_BATCH_SIZE):
+            chunk = items[start:start + RECEIPT_BATCH_SIZE]
+            hashes = [(item, tx_hash) for item in chunk for tx_hash in [item.tx_hash, *item.replaced_hashes]]
+            responses = self.w3.provider.make_batch_request(
+                [("eth_getTransactionReceipt", [tx_hash]) for _, tx_hash in hashes]
+            )
+            if not isinstance(responses, list):
+                logger.error("Receipt batch failed: %s", responses)
+                continue
+
+            receipts = {}
+            for (item, _), response in zip(hashes, responses):
+                if response.get("result"):
+                    receipts[item.pk] = response["result"]
+            for item in chunk:
+                receipt = receipts.get(item.pk)
+                if not receipt:
+                    if item.submitted_at and item.submitted_at < cutoff:
+                        stuck.append(item)
+                    continue
+                # Any of the hashes sent with this nonce may be the one mined
+                item.tx_hash = receipt["transactionHash"]
+                if int(receipt["status"], 16) == 1:
+                    self._complete(item, receipt)
+                else:
+                    item.last_error = "Transaction reverted"
+                    self._fail(item)
+                finished += 1
+
+        if stuck:
+            finished += self.replace_stuck(stuck)
+        return finished
+
+    # ------------------------------------------------------------------ #
+    # Replacement                                                        #
+    # ------------------------------------------------------------------ #
+
+    def replace_stuck(self, items) -> int:
+        """Replace rows that have waited TX_RECEIPT_TIMEOUT for a receipt; returns rows given up on."""
+        try:
+            system_wallet, private_key = self._signer()
+        except Exception as e:
+            logger.error("Cannot replace %d stuck transaction(s): %s", len(items), e)
+            return 0
+
+        failed = 0
+        for item in items:
+            if item.replacements < self.max_replacements:
+                self._replace(item, system_wallet.address, private_key)
+            elif self._abandon(item, system_wallet.address):
+                failed += 1
+        return failed
+
+    def _replacement_fees(self, item) -> dict:
+        fees = self.gas.fee_fields()
+        if item.max_fee_per_gas is None:
+            return fees
+        fees = {
+            "maxFeePerGas": max(fees["maxFeePerGas"], _bump(item.max_fee_per_gas)),
+            "maxPriorityFeePerGas": max(fees["maxPriorityFeePerGas"], _bump(item.max_priority_fee_per_gas)),
+        }
+        if fees["maxFeePerGas"] > self.gas.ceiling:
+            raise GasPriceTooHighError(
+                f"Replacing transaction #{item.pk} needs {fees['maxFeePerGas']} wei, above the ceiling"
+            )
+        return fees
+
+    def _replace(self, item, address, private_key):
+        try:
+            fees = self._replacement_fees(item)
+        except EscrowError as e:
+            if item.max_fee_per_gas is None:
+                logger.warning("Transaction #%s not replaced: %s", item.pk, e)
+                return
+            # Signing the same fields again gives the same transaction
+            logger.info("Transaction #%s rebroadcast without a fee bump: %s", item.pk, e)
+            fees = {"maxFeePerGas": item.max_fee_per_gas, "maxPriorityFeePerGas": item.max_priority_fee_per_gas}
+
+        try:
+            signed_tx = self._sign(item, address, item.nonce, fees, private_key)
+        except Exception as e:
+            signed_tx = None
+            item.last_error = str(e)
+            logger.warning("Replacing transaction #%s failed: %s", item.pk, e)
+
+        sent = False
+        if signed_tx is not None:
+            try:
+                self.w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+                sent = True
+            except Exception as e:
+                # Unless the node refused it, the replacement may be in flight and must be tracked
+                sent = not is_rejected(e)
+                item.last_error = str(e)
+                logger.warning("Replacing transaction #%s: %s", item.pk, e)
+
+        if sent:
+            tx_hash = Web3.to_hex(signed_tx.hash)
+            if tx_hash != item.tx_hash:
+                item.replaced_hashes = [*item.replaced_hashes, item.tx_hash]
+                item.tx_hash = tx_hash
+            item.max_fee_per_gas = fees["maxFeePerGas"]
+            item.max_priority_fee_per_gas = fees["maxPriorityFeePerGas"]
+            logger.warning("Transaction #%s had no receipt, replaced by %s", item.pk, tx_hash)
+        # A failed attempt uses up a replacement too, so a row cannot stay stuck forever
+        item.replacements += 1
+        item.submitted_at = timezone.now()
+        item.save(update_fields=[
+            "tx_hash", "replaced_hashes", "max_fee_per_gas", "max_priority_fee_per_gas",
+            "replacements", "submitted_at", "last_error",
+        ])
+
+    def _abandon(self, item, address) -> bool:
+        try:
+            mined = self.w3.eth.get_transaction_count(address, "latest")
+        except Exception as e:
+            logger.warning("Cannot check the nonce of stuck transaction #%s: %s", item.pk, e)
+            return False
+        if mined > item.nonce:
+            hashes = [item.tx_hash, *item.replaced_hashes]
+            try:
+                responses = self.w3.provider.make_batch_request(
+                    [("eth_getTransactionReceipt", [tx_hash]) for tx_hash in hashes]
+                )
+            except Exception as e:
+                logger.warning("Cannot check the receipts of stuck transaction #%s: %s", item.pk, e)
+                return False
+            if not isinstance(responses, list) or any(
+                response.get("error") or response.get("result") for response in responses
+            ):
+                # One of its hashes was mined after the receipt batch; the next pass records it
+                return False
+            item.last_error = f"Nonce {item.nonce} was used by a transaction that is not one of ours"
+            logger.error("Transaction #%s failed, review the sender's history: %s", item.pk, item.last_error)
+            self._fail(item)
+            return True
+
+        item.last_error = f"No receipt after {item.replacements} replacement(s)"
+        logger.error("Transaction #%s failed: %s", item.pk, item.last_error)
+        self._fail(item)
+        # The next transaction takes the nonce, so the stuck one can no longer be mined
+        self.nonces.release(address, item.nonce)
+        return True
+
+    @transaction.atomic
+    def _complete(self, item, receipt):
+        now = timezone.now()
+        updated = TransactionQueue.objects.filter(
+            pk=item.pk, status=TransactionQueue.PROCESSING
+        ).update(status=TransactionQueue.COMPLETED, tx_hash=item.tx_hash, processed_at=now)
+        if not updated:
+            return
+
+        if item.fee:
+            SystemWallet.objects.filter(address__iexact=receipt["from"]).update(
+                collected_fees=F("collected_fees") + item.fee
+            )
+
+        if item.escrow_id:
+            escrow_machine.apply('release', [item.escrow_id], actor='tx_queue', reason=item.tx_hash)
+            EscrowAuditLog.objects.create(
+                escrow_id=item.escrow_id,
+                action='RELEASE',
+                details={
+                    "tx_hash": item.tx_hash,
+                    "to": item.to_address,
+                    "amount": str(item.amount),
+                    "fee": str(item.fee),
+                    "block": int(receipt["blockNumber"], 16),
+                },
+            )
+
+        if item.trade_id:
+            # Completing the trade also records its volume (apps.p2p.signals)
+            if trade_machine.apply('complete', [item.trade_id], actor='tx_queue', condition=Q(status=2)):
+                listing_id = P2PTrade.objects.filter(pk=item.trade_id).values_list("listing_id", flat=True).first()
+                listing_machine.apply('complete', [listing_id], actor='tx_queue')
+
+    @transaction.atomic
+    def _fail(self, item):
+        item.status = TransactionQueue.FAILED
+        item.processed_at = timezone.now()
+        item.save(update_fields=["status", "tx_hash", "retry_count", "last_error", "processed_at"])
+        if item.escrow_id:
+            # Let the seller retry the release
+            escrow_machine.apply('release_failed', [item.escrow_id], actor='tx_queue', reason=(item.last_error or '')[:255])
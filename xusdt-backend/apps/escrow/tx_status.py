@@ -0,0 +1,368 @@
+"""
+Receipt and confirmation tracking for the transaction hashes we report on.
+
+`lookup()` / `alookup()` serve the status of release hashes, trade
+escrow_tx_hash, SwapTransaction.tx_hash and BridgeTransaction.deposit_tx_hash
+from a TxStatus row keyed by chain id and hash, and read each on the client
+of its own chain. The first lookup of a hash fetches its receipt. It is
+recorded only once mined, and for user-submitted hashes only if it touches
+an address we expect (`involves`). Anything else is answered as not found,
+with the answer cached for HEAD_BLOCK_TTL. Once a hash is recorded, its
+confirmations are the chain's head block number minus the recorded block,
+so a lookup asks the node for neither.
+
+The head of each chain is a ChainHead row, so every process sees it. A
+single subscriber per chain, `manage.py track_tx_status` (TxStatusTracker),
+publishes it. On each new head the tracker also re-reads the receipts of
+open rows: hashes a reorg sent back to pending, for up to
+TX_STATUS_PENDING_TIMEOUT after they were recorded, and mined ones that
+reached TX_FINALITY_CONFIRMATIONS. A receipt read at that depth is final.
+If its block hash changed, the transaction was reorged and the row takes
+the new block, or goes back to pending. Final statuses are cached for
+TX_STATUS_CACHE_TTL and never cost an RPC again.
+
+Without the subscriber, the first lookup after HEAD_BLOCK_TTL reads the head
+inline (as GasOracle does for fees), and lookups re-read the receipt of
+pending and due rows themselves.
+"""
+import logging
+import re
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from web3 import Web3
+from web3.exceptions import TransactionNotFound
+
+from apps.core.chain import get_async_web3, get_web3
+from .exceptions import EscrowError
+from .models import ChainHead, TxStatus
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "txstatus:"
+UNKNOWN = "unknown"
+TX_HASH = re.compile(r"^0x[0-9a-f]{64}$")
+STATE_FIELDS = ("status", "block_number", "block_hash", "gas_used", "final")
+
+
+def normalize_hash(tx_hash) -> Optional[str]:
+    """Lowercase 0x-prefixed hash, or None if `tx_hash` cannot be a transaction hash."""
+    tx_hash = (tx_hash or "").strip().lower()
+    if tx_hash and not tx_hash.startswith("0x"):
+        tx_hash = "0x" + tx_hash
+    return tx_hash if TX_HASH.match(tx_hash) else None
+
+
+def _finality() -> int:
+    return settings.XUSDT_SETTINGS["TX_FINALITY_CONFIRMATIONS"]
+
+
+# ---------------------------------------------------------------------- #
+# Head block                                                             #
+# ---------------------------------------------------------------------- #
+
+def _chain(chain_id) -> int:
+    return chain_id or settings.CHAIN_ID
+
+
+def set_head(chain_id, number: int, subscriber=False) -> ChainHead:
+    head = ChainHead(chain_id=chain_id, block_number=number, subscriber=subscriber, updated_at=timezone.now())
+    ChainHead.objects.bulk_create(
+        [head], update_conflicts=True, unique_fields=["chain_id"],
+        update_fields=["block_number", "subscriber", "updated_at"],
+    )
+    return head
+
+
+async def aset_head(chain_id, number: int, subscriber=False) -> ChainHead:
+    head = ChainHead(chain_id=chain_id, block_number=number, subscriber=subscriber, updated_at=timezone.now())
+    await ChainHead.objects.abulk_create(
+        [head], update_conflicts=True, unique_fields=["chain_id"],
+        update_fields=["block_number", "subscriber", "updated_at"],
+    )
+    return head
+
+
+def _is_fresh(head) -> bool:
+    age = timezone.now() - head.updated_at if head is not None else None
+    return age is not None and age < timedelta(seconds=settings.XUSDT_SETTINGS["HEAD_BLOCK_TTL"])
+
+
+def _refresh_failed(head, error):
+    if head is None:
+        raise EscrowError(f"Head block unavailable: {error}")
+    logger.warning("Head block refresh failed, using block %s: %s", head.block_number, error)
+    head.subscriber = False
+    return head
+
+
+def _head(chain_id) -> ChainHead:
+    # A stale head keeps the row, so a failed inline refresh can fall back to it
+    head = ChainHead.objects.filter(pk=chain_id).first()
+    if _is_fresh(head):
+        return head
+    try:
+        return set_head(chain_id, get_web3(chain_id=chain_id).eth.block_number)
+    except Exception as e:
+        return _refresh_failed(head, e)
+
+
+async def _ahead(chain_id) -> ChainHead:
+    head = await ChainHead.objects.filter(pk=chain_id).afirst()
+    if _is_fresh(head):
+        return head
+    try:
+        number = await get_async_web3(chain_id=chain_id).eth.block_number
+    except Exception as e:
+        return _refresh_failed(head, e)
+    return await aset_head(chain_id, number)
+
+
+def head_block(chain_id=None) -> int:
+    """Latest block number of a chain (default CHAIN_ID), as published by the tracker."""
+    return _head(_chain(chain_id)).block_number
+
+
+# ---------------------------------------------------------------------- #
+# Rows                                                                   #
+# ---------------------------------------------------------------------- #
+
+def _receipt(w3, tx_hash):
+    try:
+        return w3.eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        return None
+    except Exception as e:
+        raise EscrowError(f"Failed to check transaction status: {e}")
+
+
+async def _areceipt(w3, tx_hash):
+    try:
+        return await w3.eth.get_transaction_receipt(tx_hash)
+    except TransactionNotFound:
+        return None
+    except Exception as e:
+        raise EscrowError(f"Failed to check transaction status: {e}")
+
+
+def _is_ours(receipt, involves) -> bool:
+    """Whether a mined receipt is sent by, sent to or logs one of the `involves` addresses."""
+    if receipt is None:
+        return False
+    if involves is None:
+        return True
+    wanted = {address.lower() for address in involves if address}
+    if (receipt["from"] or "").lower() in wanted or (receipt["to"] or "").lower() in wanted:
+        return True
+    # Indexed address arguments, e.g. both sides of an ERC-20 Transfer
+    topics = {"0x" + address[2:].rjust(64, "0") for address in wanted}
+    return any(Web3.to_hex(topic) in topics for log in receipt["logs"] for topic in log["topics"][1:])
+
+
+def _apply(row, receipt, head: int):
+    """Copy a freshly read receipt (None: not mined) onto `row`."""
+    block_hash = Web3.to_hex(receipt["blockHash"]) if receipt else ""
+    if row.block_hash and block_hash != row.block_hash:
+        logger.warning("Transaction %s is no longer in block %s (reorg)", row.tx_hash, row.block_hash)
+    if receipt is None:
+        row.status, row.block_number, row.gas_used = TxStatus.PENDING, None, None
+    else:
+        row.status = TxStatus.SUCCESS if receipt["status"] == 1 else TxStatus.FAILED
+        row.block_number = receipt["blockNumber"]
+        row.gas_used = receipt["gasUsed"]
+    row.block_hash = block_hash
+    row.final = receipt is not None and head - row.block_number >= _finality()
+
+
+def _state(row) -> dict:
+    return {field: getattr(row, field) for field in STATE_FIELDS}
+
+
+def _is_stale(row, head) -> bool:
+    """Whether a lookup has to re-read the receipt because the tracker will not."""
+    if row.status == TxStatus.PENDING:
+        cutoff = timezone.now() - timedelta(seconds=settings.XUSDT_SETTINGS["TX_STATUS_PENDING_TIMEOUT"])
+        return not head.subscriber or row.created_at < cutoff
+    return not head.subscriber and head.block_number - row.block_number >= _finality()
+
+
+def _result(state, head: Optional[int]) -> Optional[dict]:
+    """check_transaction_status() shape; None while the transaction is not mined."""
+    if state == UNKNOWN or state["status"] == TxStatus.PENDING:
+        return None
+    confirmations = max(head - state["block_number"], 0) if head is not None else 0
+    if state["final"]:
+        confirmations = max(confirmations, _finality())
+    return {
+        "status": state["status"],
+        "block_number": state["block_number"],
+        "gas_used": state["gas_used"],
+        "confirmations": confirmations,
+        "final": state["final"],
+    }
+
+
+def _cache_key(chain_id, tx_hash) -> str:
+    return f"{CACHE_KEY_PREFIX}{chain_id}:{tx_hash}"
+
+
+def _cache_final(row):
+    cache.set(_cache_key(row.chain_id, row.tx_hash), _state(row), timeout=settings.XUSDT_SETTINGS["TX_STATUS_CACHE_TTL"])
+
+
+def _cache_unknown(chain_id, tx_hash):
+    # Throttles the receipt reads of hashes we do not record
+    cache.set(_cache_key(chain_id, tx_hash), UNKNOWN, timeout=settings.XUSDT_SETTINGS["HEAD_BLOCK_TTL"])
+
+
+# ---------------------------------------------------------------------- #
+# Lookups                                                                #
+# ---------------------------------------------------------------------- #
+
+def lookup(tx_hash, chain_id=None, involves=None) -> Optional[dict]:
+    """
+    Receipt status and confirmations of `tx_hash` on `chain_id` (default
+    CHAIN_ID), or None until it is mined.
+
+    `involves` lists the addresses a user-submitted hash must touch as
+    sender, recipient or indexed log argument; other transactions are
+    reported as not found and never recorded. Leave it None for hashes we
+    broadcast ourselves.
+
+    Raises:
+        EscrowError: If the node has to be asked and cannot answer
+    """
+    tx_hash = normalize_hash(tx_hash)
+    if tx_hash is None:
+        return None
+    chain_id = _chain(chain_id)
+
+    row = None
+    state = cache.get(_cache_key(chain_id, tx_hash))
+    if state is None:
+        row = TxStatus.objects.filter(chain_id=chain_id, tx_hash=tx_hash).first()
+        if row is not None and row.final:
+            state = _state(row)
+            _cache_final(row)
+    if state == UNKNOWN:
+        return None
+    if state is not None:
+        # Final rows never refresh the head; a stale one only undercounts confirmations
+        head = ChainHead.objects.filter(pk=chain_id).values_list("block_number", flat=True).first()
+        return _result(state, head)
+
+    head = _head(chain_id)
+    if row is None:
+        receipt = _receipt(get_web3(chain_id=chain_id), tx_hash)
+        if not _is_ours(receipt, involves):
+            _cache_unknown(chain_id, tx_hash)
+            return None
+        row = TxStatus(chain_id=chain_id, tx_hash=tx_hash)
+        _apply(row, receipt, head.block_number)
+        # A concurrent first lookup may insert the same hash; either row holds a fresh receipt
+        TxStatus.objects.bulk_create([row], ignore_conflicts=True)
+    elif _is_stale(row, head):
+        before = _state(row)
+        _apply(row, _receipt(get_web3(chain_id=chain_id), tx_hash), head.block_number)
+        if _state(row) != before:
+            row.save(update_fields=[*STATE_FIELDS, "updated_at"])
+    if row.final:
+        _cache_final(row)
+    return _result(_state(row), head.block_number)
+
+
+def lookup_or_none(tx_hash, chain_id=None, involves=None) -> Optional[dict]:
+    """lookup() for status endpoints: a node failure is logged and reported as no receipt."""
+    try:
+        return lookup(tx_hash, chain_id=chain_id, involves=involves)
+    except EscrowError as e:
+        logger.warning("Status lookup for %s failed: %s", tx_hash, e)
+        return None
+
+
+async def alookup(tx_hash, chain_id=None, involves=None) -> Optional[dict]:
+    """Async lookup(): async cache, ORM and AsyncWeb3 client."""
+    tx_hash = normalize_hash(tx_hash)
+    if tx_hash is None:
+        return None
+    chain_id = _chain(chain_id)
+
+    row = None
+    state = await cache.aget(_cache_key(chain_id, tx_hash))
+    if state is None:
+        row = await TxStatus.objects.filter(chain_id=chain_id, tx_hash=tx_hash).afirst()
+        if row is not None and row.final:
+            state = _state(row)
+            await cache.aset(
+                _cache_key(chain_id, tx_hash), state, timeout=settings.XUSDT_SETTINGS["TX_STATUS_CACHE_TTL"]
+            )
+    if state == UNKNOWN:
+        return None
+    if state is not None:
+        head = await ChainHead.objects.filter(pk=chain_id).values_list("block_number", flat=True).afirst()
+        return _result(state, head)
+
+    head = await _ahead(chain_id)
+    if row is None:
+        receipt = await _areceipt(get_async_web3(chain_id=chain_id), tx_hash)
+        if not _is_ours(receipt, involves):
+            await cache.aset(
+                _cache_key(chain_id, tx_hash), UNKNOWN, timeout=settings.XUSDT_SETTINGS["HEAD_BLOCK_TTL"]
+            )
+            return None
+        row = TxStatus(chain_id=chain_id, tx_hash=tx_hash)
+        _apply(row, receipt, head.block_number)
+        await TxStatus.objects.abulk_create([row], ignore_conflicts=True)
+    elif _is_stale(row, head):
+        before = _state(row)
+        _apply(row, await _areceipt(get_async_web3(chain_id=chain_id), tx_hash), head.block_number)
+        if _state(row) != before:
+            await row.asave(update_fields=[*STATE_FIELDS, "updated_at"])
+    if row.final:
+        await cache.aset(
+            _cache_key(chain_id, tx_hash), _state(row), timeout=settings.XUSDT_SETTINGS["TX_STATUS_CACHE_TTL"]
+        )
+    return _result(_state(row), head.block_number)
+
+
+# ---------------------------------------------------------------------- #
+# Subscriber                                                             #
+# ---------------------------------------------------------------------- #
+
+class TxStatusTracker:
+    """Head subscriber of one chain: publishes its head and refreshes open rows once per new block."""
+
+    def __init__(self, w3=None, chain_id=None, batch_size=None):
+        self.chain_id = _chain(chain_id)
+        self.w3 = w3 or get_web3(chain_id=self.chain_id)
+        self.batch_size = batch_size or settings.XUSDT_SETTINGS["TX_STATUS_BATCH_SIZE"]
+        self.last_head = None
+
+    def run_once(self) -> int:
+        """Publish the head; on a new block, re-read due receipts. Returns rows that changed."""
+        head = self.w3.eth.block_number
+        set_head(self.chain_id, head, subscriber=True)
+        if head == self.last_head:
+            return 0
+
+        cutoff = timezone.now() - timedelta(seconds=settings.XUSDT_SETTINGS["TX_STATUS_PENDING_TIMEOUT"])
+        rows = TxStatus.objects.filter(chain_id=self.chain_id, final=False).filter(
+            Q(status=TxStatus.PENDING, created_at__gte=cutoff)
+            | Q(block_number__lte=head - _finality())
+        ).order_by("updated_at")[:self.batch_size]
+
+        changed = 0
+        for row in rows:
+            before = _state(row)
+            _apply(row, _receipt(self.w3, row.tx_hash), head)
+            # Saved even when unchanged, so `updated_at` rotates a backlog through the batches
+            row.save(update_fields=[*STATE_FIELDS, "updated_at"])
+            if row.final:
+                _cache_final(row)
+            changed += _state(row) != before
+        self.last_head = head
+        return changed
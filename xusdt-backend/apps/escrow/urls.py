@@ -4,13 +4,17 @@ from .views import (
     EscrowWalletDetailView,
     SystemWalletListView,
     EscrowWalletListView,
-    EscrowReleaseView,
-    EscrowFundView,
     EscrowDisputeView,
     EscrowUpdateView,
     EscrowStatusView,
-    ReleaseEscrowView,
+)
+# Chain-bound endpoints are async views (served natively under ASGI)
+from .async_views import (
+    EscrowFundView,
+    EscrowReleaseView,
     FundEscrowView,
+    ReleaseEscrowView,
+    TransactionStatusView,
 )
 
 urlpatterns = [
@@ -26,5 +30,6 @@ urlpatterns = [
     path('wallets/by-listing/<uuid:listing_id>/', EscrowStatusView.as_view(), name='escrow-wallets-by-listing'),
     path('listings/<uuid:listing_id>/fund/', FundEscrowView.as_view(), name='p2p-listing-fund'),
     path('trades/<uuid:trade_id>/release/', ReleaseEscrowView.as_view(), name='p2p-trade-release'),
+    path('transactions/<int:pk>/', TransactionStatusView.as_view(), name='escrow-transaction-detail'),
 
 ]
\ No newline at end of file
@@ -1,21 +1,26 @@
 # p2p/utils.py
-import json
-import time
 from decimal import Decimal
 from pathlib import Path
 from typing import Optional, Tuple
 
 from django.conf import settings
 from django.db import transaction
+from django.db.models import F
+from django.utils.functional import SimpleLazyObject
 from web3 import Web3
 from web3.exceptions import ContractLogicError, TransactionNotFound
 from web3.types import TxReceipt
 from eth_account import Account
 from eth_account.messages import encode_defunct
-import hmac
 import hashlib
 
-from .models import EscrowWallet, P2PListing, P2PTrade
+from apps.core.chain import get_web3, load_abi
+from apps.core.models import derive_user_token
+from apps.escrow.balances import read_balance
+
+from .models import EscrowWallet, P2PListing, P2PTrade, SystemWallet
+from .gas import GasOracle
+from .nonces import NonceManager
 from .exceptions import (
     EscrowError,
     InsufficientFundsError,
@@ -25,30 +30,24 @@ from .exceptions import (
 
 # Constants
 GAS_LIMIT = 150000
-GAS_PRICE = 5  # gwei
-POLL_INTERVAL = 15  # seconds
-MAX_POLL_ATTEMPTS = 120  # ~30 minutes total
 USDT_DECIMALS = 6
 
-# Load ABI
 ABI_PATH = Path(__file__).resolve().parent / "abi/usdt.json"
-with open(ABI_PATH) as f:
-    USDT_ABI = json.load(f)
 
-# Initialize Web3
-w3 = Web3(Web3.HTTPProvider(settings.WEB3_RPC_URL))
-USDT = w3.eth.contract(address=settings.USDT_ADDR, abi=USDT_ABI)
+# Chain objects are built on first use, not at import
+w3 = SimpleLazyObject(get_web3)
+USDT = SimpleLazyObject(lambda: w3.eth.contract(address=settings.USDT_ADDR, abi=load_abi(ABI_PATH)))
+nonces = SimpleLazyObject(lambda: NonceManager(w3))
+gas_oracle = SimpleLazyObject(lambda: GasOracle(w3))
 
 def generate_user_token(client_token: str) -> str:
     """Generate HMAC-SHA256 user token from client token"""
-    hmac_key = settings.XUSDT_SETTINGS['USER_TOKEN_HMAC_KEY'].encode()
-    return hmac.new(hmac_key, client_token.encode(), hashlib.sha256).hexdigest()
+    return derive_user_token(client_token)
 
-def _sign_and_send(tx: dict, private_key: str) -> Tuple[str, TxReceipt]:
-    """Sign and send a transaction, returning tx hash and receipt."""
+def _send_and_wait(address: str, nonce: int, signed_tx) -> Tuple[str, TxReceipt]:
+    """Broadcast a transaction signed with a `nonce_for` nonce, returning tx hash and receipt."""
     try:
-        signed_tx = w3.eth.account.sign_transaction(tx, private_key)
-        tx_hash = w3.eth.send_raw_transaction(signed_tx.rawTransaction).hex()
+        tx_hash = nonces.broadcast(address, nonce, signed_tx)
         
         # Wait for transaction receipt
         receipt = w3.eth.wait_for_transaction_receipt(tx_hash, timeout=120)
@@ -65,7 +64,10 @@ def create_escrow_wallet() -> EscrowWallet:
     """Create a new escrow wallet with a unique Ethereum address."""
     try:
         acct = w3.eth.account.create()
-        return EscrowWallet(address=acct.address)  # Return unsaved instance
+        wallet = EscrowWallet(address=acct.address)  # Return unsaved instance
+        if settings.ESCROW_WALLET_ENCRYPTION_KEY:
+            wallet.private_key_enc = EscrowWallet.encrypt_private_key(acct.key.hex())
+        return wallet
     except Exception as e:
         raise WalletError(f"Failed to create escrow wallet: {str(e)}")
 
@@ -83,19 +85,21 @@ def transfer_usdt(from_address: str, to_address: str, amount_wei: int, private_k
         Transaction hash
     """
     try:
-        # Build transaction
-        tx = USDT.functions.transfer(
-            w3.to_checksum_address(to_address),
-            amount_wei
-        ).build_transaction({
-            'from': w3.to_checksum_address(from_address),
-            'gas': GAS_LIMIT,
-            'gasPrice': w3.to_wei(GAS_PRICE, 'gwei'),
-            'nonce': w3.eth.get_transaction_count(from_address),
-        })
-
-        # Sign and send
-        tx_hash, _ = _sign_and_send(tx, private_key)
+        with nonces.nonce_for(from_address) as nonce:
+            # Build transaction
+            tx = USDT.functions.transfer(
+                w3.to_checksum_address(to_address),
+                amount_wei
+            ).build_transaction({
+                'from': w3.to_checksum_address(from_address),
+                'gas': GAS_LIMIT,
+                **gas_oracle.fee_fields(),
+                'nonce': nonce,
+            })
+            signed_tx = w3.eth.account.sign_transaction(tx, private_key)
+
+        # Send and wait outside the nonce block, so a broadcast nonce is never freed
+        tx_hash, _ = _send_and_wait(from_address, nonce, signed_tx)
         return tx_hash
         
     except Exception as e:
@@ -128,7 +132,7 @@ def fund_escrow(listing: P2PListing, merchant_wallet: str, private_key: str) ->
         )
         
         # Verify the transfer was successful
-        balance = USDT.functions.balanceOf(listing.escrow_wallet.address).call()
+        balance = read_balance(w3, listing.escrow_wallet.address)
         if balance < amount_wei:
             raise EscrowError("Escrow not funded after transfer")
             
@@ -144,37 +148,6 @@ def fund_escrow(listing: P2PListing, merchant_wallet: str, private_key: str) ->
         listing.escrow_wallet.save()
         raise EscrowError(f"Failed to fund escrow: {str(e)}")
 
-def wait_for_deposit(wallet: EscrowWallet, min_amount: Decimal) -> None:
-    """
-    Monitor an escrow wallet for incoming deposits.
-    
-    Args:
-        wallet: EscrowWallet instance to monitor
-        min_amount: Minimum amount (in USDT) required to consider the wallet funded
-        
-    Raises:
-        EscrowError: If monitoring fails
-        TimeoutError: If max polling attempts reached without funding
-    """
-    min_amount_wei = int(min_amount * (10 ** USDT_DECIMALS))
-    
-    for attempt in range(MAX_POLL_ATTEMPTS):
-        try:
-            balance = USDT.functions.balanceOf(wallet.address).call()
-            if balance >= min_amount_wei:
-                with transaction.atomic():
-                    wallet.amount = Decimal(balance) / Decimal(10 ** USDT_DECIMALS)
-                    wallet.status = "funded"
-                    wallet.save(update_fields=["amount", "status"])
-                return
-                
-            time.sleep(POLL_INTERVAL)
-            
-        except Exception as e:
-            raise EscrowError(f"Failed to check balance: {str(e)}")
-
-    raise TimeoutError("Funding not detected within timeout period")
-
 def release_to(buyer_addr: str, wallet: EscrowWallet, amount: Decimal, fee: Decimal) -> str:
     """
     Release funds from escrow to buyer's address.
@@ -192,7 +165,9 @@ def release_to(buyer_addr: str, wallet: EscrowWallet, amount: Decimal, fee: Deci
         InsufficientFundsError: If escrow has insufficient balance
         EscrowError: If transfer fails
     """
-    system_wallet = SystemWallet.objects.select_for_update().first()
+    # No row lock here: nonces come from the nonce manager and the fee is
+    # added with an F() update, so releases can run in parallel.
+    system_wallet = SystemWallet.objects.first()
     if not system_wallet:
         raise WalletError("No system wallet configured")
 
@@ -202,30 +177,35 @@ def release_to(buyer_addr: str, wallet: EscrowWallet, amount: Decimal, fee: Deci
     
     try:
         # Check balance first
-        balance = USDT.functions.balanceOf(wallet.address).call()
+        balance = read_balance(w3, wallet.address)
         if balance < amount_wei:
             raise InsufficientFundsError("Escrow has insufficient balance")
 
         # Prepare and send transaction
-        tx = USDT.functions.transfer(
-            w3.to_checksum_address(buyer_addr),
-            amount_wei
-        ).build_transaction({
-            'from': system_wallet.address,
-            'gas': GAS_LIMIT,
-            'gasPrice': w3.to_wei(GAS_PRICE, 'gwei'),
-            'nonce': w3.eth.get_transaction_count(system_wallet.address),
-        })
-
-        tx_hash, receipt = _sign_and_send(tx, system_wallet.private_key_dec())
+        private_key = system_wallet.private_key_dec()
+        with nonces.nonce_for(system_wallet.address) as nonce:
+            tx = USDT.functions.transfer(
+                w3.to_checksum_address(buyer_addr),
+                amount_wei
+            ).build_transaction({
+                'from': system_wallet.address,
+                'gas': GAS_LIMIT,
+                **gas_oracle.fee_fields(),
+                'nonce': nonce,
+            })
+            signed_tx = w3.eth.account.sign_transaction(tx, private_key)
+
+        # Outside the nonce block: a receipt timeout or a revert must not free a broadcast nonce
+        tx_hash, receipt = _send_and_wait(system_wallet.address, nonce, signed_tx)
         
         # Update records
         with transaction.atomic():
             wallet.status = "released"
             wallet.save(update_fields=["status"])
             
-            system_wallet.collected_fees += fee
-            system_wallet.save(update_fields=["collected_fees"])
+            SystemWallet.objects.filter(pk=system_wallet.pk).update(
+                collected_fees=F("collected_fees") + fee
+            )
             
         return tx_hash
         
@@ -1,6 +1,6 @@
 from django.core.exceptions import ValidationError
-from web3 import Web3
+from eth_utils import is_address
 
 def validate_eth_address(value):
-    if not Web3.is_address(value):
+    if not is_address(value):
         raise ValidationError("Invalid Ethereum address")
\ No newline at end of file
@@ -0,0 +1,100 @@
+"""
+Asyncio deposit watcher.
+
+Runs as its own process (`manage.py watch_deposits`) instead of inside a web
+worker. Once per new block it loads every escrow wallet still in `created`
+status, reads their USDT balances in batches and flips the ones that reached
+their expected amount to `funded`.
+"""
+import asyncio
+import logging
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from web3 import AsyncWeb3
+
+from apps.core.chain import get_async_web3
+
+from apps.p2p.models import P2PListing
+from apps.p2p.state_machine import escrow_machine, listing_machine
+from .balances import aread_balances
+from .models import EscrowAuditLog, EscrowWallet
+from .services import USDT_DECIMALS
+
+logger = logging.getLogger(__name__)
+
+
+class DepositWatcher:
+    def __init__(self, rpc_url=None, token_address=None, poll_interval=2.0, batch_size=None):
+        self.w3 = get_async_web3(urls=[rpc_url] if rpc_url else None)
+        self.token_address = AsyncWeb3.to_checksum_address(token_address or settings.USDT_ADDR)
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size or settings.XUSDT_SETTINGS["BALANCE_BATCH_SIZE"]
+        self.last_block = None
+
+    async def run(self, once=False):
+        logger.info("Deposit watcher started (batch size %d)", self.batch_size)
+        while True:
+            try:
+                block = await self.w3.eth.block_number
+                if block != self.last_block:
+                    funded = await self.scan(block)
+                    self.last_block = block
+                    if funded:
+                        logger.info("Block %s: %d escrow(s) funded", block, funded)
+            except Exception:
+                logger.exception("Deposit scan failed; retrying next poll")
+            if once:
+                return
+            await asyncio.sleep(self.poll_interval)
+
+    async def scan(self, block=None) -> int:
+        """Check every open escrow once; returns the number marked funded."""
+        wallets = [
+            wallet
+            async for wallet in EscrowWallet.objects.filter(
+                status=EscrowWallet.STATUS_CREATED
+            ).only("id", "address", "expected_amount")
+        ]
+        balances = await aread_balances(
+            self.w3,
+            [wallet.address for wallet in wallets],
+            token_address=self.token_address,
+            chunk_size=self.batch_size,
+        )
+        funded = 0
+        for wallet in wallets:
+            balance = balances[wallet.address]
+            if self._is_funded(wallet, balance) and await self._mark_funded(wallet, balance, block):
+                funded += 1
+        return funded
+
+    @staticmethod
+    def _is_funded(wallet, balance) -> bool:
+        if balance <= 0:
+            return False
+        expected = wallet.expected_amount or Decimal(0)
+        return balance >= int(expected * (10 ** USDT_DECIMALS))
+
+    async def _mark_funded(self, wallet, balance, block) -> bool:
+        amount = Decimal(balance) / Decimal(10 ** USDT_DECIMALS)
+        return await sync_to_async(self._fund)(wallet, amount, block)
+
+    @staticmethod
+    @transaction.atomic
+    def _fund(wallet, amount, block) -> bool:
+        if not escrow_machine.transition(wallet, 'fund', actor='deposit_watcher', amount=amount):
+            return False
+
+        # Listings backed by this escrow become tradeable
+        listing_machine.apply(
+            'fund', P2PListing.objects.filter(escrow_wallet_id=wallet.pk), actor='deposit_watcher'
+        )
+        EscrowAuditLog.objects.create(
+            escrow_id=wallet.pk,
+            action='FUND',
+            details={"amount": str(amount), "block": block, "source": "deposit_watcher"},
+        )
+        return True
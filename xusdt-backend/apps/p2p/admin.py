@@ -9,12 +9,18 @@ from django.contrib.admin import SimpleListFilter
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django import forms
-from .models import P2PListing, P2PTrade
+from .models import P2PListing, P2PTrade, StatusTransition
+from .state_machine import listing_machine, trade_machine
 from apps.escrow.models import EscrowWallet
 import uuid
 
 User = get_user_model()
 
+
+def _admin_actor(request):
+    return f"admin:{request.user.pk}"
+
+
 class ActiveListingsFilter(SimpleListFilter):
     title = 'Active Status'
     parameter_name = 'active_status'
@@ -258,24 +264,23 @@ class P2PListingAdmin(admin.ModelAdmin):
 
     # Bulk actions
     def mark_as_funded(self, request, queryset):
-        updated = queryset.filter(status=1).update(status=2)
-        self.message_user(request, f"{updated} listings marked as funded.")
+        updated = listing_machine.apply('fund', queryset, actor=_admin_actor(request))
+        self.message_user(request, f"{len(updated)} listings marked as funded.")
     mark_as_funded.short_description = "Mark selected as funded"
 
     def expire_listings(self, request, queryset):
-        updated = queryset.filter(status__in=[1,2,3], expires_at__gt=timezone.now()).update(status=5)
-        self.message_user(request, f"{updated} listings expired.")
+        updated = listing_machine.apply(
+            'expire', queryset.filter(expires_at__gt=timezone.now()), actor=_admin_actor(request)
+        )
+        self.message_user(request, f"{len(updated)} listings expired.")
     expire_listings.short_description = "Expire selected listings"
 
     def renew_listings(self, request, queryset):
-        renewed = 0
-        for listing in queryset:
-            if listing.status == 5:  # Only renew expired listings
-                listing.status = 1
-                listing.expires_at = timezone.now() + timedelta(days=7)
-                listing.save()
-                renewed += 1
-        self.message_user(request, f"{renewed} listings renewed.")
+        # Only expired listings are renewed
+        renewed = listing_machine.apply(
+            'renew', queryset, actor=_admin_actor(request), expires_at=timezone.now() + timedelta(days=7)
+        )
+        self.message_user(request, f"{len(renewed)} listings renewed.")
     renew_listings.short_description = "Renew expired listings"
 
     def clone_listings(self, request, queryset):
@@ -472,24 +477,42 @@ class P2PTradeAdmin(admin.ModelAdmin):
     transaction_actions.short_description = 'Actions'
 
     def mark_as_completed(self, request, queryset):
-        updated = queryset.filter(status__in=[1,2]).update(
-            status=3,
-            completed_at=timezone.now()
-        )
-        self.message_user(request, f"{updated} trades marked as completed.")
+        # Volume is recorded by the transition (apps.p2p.signals)
+        updated = trade_machine.apply('complete', queryset, actor=_admin_actor(request))
+        self.message_user(request, f"{len(updated)} trades marked as completed.")
     mark_as_completed.short_description = "Mark as completed"
 
     def mark_as_disputed(self, request, queryset):
-        updated = queryset.filter(status__in=[1,2]).update(status=4)
-        self.message_user(request, f"{updated} trades marked as disputed.")
+        updated = trade_machine.apply('dispute', queryset, actor=_admin_actor(request))
+        self.message_user(request, f"{len(updated)} trades marked as disputed.")
     mark_as_disputed.short_description = "Mark as disputed"
 
     def cancel_trades(self, request, queryset):
-        updated = queryset.filter(status__in=[0,1,2]).update(status=5)
-        self.message_user(request, f"{updated} trades canceled.")
+        updated = trade_machine.apply('cancel', queryset, actor=_admin_actor(request))
+        self.message_user(request, f"{len(updated)} trades canceled.")
     cancel_trades.short_description = "Cancel trades"
 
 
+
+@admin.register(StatusTransition)
+class StatusTransitionAdmin(admin.ModelAdmin):
+    """Read-only: the transition log is append-only."""
+    list_display = ('created_at', 'entity', 'object_id', 'transition', 'from_status', 'to_status', 'actor')
+    list_filter = ('entity', 'transition')
+    search_fields = ('=object_id', 'actor')
+    ordering = ('-created_at',)
+    list_per_page = 100
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
 # Admin customization
 admin.site.site_header = "P2P Trading Platform Administration"
 admin.site.site_title = "P2P Trading Admin Portal"
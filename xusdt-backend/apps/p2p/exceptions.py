@@ -8,4 +8,7 @@ class TransactionFailedError(Exception):
     pass
 
 class WalletError(Exception):
-    pass
\ No newline at end of file
+    pass
+
+class TradeUnavailableError(Exception):
+    pass
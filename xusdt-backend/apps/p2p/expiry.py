@@ -0,0 +1,157 @@
+"""
+Listing expiry reaper.
+
+`manage.py expire_listings` moves Active and Funded listings whose
+`expires_at` has passed to Expired (5). It works in batches: each batch
+locks up to LISTING_EXPIRY_BATCH_SIZE due rows (oldest expiry first, through
+idx_listing_expiry) with SKIP LOCKED, then expires them with one UPDATE.
+Because of this, the read paths can filter on `status=1` alone.
+
+The escrows behind expired listings are released as well:
+
+- An escrow still waiting for its deposit (`created`) becomes `expired`,
+  so the deposit watcher and the transfer indexer stop tracking it.
+- A funded escrow is queued for a refund to the seller's address, in the
+  batch transaction, so a listing is never expired without its refund.
+  Without a seller address it stays funded and is flagged in the audit log.
+
+Every escrow touched gets an EXPIRE audit record, and each batch sends
+`listings_expired`.
+
+Each run also re-queues refunds for escrows that are still funded behind an
+Expired listing: a refund transaction that failed puts its escrow back to
+`funded`. After TX_MAX_RETRIES failed refunds the escrow is left for review.
+"""
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.escrow.exceptions import EscrowError
+from apps.escrow.models import EscrowAuditLog, EscrowWallet, TransactionQueue
+from .models import P2PListing
+from .signals import listings_expired
+from .state_machine import escrow_machine, listing_machine
+
+logger = logging.getLogger(__name__)
+
+EXPIRABLE_STATUSES = (1, 2)  # Active, Funded
+EXPIRED = 5
+ACTOR = 'expiry_reaper'
+
+
+class ListingExpiryReaper:
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.XUSDT_SETTINGS['LISTING_EXPIRY_BATCH_SIZE']
+        self.max_refunds = settings.XUSDT_SETTINGS['TX_MAX_RETRIES']
+
+    def run_once(self) -> int:
+        """Expire every due listing and re-queue missing refunds; returns how many listings were expired."""
+        total = 0
+        while True:
+            expired = self.expire_batch()
+            total += expired
+            if expired < self.batch_size:
+                break
+        self.requeue_refunds()
+        return total
+
+    def expire_batch(self) -> int:
+        now = timezone.now()
+        with transaction.atomic():
+            rows = list(
+                P2PListing.objects.select_for_update(skip_locked=True)
+                .filter(status__in=EXPIRABLE_STATUSES, expires_at__lte=now)
+                .order_by('expires_at')
+                .values_list('id', 'status', 'escrow_wallet_id')[:self.batch_size]
+            )
+            if not rows:
+                return 0
+
+            listing_ids = listing_machine.apply(
+                'expire', [listing_id for listing_id, _, _ in rows], actor=ACTOR
+            )
+            for wallet, listing_id in self._release_escrows(rows):
+                self._refund(wallet, listing_id)
+
+        listings_expired.send(sender=P2PListing, listing_ids=listing_ids)
+        logger.info("Expired %d listings", len(rows))
+        return len(rows)
+
+    def _release_escrows(self, rows):
+        escrow_listing = {escrow_id: listing_id for listing_id, _, escrow_id in rows if escrow_id}
+        if not escrow_listing:
+            return []
+
+        wallets = EscrowWallet.objects.filter(pk__in=list(escrow_listing)).only(
+            'id', 'status', 'seller_address', 'amount'
+        )
+        awaiting_deposit = [w.pk for w in wallets if w.status == EscrowWallet.STATUS_CREATED]
+        escrow_machine.apply('expire', awaiting_deposit, actor=ACTOR)
+
+        logs, refunds = [], []
+        for wallet in wallets:
+            listing_id = escrow_listing[wallet.pk]
+            details = {'listing_id': str(listing_id), 'previous_status': wallet.status}
+            if wallet.status == EscrowWallet.STATUS_CREATED:
+                details['result'] = 'expired'
+            elif wallet.status == EscrowWallet.STATUS_FUNDED and wallet.seller_address:
+                details['result'] = 'refund_queued'
+                refunds.append((wallet, listing_id))
+            elif wallet.status == EscrowWallet.STATUS_FUNDED:
+                details['result'] = 'refund_needs_seller_address'
+            else:
+                details['result'] = 'unchanged'
+            logs.append(EscrowAuditLog(escrow=wallet, action='EXPIRE', details=details))
+        EscrowAuditLog.objects.bulk_create(logs)
+        return refunds
+
+    def requeue_refunds(self) -> int:
+        """Queue refunds for funded escrows behind Expired listings; returns how many were queued."""
+        failed_refunds = TransactionQueue.objects.filter(
+            escrow_id=OuterRef('pk'), tx_type='refund', status=TransactionQueue.FAILED
+        ).values('escrow_id').annotate(count=Count('id')).values('count')
+        wallets = list(
+            EscrowWallet.objects.filter(
+                status=EscrowWallet.STATUS_FUNDED,
+                p2plisting__status=EXPIRED,
+                seller_address__isnull=False,
+            )
+            .exclude(seller_address='')
+            .annotate(failed_refunds=Coalesce(Subquery(failed_refunds), 0))
+            .filter(failed_refunds__lt=self.max_refunds)
+            .only('id', 'status', 'seller_address', 'amount')
+            .annotate(listing_id=F('p2plisting__id'))[:self.batch_size]
+        )
+        queued = 0
+        for wallet in wallets:
+            with transaction.atomic():
+                if self._refund(wallet, wallet.listing_id):
+                    EscrowAuditLog.objects.create(
+                        escrow=wallet,
+                        action='EXPIRE',
+                        details={'listing_id': str(wallet.listing_id), 'result': 'refund_requeued'},
+                    )
+                    queued += 1
+        if queued:
+            logger.warning("Re-queued %d refunds for expired listings", queued)
+        return queued
+
+    def _refund(self, wallet, listing_id) -> bool:
+        from apps.escrow.services import enqueue_release
+
+        try:
+            enqueue_release(
+                wallet=wallet,
+                to_address=wallet.seller_address,
+                amount=wallet.amount,
+                fee=0,
+                tx_type='refund',
+            )
+        except EscrowError as e:
+            logger.error("Refund for escrow %s (listing %s) not queued: %s", wallet.pk, listing_id, e)
+            return False
+        return True
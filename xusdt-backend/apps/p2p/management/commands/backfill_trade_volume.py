@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.p2p.volume import prune_minute_buckets, rebuild_buckets, volume_summary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the trade volume buckets from completed P2P trades."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help="Only rebuild the last N days (default: all history)")
+        parser.add_argument('--prune', action='store_true', help="Only drop minute buckets past their retention")
+
+    def handle(self, *args, **options):
+        if options['prune']:
+            self.stdout.write(f"Pruned {prune_minute_buckets()} minute buckets")
+            return
+
+        since = timezone.now() - timedelta(days=options['days']) if options['days'] else None
+        written = rebuild_buckets(since)
+        self.stdout.write(f"Wrote {written['hour']} hour and {written['minute']} minute buckets")
+        for window, totals in volume_summary().items():
+            self.stdout.write(f"  {window:>3}: {totals['trades']} trades, {totals['volume']} USDT")
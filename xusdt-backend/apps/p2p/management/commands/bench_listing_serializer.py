@@ -0,0 +1,74 @@
+import time
+import uuid
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.core.models import derive_user_token
+from apps.p2p.models import P2PListing
+from apps.p2p.serializers import P2PListingSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark P2PListingSerializer over N in-memory listings and compare the "
+        "per-row ownership check against recomputing the HMAC user token per row."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+
+        client_token = uuid.uuid4().hex * 2
+        user = SimpleNamespace(client_token=client_token, user_token=derive_user_token(client_token))
+        request = SimpleNamespace(user=user)
+
+        now = timezone.now()
+        listings = [
+            P2PListing(
+                id=uuid.uuid4(),
+                seller_token=user.user_token if i % 10 == 0 else uuid.uuid4().hex * 2,
+                crypto_type='sell',
+                crypto_amount=Decimal('100.000000'),
+                usdt_amount=Decimal('100.00'),
+                payment_method=1,
+                created_at=now,
+                expires_at=now,
+            )
+            for i in range(rows)
+        ]
+
+        def serialize():
+            return P2PListingSerializer(listings, many=True, context={'request': request}).data
+
+        def legacy_owner_checks():
+            # What get_is_owner used to do for every serialized row
+            return [derive_user_token(user.client_token) == obj.seller_token for obj in listings]
+
+        serialize_s = self._best_of(serialize, repeat)
+        legacy_s = self._best_of(legacy_owner_checks, repeat)
+
+        self.stdout.write(f"rows: {rows}")
+        self.stdout.write(
+            f"serializer total: {serialize_s * 1000:.2f} ms "
+            f"({serialize_s / rows * 1e6:.2f} us/row, 0 HMACs)"
+        )
+        self.stdout.write(
+            f"per-row HMAC cost removed: {legacy_s * 1000:.2f} ms "
+            f"({legacy_s / rows * 1e6:.2f} us/row, {rows} HMACs)"
+        )
+
+    @staticmethod
+    def _best_of(fn, repeat):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best
@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.p2p.expiry import ListingExpiryReaper
+
+
+class Command(BaseCommand):
+    help = "Move listings past their expiry to Expired and release their escrows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=30.0, help="Seconds between runs")
+        parser.add_argument('--batch-size', type=int, help="Listings expired per UPDATE")
+        parser.add_argument('--once', action='store_true', help="Run once and exit")
+
+    def handle(self, *args, **options):
+        reaper = ListingExpiryReaper(batch_size=options['batch_size'])
+        try:
+            while True:
+                try:
+                    expired = reaper.run_once()
+                    if expired:
+                        self.stdout.write(f"{expired} listings expired")
+                except Exception as e:
+                    self.stderr.write(f"Expiry run failed: {e}")
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Listing expiry reaper stopped")
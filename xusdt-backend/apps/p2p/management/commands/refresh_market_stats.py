@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.auth_cache import is_shared_cache
+from apps.p2p.market_stats import refresh_market_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild the cached market stats snapshot on a schedule."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=10.0, help="Seconds between rebuilds")
+        parser.add_argument('--once', action='store_true', help="Rebuild once and exit")
+
+    def handle(self, *args, **options):
+        if not is_shared_cache():
+            raise CommandError(
+                f"CACHES['default'] ({settings.CACHES['default']['BACKEND']}) is local to this process, so "
+                "the web workers would never see the snapshot. Set CACHE_URL to a shared cache."
+            )
+        try:
+            while True:
+                try:
+                    snapshot = refresh_market_stats()
+                    self.stdout.write(
+                        f"{snapshot['stats']['total_active_listings']} active listings, etag {snapshot['etag']}"
+                    )
+                except Exception as e:
+                    self.stderr.write(f"Market stats refresh failed: {e}")
+                if options['once']:
+                    return
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Market stats refresher stopped")
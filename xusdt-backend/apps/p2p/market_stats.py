@@ -0,0 +1,116 @@
+"""
+Materialized market statistics.
+
+MarketStatsView serves a snapshot from the Django cache instead of
+aggregating on every request. A snapshot is rebuilt when it is older than
+MARKET_STATS_TTL, or sooner once a listing or trade change marks it dirty
+(apps.p2p.signals). The `refresh_market_stats` command can rebuild it on a
+schedule so requests never pay for it. Only one process rebuilds at a time;
+the others keep serving the previous snapshot.
+
+The snapshot, the dirty flag and the rebuild lock must be seen by every
+process: the queue worker and the expiry command change listings too. So
+they are only kept in a shared CACHES backend (redis, memcached, database).
+On a process-local one (the locmem default) each request computes the stats
+unless MARKET_STATS_ALLOW_LOCAL is set for a single-process server, and the
+`refresh_market_stats` command refuses to run.
+
+A rebuild takes five queries: count/avg/min/max in one aggregate, the
+payment method breakdown, and one bucket read for each of the 1h/24h/7d
+completed-trade volume windows (apps.p2p.volume).
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Max, Min
+from rest_framework.utils.encoders import JSONEncoder
+
+from apps.core.auth_cache import is_shared_cache
+from .models import P2PListing
+from .volume import volume_summary
+
+SNAPSHOT_KEY = "p2p:market_stats"
+DIRTY_KEY = "p2p:market_stats:dirty"
+LOCK_KEY = "p2p:market_stats:lock"
+LOCK_TIMEOUT = 30  # seconds
+
+
+def compute_market_stats() -> dict:
+    active_listings = P2PListing.objects.filter(status=1)
+    volume = volume_summary()
+
+    totals = active_listings.aggregate(
+        total=Count('id'),
+        avg_price=Avg('usdt_amount'),
+        min_price=Min('usdt_amount'),
+        max_price=Max('usdt_amount'),
+    )
+    return {
+        'total_active_listings': totals['total'],
+        'average_price': totals['avg_price'],
+        'min_price': totals['min_price'],
+        'max_price': totals['max_price'],
+        'payment_methods_distribution': list(
+            active_listings.values('payment_method')
+            .annotate(count=Count('payment_method'))
+            .order_by('-count')
+        ),
+        'volume_24h': volume['24h']['volume'],
+        'trade_volume': volume,
+    }
+
+
+def is_cached() -> bool:
+    """Snapshots are kept only in a cache every process shares (or when MARKET_STATS_ALLOW_LOCAL is set)."""
+    return is_shared_cache() or settings.XUSDT_SETTINGS['MARKET_STATS_ALLOW_LOCAL']
+
+
+def _snapshot() -> dict:
+    stats = compute_market_stats()
+    body = json.dumps(stats, cls=JSONEncoder, sort_keys=True)
+    return {
+        'stats': stats,
+        'etag': hashlib.sha256(body.encode()).hexdigest()[:32],
+        'generated_at': time.time(),
+    }
+
+
+def refresh_market_stats() -> dict:
+    """Rebuild the snapshot and store it in the cache."""
+    snapshot = _snapshot()
+    # Kept well past the TTL so a stale snapshot can be served during rebuilds
+    cache.set(SNAPSHOT_KEY, snapshot, timeout=settings.XUSDT_SETTINGS['MARKET_STATS_TTL'] * 10)
+    cache.delete(DIRTY_KEY)
+    return snapshot
+
+
+def get_market_stats() -> dict:
+    """Current snapshot: {'stats', 'etag', 'generated_at'}."""
+    if not is_cached():
+        return _snapshot()
+
+    cached = cache.get_many([SNAPSHOT_KEY, DIRTY_KEY])
+    snapshot = cached.get(SNAPSHOT_KEY)
+    if snapshot is not None:
+        age = time.time() - snapshot['generated_at']
+        if age < settings.XUSDT_SETTINGS['MARKET_STATS_TTL'] and not cached.get(DIRTY_KEY):
+            return snapshot
+
+    if not cache.add(LOCK_KEY, 1, timeout=LOCK_TIMEOUT):
+        # Another request is rebuilding; serve what we have
+        if snapshot is not None:
+            return snapshot
+        return refresh_market_stats()
+    try:
+        return refresh_market_stats()
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def invalidate_market_stats():
+    if not is_cached():
+        return
+    cache.set(DIRTY_KEY, True, timeout=settings.XUSDT_SETTINGS['MARKET_STATS_TTL'] * 10)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-17 00:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0008_escrow_sweep'),
+        ('p2p', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='p2plisting',
+            index=models.Index(fields=['status', '-created_at', '-id', 'expires_at'], name='idx_listing_orderbook'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-17 00:23
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+
+def populate_prices(apps, schema_editor):
+    P2PListing = apps.get_model('p2p', 'P2PListing')
+    quantum = Decimal('0.000001')
+
+    listings = list(P2PListing.objects.exclude(crypto_amount=0).only('id', 'usdt_amount', 'crypto_amount'))
+    for listing in listings:
+        listing.price = (listing.usdt_amount / listing.crypto_amount).quantize(quantum)
+    P2PListing.objects.bulk_update(listings, ['price'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0008_escrow_sweep'),
+        ('p2p', '0002_listing_orderbook_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='p2plisting',
+            name='price',
+            field=models.DecimalField(blank=True, decimal_places=6, editable=False, help_text='Fiat per USDT (usdt_amount / crypto_amount), set on save', max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='p2plisting',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='p2plisting',
+            index=models.Index(fields=['crypto_type', 'fiat_currency', 'payment_method', 'price'], name='idx_listing_price'),
+        ),
+        migrations.AddIndex(
+            model_name='p2plisting',
+            index=models.Index(fields=['updated_at'], name='idx_listing_updated'),
+        ),
+        migrations.RunPython(populate_prices, migrations.RunPython.noop),
+    ]
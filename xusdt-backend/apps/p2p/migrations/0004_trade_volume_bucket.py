@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-17 00:26
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p2p', '0003_listing_price'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TradeVolumeBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('minute', 'Minute'), ('hour', 'Hour')], max_length=6)),
+                ('bucket_start', models.DateTimeField()),
+                ('fiat_currency', models.CharField(max_length=10)),
+                ('payment_method', models.SmallIntegerField(choices=[(1, 'Cash'), (2, 'Hawala'), (3, 'Other')])),
+                ('trade_count', models.PositiveIntegerField(default=0)),
+                ('volume', models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=24)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('granularity', 'bucket_start', 'fiat_currency', 'payment_method'), name='uniq_trade_volume_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.1 on 2026-10-17 00:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('escrow', '0009_escrow_expired_status'),
+        ('p2p', '0004_trade_volume_bucket'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='p2plisting',
+            name='idx_listing_orderbook',
+        ),
+        migrations.AddIndex(
+            model_name='p2plisting',
+            index=models.Index(condition=models.Q(('status', 1)), fields=['-created_at', '-id'], name='idx_listing_active'),
+        ),
+    ]
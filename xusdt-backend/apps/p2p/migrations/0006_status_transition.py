@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-17 00:34
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p2p', '0005_listing_active_partial_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatusTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entity', models.CharField(choices=[('trade', 'Trade'), ('listing', 'Listing'), ('escrow', 'Escrow wallet')], max_length=10)),
+                ('object_id', models.UUIDField()),
+                ('transition', models.CharField(max_length=32)),
+                ('from_status', models.CharField(max_length=16)),
+                ('to_status', models.CharField(max_length=16)),
+                ('actor', models.CharField(blank=True, help_text='User token or worker name', max_length=64)),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['entity', 'object_id', 'created_at'], name='idx_transition_timeline')],
+            },
+        ),
+    ]
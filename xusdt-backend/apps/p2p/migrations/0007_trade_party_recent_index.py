@@ -0,0 +1,29 @@
+# Generated by Django 5.2.1 on 2026-10-17 00:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('p2p', '0006_status_transition'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='p2ptrade',
+            name='idx_trade_buyer',
+        ),
+        migrations.RemoveIndex(
+            model_name='p2ptrade',
+            name='idx_trade_seller',
+        ),
+        migrations.AddIndex(
+            model_name='p2ptrade',
+            index=models.Index(fields=['buyer_token', '-created_at', '-id'], name='idx_trade_buyer_recent'),
+        ),
+        migrations.AddIndex(
+            model_name='p2ptrade',
+            index=models.Index(fields=['seller_token', '-created_at', '-id'], name='idx_trade_seller_recent'),
+        ),
+    ]
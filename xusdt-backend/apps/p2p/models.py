@@ -5,6 +5,8 @@ from django.core.validators import MinValueValidator
 from django.conf import settings
 from decimal import Decimal
 
+PRICE_QUANTUM = Decimal('0.000001')
+
 
 class P2PListing(models.Model):
     PAYMENT_METHODS = (
@@ -48,8 +50,15 @@ class P2PListing(models.Model):
 
     instructions_enc = models.TextField(null=True, blank=True, help_text="Encrypted with session key")
 
+    price = models.DecimalField(
+        max_digits=20, decimal_places=6, null=True, blank=True, editable=False,
+        help_text="Fiat per USDT (usdt_amount / crypto_amount), set on save",
+    )
+
     status = models.SmallIntegerField(choices=STATUS_CHOICES, default=1)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bulk .update() calls must set this too; the order book syncs from it
+    updated_at = models.DateTimeField(auto_now=True)
     expires_at = models.DateTimeField()
 
     class Meta:
@@ -58,6 +67,10 @@ class P2PListing(models.Model):
             models.Index(fields=['status'], name='idx_listing_status'),
             models.Index(fields=['payment_method'], name='idx_listing_payment_type'),
             models.Index(fields=['expires_at'], name='idx_listing_expiry'),
+            # Listing feed: only active rows, in keyset order; expired ones are reaped to status 5
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(status=1), name='idx_listing_active'),
+            models.Index(fields=['crypto_type', 'fiat_currency', 'payment_method', 'price'], name='idx_listing_price'),
+            models.Index(fields=['updated_at'], name='idx_listing_updated'),
         ]
         ordering = ['-created_at']
 
@@ -69,8 +82,15 @@ class P2PListing(models.Model):
             self.expires_at = timezone.now() + timezone.timedelta(
                 days=settings.XUSDT_SETTINGS['LISTING_EXPIRY_DAYS']
             )
+        self.price = self.compute_price(self.usdt_amount, self.crypto_amount)
         super().save(*args, **kwargs)
 
+    @staticmethod
+    def compute_price(usdt_amount, crypto_amount):
+        if not crypto_amount or usdt_amount is None:
+            return None
+        return (Decimal(usdt_amount) / Decimal(crypto_amount)).quantize(PRICE_QUANTUM)
+
 class P2PTrade(models.Model):
     STATUS_CHOICES = (
         (0, 'Created'),
@@ -119,8 +139,9 @@ class P2PTrade(models.Model):
     class Meta:
         indexes = [
             models.Index(fields=['listing'], name='idx_trade_listing'),
-            models.Index(fields=['buyer_token'], name='idx_trade_buyer'),
-            models.Index(fields=['seller_token'], name='idx_trade_seller'),
+            # Keyset pages of a user's trades (MyTradesListView), one range per side
+            models.Index(fields=['buyer_token', '-created_at', '-id'], name='idx_trade_buyer_recent'),
+            models.Index(fields=['seller_token', '-created_at', '-id'], name='idx_trade_seller_recent'),
             models.Index(fields=['status'], name='idx_trade_status'),
         ]
         ordering = ['-created_at']
@@ -142,4 +163,60 @@ class P2PTrade(models.Model):
             import logging
             logger = logging.getLogger(__name__)
             logger.error(f"Error calculating fee: {str(e)}")
-            return Decimal('0')
\ No newline at end of file
+            return Decimal('0')
+
+class TradeVolumeBucket(models.Model):
+    """Completed-trade volume per time bucket, fiat currency and payment method."""
+    MINUTE = 'minute'
+    HOUR = 'hour'
+    GRANULARITIES = (
+        (MINUTE, 'Minute'),
+        (HOUR, 'Hour'),
+    )
+
+    granularity = models.CharField(max_length=6, choices=GRANULARITIES)
+    bucket_start = models.DateTimeField()
+    fiat_currency = models.CharField(max_length=10)
+    payment_method = models.SmallIntegerField(choices=P2PListing.PAYMENT_METHODS)
+    trade_count = models.PositiveIntegerField(default=0)
+    volume = models.DecimalField(max_digits=24, decimal_places=2, default=Decimal('0'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket_start', 'fiat_currency', 'payment_method'],
+                name='uniq_trade_volume_bucket',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket_start:%Y-%m-%d %H:%M} {self.fiat_currency}: {self.volume}"
+
+
+class StatusTransition(models.Model):
+    """Append-only log of the status changes made through apps.p2p.state_machine."""
+    ENTITY_TRADE = 'trade'
+    ENTITY_LISTING = 'listing'
+    ENTITY_ESCROW = 'escrow'
+    ENTITIES = (
+        (ENTITY_TRADE, 'Trade'),
+        (ENTITY_LISTING, 'Listing'),
+        (ENTITY_ESCROW, 'Escrow wallet'),
+    )
+
+    entity = models.CharField(max_length=10, choices=ENTITIES)
+    object_id = models.UUIDField()
+    transition = models.CharField(max_length=32)
+    from_status = models.CharField(max_length=16)
+    to_status = models.CharField(max_length=16)
+    actor = models.CharField(max_length=64, blank=True, help_text="User token or worker name")
+    reason = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['entity', 'object_id', 'created_at'], name='idx_transition_timeline'),
+        ]
+
+    def __str__(self):
+        return f"{self.entity} {self.object_id}: {self.from_status} -> {self.to_status}"
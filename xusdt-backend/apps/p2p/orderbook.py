@@ -0,0 +1,236 @@
+"""
+In-memory P2P order book.
+
+Each process keeps the open listings (Active or Funded, not expired) grouped
+into price levels per (fiat_currency, payment_method, side). `buy` listings
+are bids and `sell` listings are asks. The book is loaded once and then
+updated incrementally:
+
+- Listings saved in this process are applied from post_save/post_delete
+  (apps.p2p.signals) once the transaction commits.
+- Changes made by other processes are picked up by polling the rows whose
+  `updated_at` moved past the last sync, at most every
+  ORDERBOOK_SYNC_INTERVAL seconds. Bulk `.update()` calls on listings must
+  set `updated_at` for this to see them.
+- Expired listings come off a heap ordered by `expires_at`, without a query.
+
+Hard deletes made by another process are only noticed by the full reload
+every ORDERBOOK_REBUILD_INTERVAL seconds.
+"""
+import bisect
+import heapq
+import logging
+import threading
+import time
+from datetime import timedelta
+from itertools import groupby
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import P2PListing
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = (1, 2)  # Active, Funded
+SIDES = {'buy': 'bids', 'sell': 'asks'}
+SYNC_OVERLAP = timedelta(seconds=5)  # clock skew and commit lag between app servers
+ROW_FIELDS = (
+    'id', 'status', 'crypto_type', 'fiat_currency', 'payment_method',
+    'price', 'usdt_amount', 'crypto_amount', 'expires_at',
+)
+
+
+class _PriceLevels:
+    """Aggregated amount and listing count per price, prices kept sorted."""
+
+    def __init__(self):
+        self.levels = {}  # price -> [amount, count]
+        self.prices = []
+
+    def add(self, price, amount):
+        level = self.levels.get(price)
+        if level is None:
+            self.levels[price] = [amount, 1]
+            bisect.insort(self.prices, price)
+        else:
+            level[0] += amount
+            level[1] += 1
+
+    def remove(self, price, amount):
+        level = self.levels[price]
+        level[0] -= amount
+        level[1] -= 1
+        if level[1] == 0:
+            del self.levels[price]
+            del self.prices[bisect.bisect_left(self.prices, price)]
+
+    def iter_levels(self, descending=False):
+        for price in (reversed(self.prices) if descending else self.prices):
+            amount, count = self.levels[price]
+            yield price, amount, count
+
+
+class OrderBook:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._reset()
+        self._loaded_at = None
+        self._polled_at = 0.0
+
+    def _reset(self):
+        self._entries = {}  # listing id -> (book key, price, amount, expires_at)
+        self._books = {}  # (fiat_currency, payment_method, side) -> _PriceLevels
+        self._expiry = []  # heap of (expires_at, listing id)
+        self._synced_through = None
+
+    # ------------------------------------------------------------------ #
+    # Loading and syncing                                                #
+    # ------------------------------------------------------------------ #
+
+    def load(self):
+        """Rebuild the book from the database (startup and periodic reconcile)."""
+        now = timezone.now()
+        rows = list(
+            P2PListing.objects.filter(status__in=OPEN_STATUSES, expires_at__gt=now).values_list(*ROW_FIELDS)
+        )
+        with self._lock:
+            self._reset()
+            for row in rows:
+                self._apply_row(row, now)
+            self._synced_through = now
+            self._loaded_at = time.monotonic()
+            self._polled_at = self._loaded_at
+        logger.info("Order book loaded with %d listings", len(rows))
+
+    def sync(self, force=False):
+        """Bring the book up to date; cheap when called on every read."""
+        opts = settings.XUSDT_SETTINGS
+        monotonic = time.monotonic()
+        if self._loaded_at is None or monotonic - self._loaded_at > opts['ORDERBOOK_REBUILD_INTERVAL']:
+            self.load()
+            return
+
+        now = timezone.now()
+        if force or monotonic - self._polled_at >= opts['ORDERBOOK_SYNC_INTERVAL']:
+            since = self._synced_through - SYNC_OVERLAP
+            rows = list(P2PListing.objects.filter(updated_at__gte=since).values_list(*ROW_FIELDS))
+            with self._lock:
+                for row in rows:
+                    self._apply_row(row, now)
+                self._synced_through = now
+                self._polled_at = monotonic
+
+        with self._lock:
+            self._expire(now)
+
+    def apply(self, listing):
+        """Apply one saved listing; ignored until the book has been loaded."""
+        if self._loaded_at is None:
+            return
+        row = tuple(getattr(listing, field) for field in ROW_FIELDS)
+        with self._lock:
+            self._apply_row(row, timezone.now())
+
+    def discard(self, listing_id):
+        with self._lock:
+            self._remove(listing_id)
+
+    # ------------------------------------------------------------------ #
+    # Book maintenance (callers hold the lock)                           #
+    # ------------------------------------------------------------------ #
+
+    def _apply_row(self, row, now):
+        listing_id, status, crypto_type, fiat, payment_method, price, usdt_amount, crypto_amount, expires_at = row
+        previous = self._remove(listing_id)
+        if status not in OPEN_STATUSES or expires_at <= now or crypto_type not in SIDES:
+            return
+        if price is None:
+            # Rows written by bulk_create skip save() and have no stored price
+            price = P2PListing.compute_price(usdt_amount, crypto_amount)
+            if price is None:
+                return
+
+        key = (fiat.upper(), payment_method, SIDES[crypto_type])
+        self._books.setdefault(key, _PriceLevels()).add(price, crypto_amount)
+        self._entries[listing_id] = (key, price, crypto_amount, expires_at)
+        if previous is None or previous[3] != expires_at:
+            heapq.heappush(self._expiry, (expires_at, listing_id))
+
+    def _remove(self, listing_id):
+        entry = self._entries.pop(listing_id, None)
+        if entry is None:
+            return None
+        key, price, amount, _ = entry
+        levels = self._books[key]
+        levels.remove(price, amount)
+        if not levels.prices:
+            del self._books[key]
+        return entry
+
+    def _expire(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            expires_at, listing_id = heapq.heappop(self._expiry)
+            entry = self._entries.get(listing_id)
+            # Heap entries are not removed on update; skip stale ones
+            if entry is not None and entry[3] == expires_at:
+                self._remove(listing_id)
+
+    # ------------------------------------------------------------------ #
+    # Reads                                                              #
+    # ------------------------------------------------------------------ #
+
+    def _levels(self, fiat, payment_method, side, depth):
+        if payment_method is not None:
+            methods = [payment_method]
+        else:
+            methods = [value for value, _ in P2PListing.PAYMENT_METHODS]
+        descending = side == 'bids'
+        streams = [
+            self._books[key].iter_levels(descending)
+            for key in ((fiat, method, side) for method in methods)
+            if key in self._books
+        ]
+        # Merge the per-method books, adding up levels at the same price
+        merged = heapq.merge(*streams, key=lambda level: level[0], reverse=descending)
+        levels = []
+        for price, group in groupby(merged, key=lambda level: level[0]):
+            group = list(group)
+            levels.append((price, sum(level[1] for level in group), sum(level[2] for level in group)))
+            if len(levels) >= depth:
+                break
+        return levels
+
+    def snapshot(self, fiat_currency, payment_method=None, depth=None) -> dict:
+        """Best bid/ask and aggregated depth for one fiat currency."""
+        self.sync()
+        depth = depth or settings.XUSDT_SETTINGS['ORDERBOOK_DEPTH']
+        fiat = fiat_currency.upper()
+        with self._lock:
+            bids = self._levels(fiat, payment_method, 'bids', depth)
+            asks = self._levels(fiat, payment_method, 'asks', depth)
+            synced_through = self._synced_through
+
+        best_bid = bids[0][0] if bids else None
+        best_ask = asks[0][0] if asks else None
+        spread = best_ask - best_bid if bids and asks else None
+
+        def render(levels):
+            return [
+                {'price': str(price), 'amount': str(amount), 'listings': count}
+                for price, amount, count in levels
+            ]
+
+        return {
+            'fiat_currency': fiat,
+            'payment_method': payment_method,
+            'best_bid': str(best_bid) if best_bid is not None else None,
+            'best_ask': str(best_ask) if best_ask is not None else None,
+            'spread': str(spread) if spread is not None else None,
+            'bids': render(bids),
+            'asks': render(asks),
+            'synced_through': synced_through,
+        }
+
+
+order_book = OrderBook()
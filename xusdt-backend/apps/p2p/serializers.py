@@ -1,8 +1,6 @@
 from rest_framework import serializers
 from django.conf import settings
-from .models import P2PListing, P2PTrade
-import hmac
-import hashlib
+from .models import P2PListing, P2PTrade, StatusTransition
 
 
 class P2PListingSerializer(serializers.ModelSerializer):
@@ -49,17 +47,14 @@ class P2PListingSerializer(serializers.ModelSerializer):
     def get_is_owner(self, obj):
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
-            client_token = request.user.client_token
-            hmac_key = settings.XUSDT_SETTINGS["USER_TOKEN_HMAC_KEY"].encode()
-            user_token = hmac.new(hmac_key, client_token.encode(), hashlib.sha256).hexdigest()
-            return user_token == obj.seller_token
+            return getattr(request.user, 'user_token', None) == obj.seller_token
         return False
 
 
 class P2PTradeCreateSerializer(serializers.ModelSerializer):
     listing = serializers.PrimaryKeyRelatedField(
-        queryset=P2PListing.objects.filter(status=1),
-        help_text="UUID of the listing being traded"
+        queryset=P2PListing.objects.only('id'),
+        help_text="UUID of the listing being traded (availability is checked under lock)"
     )
 
     class Meta:
@@ -94,12 +89,16 @@ class P2PTradeSerializer(serializers.ModelSerializer):
     def get_role(self, obj):
         request = self.context.get('request')
         if request and hasattr(request, 'user'):
-            client_token = request.user.client_token
-            hmac_key = settings.XUSDT_SETTINGS["USER_TOKEN_HMAC_KEY"].encode()
-            user_token = hmac.new(hmac_key, client_token.encode(), hashlib.sha256).hexdigest()
-            
+            user_token = getattr(request.user, 'user_token', None)
             if user_token == obj.buyer_token:
                 return 'buyer'
             elif user_token == obj.seller_token:
                 return 'seller'
-        return 'unknown'
\ No newline at end of file
+        return 'unknown'
+
+
+class StatusTransitionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StatusTransition
+        fields = ['entity', 'object_id', 'transition', 'from_status', 'to_status', 'created_at']
+        read_only_fields = fields
@@ -0,0 +1,50 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .market_stats import invalidate_market_stats
+from .models import P2PListing, P2PTrade
+from .orderbook import order_book
+from .volume import record_completed_trades
+
+# Sent by the expiry reaper after each batch, with listing_ids
+listings_expired = Signal()
+
+# Sent by apps.p2p.state_machine after each transition, with transition, pks and target
+status_changed = Signal()
+
+
+@receiver(post_save, sender=P2PListing)
+def update_order_book(sender, instance, **kwargs):
+    transaction.on_commit(lambda: order_book.apply(instance))
+
+
+@receiver(post_delete, sender=P2PListing)
+def remove_from_order_book(sender, instance, **kwargs):
+    listing_id = instance.pk
+    transaction.on_commit(lambda: order_book.discard(listing_id))
+
+
+@receiver(post_save, sender=P2PListing)
+@receiver(post_delete, sender=P2PListing)
+@receiver(post_save, sender=P2PTrade)
+@receiver(post_delete, sender=P2PTrade)
+def mark_market_stats_dirty(sender, **kwargs):
+    transaction.on_commit(invalidate_market_stats)
+
+
+@receiver(listings_expired)
+def expired_listings_changed_stats(sender, listing_ids, **kwargs):
+    invalidate_market_stats()
+
+
+@receiver(status_changed, sender=P2PListing)
+@receiver(status_changed, sender=P2PTrade)
+def transition_changed_stats(sender, **kwargs):
+    transaction.on_commit(invalidate_market_stats)
+
+
+@receiver(status_changed, sender=P2PTrade)
+def record_trade_volume(sender, pks, target, **kwargs):
+    if target == 3:  # Completed
+        record_completed_trades(pks)
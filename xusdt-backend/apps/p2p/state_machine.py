@@ -0,0 +1,168 @@
+"""
+Status state machines for trades, listings and escrow wallets.
+
+Every status change goes through a named transition that lists the statuses
+it may start from. A transition is one conditional UPDATE:
+
+    UPDATE ... SET status = :target, <touched fields>
+    WHERE id = :id AND status IN (:sources)
+
+so a row another request has already moved on is never overwritten, and
+only the status, the timestamp fields and any extra fields passed in are
+written. `transition(obj, ...)` changes one loaded object and returns False
+when its row was not in a source status. `apply(name, targets, ...)` changes
+a queryset or a list of ids in one statement, for admin actions and
+background jobs. It locks the candidate rows first so the log records the
+status each row actually left.
+
+Each change appends a StatusTransition row (entity, object id, from, to,
+actor). Per-object timelines read them through idx_transition_timeline.
+`status_changed` is sent after every transition.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from apps.escrow.models import EscrowWallet
+from .models import P2PListing, P2PTrade, StatusTransition
+from .signals import status_changed
+
+# `stamp` names a datetime field set to the transition time
+Transition = namedtuple('Transition', 'sources target stamp', defaults=(None,))
+
+
+class StateMachine:
+    def __init__(self, model, entity, transitions, touch):
+        self.model = model
+        self.entity = entity
+        self.transitions = transitions
+        self.touch = touch  # auto_now field, refreshed on every transition
+
+    def _get(self, name) -> Transition:
+        try:
+            return self.transitions[name]
+        except KeyError:
+            raise ValueError(f"Unknown {self.entity} transition: {name}")
+
+    def can(self, name, status) -> bool:
+        return status in self._get(name).sources
+
+    def _values(self, transition, now, fields):
+        values = {'status': transition.target, self.touch: now, **fields}
+        if transition.stamp:
+            values[transition.stamp] = now
+        return values
+
+    def _log(self, name, changes, target, actor, reason, now):
+        StatusTransition.objects.bulk_create([
+            StatusTransition(
+                entity=self.entity,
+                object_id=pk,
+                transition=name,
+                from_status=str(from_status),
+                to_status=str(target),
+                actor=actor,
+                reason=reason,
+                created_at=now,
+            )
+            for pk, from_status in changes
+        ])
+        pks = [pk for pk, _ in changes]
+        status_changed.send(sender=self.model, transition=name, pks=pks, target=target)
+
+    @transaction.atomic
+    def transition(self, obj, name, actor='', reason='', condition=None, **fields) -> bool:
+        """
+        Move one object through `name`. With a single source status the
+        UPDATE matches on that status; otherwise on the status `obj` was
+        loaded with, which must be one of the sources.
+        """
+        transition = self._get(name)
+        if len(transition.sources) == 1:
+            from_status = transition.sources[0]
+        elif obj.status in transition.sources:
+            from_status = obj.status
+        else:
+            return False
+
+        now = timezone.now()
+        values = self._values(transition, now, fields)
+        rows = self.model.objects.filter(pk=obj.pk, status=from_status)
+        if condition is not None:
+            rows = rows.filter(condition)
+        if not rows.update(**values):
+            return False
+
+        for field, value in values.items():
+            setattr(obj, field, value)
+        self._log(name, [(obj.pk, from_status)], transition.target, actor, reason, now)
+        return True
+
+    @transaction.atomic
+    def apply(self, name, targets, actor='', reason='', condition=None, **fields) -> list:
+        """
+        Move every row of `targets` (a queryset or ids) that is in a source
+        status; returns the ids that moved.
+        """
+        transition = self._get(name)
+        if isinstance(targets, QuerySet):
+            # Subquery, so annotated admin querysets can still be locked
+            rows = self.model.objects.filter(pk__in=targets.values('pk'))
+        else:
+            rows = self.model.objects.filter(pk__in=list(targets))
+        rows = rows.filter(status__in=transition.sources)
+        if condition is not None:
+            rows = rows.filter(condition)
+
+        changes = list(rows.select_for_update(of=('self',)).values_list('pk', 'status'))
+        if not changes:
+            return []
+
+        now = timezone.now()
+        self.model.objects.filter(
+            pk__in=[pk for pk, _ in changes], status__in=transition.sources
+        ).update(**self._values(transition, now, fields))
+        self._log(name, changes, transition.target, actor, reason, now)
+        return [pk for pk, _ in changes]
+
+
+trade_machine = StateMachine(P2PTrade, StatusTransition.ENTITY_TRADE, {
+    'mark_paid': Transition((1,), 2),
+    'complete': Transition((1, 2), 3, stamp='completed_at'),
+    'dispute': Transition((1, 2), 4),
+    'cancel': Transition((0, 1, 2), 5),
+}, touch='updated_at')
+
+listing_machine = StateMachine(P2PListing, StatusTransition.ENTITY_LISTING, {
+    'fund': Transition((1,), 2),
+    'reserve': Transition((2,), 3),
+    'complete': Transition((3,), 4),
+    'expire': Transition((1, 2, 3), 5),
+    'renew': Transition((5,), 1),
+}, touch='updated_at')
+
+escrow_machine = StateMachine(EscrowWallet, StatusTransition.ENTITY_ESCROW, {
+    'fund': Transition((EscrowWallet.STATUS_CREATED,), EscrowWallet.STATUS_FUNDED),
+    'start_release': Transition((EscrowWallet.STATUS_FUNDED,), EscrowWallet.STATUS_RELEASING),
+    'release': Transition(
+        (EscrowWallet.STATUS_FUNDED, EscrowWallet.STATUS_RELEASING), EscrowWallet.STATUS_RELEASED
+    ),
+    'release_failed': Transition((EscrowWallet.STATUS_RELEASING,), EscrowWallet.STATUS_FUNDED),
+    'dispute': Transition(
+        (EscrowWallet.STATUS_CREATED, EscrowWallet.STATUS_FUNDED), EscrowWallet.STATUS_DISPUTED
+    ),
+    'expire': Transition((EscrowWallet.STATUS_CREATED,), EscrowWallet.STATUS_EXPIRED),
+}, touch='last_used')
+
+
+def timeline(trade):
+    """Transitions of a trade, its listing and the listing's escrow, oldest first."""
+    objects = Q(entity=StatusTransition.ENTITY_TRADE, object_id=trade.pk) | Q(
+        entity=StatusTransition.ENTITY_LISTING, object_id=trade.listing_id
+    )
+    escrow_id = trade.listing.escrow_wallet_id
+    if escrow_id:
+        objects |= Q(entity=StatusTransition.ENTITY_ESCROW, object_id=escrow_id)
+    return StatusTransition.objects.filter(objects).order_by('created_at', 'id')
@@ -1,3 +1,316 @@
-from django.test import TestCase
+import secrets
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from eth_account import Account
+from rest_framework.test import APIClient
+
+from apps.escrow.models import EscrowAuditLog, EscrowWallet, TransactionQueue
+from apps.escrow.tests import SimChainMixin
+from apps.escrow.tx_queue import TxQueueWorker
+from .exceptions import TradeUnavailableError
+from .expiry import ListingExpiryReaper
+from .market_stats import get_market_stats
+from .models import P2PListing, P2PTrade
+from .trades import create_trade
+
+TOKEN = "trade-tests-user"
+PEER = "trade-tests-peer"
+
+
+class MyTradesQueryTests(TestCase):
+    """The my-trades list costs the same queries at any page size and pages every trade once."""
+
+    TRADES = 120
+
+    @classmethod
+    def setUpTestData(cls):
+        expires_at = timezone.now() + timedelta(days=1)
+        listings = P2PListing.objects.bulk_create([
+            P2PListing(
+                seller_token=TOKEN if i % 2 else PEER,
+                crypto_type='sell',
+                fiat_currency='USD',
+                payment_method=1,
+                usdt_amount=Decimal('10'),
+                crypto_amount=Decimal('10'),
+                status=3,
+                expires_at=expires_at,
+            )
+            for i in range(cls.TRADES)
+        ])
+        trades = P2PTrade.objects.bulk_create([
+            P2PTrade(
+                listing=listing,
+                buyer_token=PEER if i % 2 else TOKEN,
+                seller_token=listing.seller_token,
+                escrow_tx_hash='0x' + secrets.token_hex(32),
+                usdt_amount=listing.usdt_amount,
+                status=1,
+            )
+            for i, listing in enumerate(listings)
+        ])
+        cls.expected = {str(trade.pk) for trade in trades}
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=SimpleNamespace(is_authenticated=True, user_token=TOKEN))
+        self.url = reverse('p2p-my-trades')
+
+    def get(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content[:200])
+        return response.json()
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        for size in (5, 50, self.TRADES - 1):
+            with self.subTest(page_size=size):
+                with self.assertNumQueries(2):
+                    first = self.get(page_size=size)
+                self.assertEqual(len(first['results']), size)
+                with self.assertNumQueries(2):
+                    self.get(page_size=size, cursor=first['cursor'])
+
+    def test_last_page_has_no_cursor(self):
+        body = self.get(page_size=self.TRADES + 80)
+        self.assertEqual(len(body['results']), self.TRADES)
+        self.assertIsNone(body['cursor'])
+
+    def test_pages_return_every_trade_once(self):
+        seen = []
+        params = {'page_size': 7}
+        while True:
+            body = self.get(**params)
+            seen.extend(row['id'] for row in body['results'])
+            if not body['cursor']:
+                break
+            params['cursor'] = body['cursor']
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(set(seen), self.expected)
+
+
+class CreateTradeRaceTests(TransactionTestCase):
+    """Concurrent buyers of one funded listing end up with exactly one trade."""
+
+    BUYERS = 10
+    ROUNDS = 3
+    ATTEMPTS = 5
+
+    def funded_listing(self):
+        seller = f"race-seller-{secrets.token_hex(4)}"
+        wallet = EscrowWallet.objects.create(
+            address='0x' + secrets.token_hex(20),
+            user_token=seller,
+            balance_commitment='0' * 64,
+            amount=Decimal('100'),
+            status=EscrowWallet.STATUS_FUNDED,
+        )
+        return P2PListing.objects.create(
+            seller_token=seller,
+            crypto_type='sell',
+            fiat_currency='USD',
+            payment_method=1,
+            usdt_amount=Decimal('100'),
+            crypto_amount=Decimal('100'),
+            escrow_wallet=wallet,
+            status=2,
+            expires_at=timezone.now() + timedelta(hours=1),
+        )
+
+    def race(self, listing):
+        outcomes = Counter()
+        lock = threading.Lock()
+        barrier = threading.Barrier(self.BUYERS)
+
+        def buy(n):
+            result = 'won'
+            try:
+                barrier.wait()
+                for attempt in range(self.ATTEMPTS):
+                    try:
+                        create_trade(listing.pk, f"race-buyer-{n}", '0x' + secrets.token_hex(32))
+                        break
+                    except OperationalError:
+                        # e.g. SQLite's "database is locked". The in-memory test database
+                        # fails lock conflicts at once, and every buyer may lose; retry like a client.
+                        if attempt == self.ATTEMPTS - 1:
+                            raise
+                        time.sleep(0.01 * (n + 1))
+            except TradeUnavailableError:
+                result = 'rejected'
+            except OperationalError:
+                result = 'lock_timeout'
+            except Exception as e:
+                result = f'error:{type(e).__name__}'
+            finally:
+                connection.close()
+            with lock:
+                outcomes[result] += 1
+
+        threads = [threading.Thread(target=buy, args=(n,)) for n in range(self.BUYERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_one_trade_per_listing(self):
+        for round_no in range(self.ROUNDS):
+            with self.subTest(round=round_no):
+                listing = self.funded_listing()
+                outcomes = self.race(listing)
+                self.assertEqual(outcomes['won'], 1, dict(outcomes))
+                self.assertEqual(set(outcomes) - {'won', 'rejected', 'lock_timeout'}, set(), dict(outcomes))
+                self.assertEqual(P2PTrade.objects.filter(listing=listing).count(), 1)
+                listing.refresh_from_db(fields=['status'])
+                self.assertEqual(listing.status, 3)
+
+
+class MarketStatsCacheTests(TestCase):
+    """Snapshots only live in a cache every process shares."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_process_local_cache_serves_live_stats(self):
+        P2PListing.objects.bulk_create([
+            P2PListing(
+                seller_token=TOKEN,
+                crypto_type='sell',
+                fiat_currency='USD',
+                payment_method=1,
+                usdt_amount=Decimal('10'),
+                crypto_amount=Decimal('10'),
+                status=0,
+                expires_at=timezone.now() + timedelta(days=1),
+            )
+            for _ in range(2)
+        ])
+        self.assertEqual(get_market_stats()['stats']['total_active_listings'], 0)
+        # Sends no signal, like a change made in another process
+        P2PListing.objects.update(status=1)
+        self.assertEqual(get_market_stats()['stats']['total_active_listings'], 2)
+
+    def test_snapshot_is_cached_when_allowed(self):
+        xusdt = dict(settings.XUSDT_SETTINGS, MARKET_STATS_ALLOW_LOCAL=True)
+        with override_settings(XUSDT_SETTINGS=xusdt):
+            first = get_market_stats()
+            with self.assertNumQueries(0):
+                self.assertEqual(get_market_stats()['etag'], first['etag'])
+
+    def test_refresh_command_refuses_a_process_local_cache(self):
+        with self.assertRaisesMessage(CommandError, "local to this process"):
+            call_command('refresh_market_stats', '--once')
+
+
+class ListingExpiryTests(SimChainMixin, TestCase):
+    """Expired listings give their escrow back: refunded if funded, expired if still waiting."""
+
+    xusdt = {'TX_RETRY_BACKOFF': 0}
+    AMOUNT = Decimal('25')
+
+    def setUp(self):
+        super().setUp()
+        self.reaper = ListingExpiryReaper(batch_size=10)
+
+    def listing(self, escrow_status, listing_status=2, expires_in=timedelta(minutes=-1)):
+        wallet = EscrowWallet.objects.create(
+            address=Account.create().address,
+            user_token='expiry-seller',
+            seller_address=Account.create().address,
+            balance_commitment='0' * 64,
+            amount=self.AMOUNT,
+            status=escrow_status,
+        )
+        return P2PListing.objects.create(
+            seller_token='expiry-seller',
+            crypto_type='sell',
+            fiat_currency='USD',
+            payment_method=1,
+            usdt_amount=self.AMOUNT,
+            crypto_amount=self.AMOUNT,
+            escrow_wallet=wallet,
+            status=listing_status,
+            expires_at=timezone.now() + expires_in,
+        )
+
+    def test_funded_escrow_is_refunded_to_the_seller(self):
+        listing = self.listing(EscrowWallet.STATUS_FUNDED)
+        self.assertEqual(self.reaper.run_once(), 1)
+        listing.refresh_from_db()
+        self.assertEqual(listing.status, 5)
+        refund = TransactionQueue.objects.get(escrow=listing.escrow_wallet)
+        self.assertEqual(
+            (refund.tx_type, refund.to_address, refund.amount),
+            ('refund', listing.escrow_wallet.seller_address, self.AMOUNT),
+        )
+
+        worker = TxQueueWorker(token=self.token)
+        worker.submit_pending()
+        self.node.mine()
+        worker.track_receipts()
+        refund.refresh_from_db()
+        self.assertEqual(refund.status, TransactionQueue.COMPLETED)
+        self.assertEqual(EscrowWallet.objects.get(pk=listing.escrow_wallet_id).status, EscrowWallet.STATUS_RELEASED)
+        self.assertEqual(self.node.token_balance(refund.to_address), 25 * 10 ** 6)
+
+    def test_escrow_awaiting_deposit_expires(self):
+        listing = self.listing(EscrowWallet.STATUS_CREATED, listing_status=1)
+        self.reaper.run_once()
+        self.assertEqual(EscrowWallet.objects.get(pk=listing.escrow_wallet_id).status, EscrowWallet.STATUS_EXPIRED)
+        self.assertFalse(TransactionQueue.objects.exists())
+
+    def test_listing_not_due_is_left_alone(self):
+        listing = self.listing(EscrowWallet.STATUS_FUNDED, expires_in=timedelta(hours=1))
+        self.assertEqual(self.reaper.run_once(), 0)
+        listing.refresh_from_db()
+        self.assertEqual(listing.status, 2)
+
+    def test_failure_while_queueing_a_refund_rolls_the_batch_back(self):
+        listing = self.listing(EscrowWallet.STATUS_FUNDED)
+        with mock.patch('apps.escrow.services.enqueue_release', side_effect=RuntimeError("worker died")):
+            with self.assertRaises(RuntimeError):
+                self.reaper.run_once()
+        listing.refresh_from_db()
+        self.assertEqual(listing.status, 2)
+        self.assertFalse(EscrowAuditLog.objects.exists())
+
+        self.reaper.run_once()
+        listing.refresh_from_db()
+        self.assertEqual(listing.status, 5)
+        self.assertTrue(TransactionQueue.objects.filter(escrow=listing.escrow_wallet, tx_type='refund').exists())
+
+    def test_failed_refund_is_queued_again(self):
+        listing = self.listing(EscrowWallet.STATUS_FUNDED, listing_status=5)
+        TransactionQueue.objects.create(
+            tx_type='refund', escrow=listing.escrow_wallet, status=TransactionQueue.FAILED,
+            to_address=listing.escrow_wallet.seller_address, amount=self.AMOUNT,
+        )
+        self.assertEqual(self.reaper.requeue_refunds(), 1)
+        self.assertEqual(EscrowWallet.objects.get(pk=listing.escrow_wallet_id).status, EscrowWallet.STATUS_RELEASING)
+        self.assertEqual(TransactionQueue.objects.filter(status=TransactionQueue.PENDING, tx_type='refund').count(), 1)
+        # Already queued: nothing to do
+        self.assertEqual(self.reaper.requeue_refunds(), 0)
+
+    def test_refund_that_keeps_failing_is_left_for_review(self):
+        listing = self.listing(EscrowWallet.STATUS_FUNDED, listing_status=5)
+        TransactionQueue.objects.bulk_create([
+            TransactionQueue(
+                tx_type='refund', escrow=listing.escrow_wallet, status=TransactionQueue.FAILED,
+                to_address=listing.escrow_wallet.seller_address, amount=self.AMOUNT,
+            )
+            for _ in range(self.reaper.max_refunds)
+        ])
+        self.assertEqual(self.reaper.requeue_refunds(), 0)
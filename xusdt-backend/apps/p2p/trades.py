@@ -0,0 +1,69 @@
+"""
+Trade creation.
+
+A listing can back exactly one trade. `create_trade` runs in a single
+transaction:
+
+1. The listing row is locked with SELECT ... FOR UPDATE, so concurrent
+   buyers of the same listing queue up behind the first one.
+2. The listing is checked (not the caller's own, Funded, not expired, escrow
+   funded) and the trade is built with its fee, before anything is written.
+3. The listing is reserved through the `reserve` transition, a conditional
+   `UPDATE ... SET status=3 WHERE id=:id AND status=2`. A buyer whose UPDATE
+   matches no row lost the race and gets TradeUnavailableError. This is what
+   decides the winner on databases without row locks (SQLite).
+4. The trade is inserted once.
+
+Any failure rolls back the reservation along with the trade.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .exceptions import TradeUnavailableError
+from .models import P2PListing, P2PTrade
+from .orderbook import order_book
+from .state_machine import listing_machine
+
+FUNDED = 2
+TRADE_FUNDED = 1
+
+
+@transaction.atomic
+def create_trade(listing_id, buyer_token, escrow_tx_hash, payment_proof_hash=None) -> P2PTrade:
+    """Reserve a Funded listing for `buyer_token` and create its trade."""
+    try:
+        listing = (
+            P2PListing.objects.select_for_update(of=('self',))
+            .select_related('escrow_wallet')
+            .get(pk=listing_id)
+        )
+    except P2PListing.DoesNotExist:
+        raise TradeUnavailableError("Listing not found")
+
+    now = timezone.now()
+    if buyer_token == listing.seller_token:
+        raise TradeUnavailableError("You cannot create a trade with your own listing")
+    if listing.status != FUNDED or listing.expires_at <= now:
+        raise TradeUnavailableError("This listing is not available for trading")
+    if listing.escrow_wallet is None or listing.escrow_wallet.status != "funded":
+        raise TradeUnavailableError("Listing must be funded by merchant first")
+
+    trade = P2PTrade(
+        listing=listing,
+        buyer_token=buyer_token,
+        seller_token=listing.seller_token,
+        escrow_tx_hash=escrow_tx_hash,
+        payment_proof_hash=payment_proof_hash,
+        usdt_amount=listing.usdt_amount,
+        status=TRADE_FUNDED,
+    )
+    trade.calculate_fee()
+
+    if not listing_machine.transition(listing, 'reserve', actor=buyer_token, condition=Q(expires_at__gt=now)):
+        raise TradeUnavailableError("This listing is not available for trading")
+
+    trade.save(force_insert=True)
+    # The UPDATE skips post_save; take the listing off this process's book
+    transaction.on_commit(lambda: order_book.apply(listing))
+    return trade
@@ -6,8 +6,10 @@ from .views import (
     P2PTradeDetailView,
     MyTradesListView,
     MarketStatsView,
+    OrderBookView,
     SpecificUserView,
     MarkTradeAsPaidView, 
+    TradeTimelineView,
 )
 
 urlpatterns = [
@@ -16,7 +18,9 @@ urlpatterns = [
     path('trades/', P2PTradeCreateView.as_view(), name='p2p-trade-create'),
     path('trades/<uuid:pk>/', P2PTradeDetailView.as_view(), name='p2p-trade-detail'),
     path('trades/<uuid:pk>/mark-paid/', MarkTradeAsPaidView.as_view(), name='p2p-trade-mark-paid'),
+    path('trades/<uuid:pk>/timeline/', TradeTimelineView.as_view(), name='p2p-trade-timeline'),
     path('my-trades/', MyTradesListView.as_view(), name='p2p-my-trades'),
     path('market-stats/', MarketStatsView.as_view(), name='p2p-market-stats'),
+    path('orderbook/', OrderBookView.as_view(), name='p2p-orderbook'),
     path('specific-user/', SpecificUserView.as_view(), name='p2p-specific-user'),
 ]
@@ -1,30 +1,76 @@
+import logging
+
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from .models import P2PListing, P2PTrade
-from .serializers import P2PListingSerializer, P2PTradeSerializer, P2PTradeCreateSerializer
+from .serializers import (
+    P2PListingSerializer, P2PTradeSerializer, P2PTradeCreateSerializer, StatusTransitionSerializer,
+)
 from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.utils.http import http_date
 from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
 from rest_framework import serializers
-import hmac
-import hashlib
 from rest_framework.views import APIView
-from django.db.models import Avg, Count, Min, Max, Sum
 from rest_framework.permissions import IsAuthenticated
-from .utils import create_escrow_wallet
+from decimal import Decimal
+
+from apps.core.pagination import KeysetPagination
+from apps.escrow.exceptions import EscrowUnavailable, WalletError
+from .market_stats import get_market_stats
+from .exceptions import TradeUnavailableError
+from .orderbook import order_book
+from .state_machine import timeline, trade_machine
+from .trades import create_trade
+
+logger = logging.getLogger(__name__)
+
+class ListingPagination(KeysetPagination):
+    page_size = 50
+    max_page_size = 200
+
 
 class P2PListingListView(generics.ListCreateAPIView):
-    """List active listings and allow authenticated users to create a listing."""
+    """
+    Order book of active listings (keyset-paginated, newest first) and
+    listing creation.
+
+    Filters: crypto_type, fiat_currency, payment_method, min_amount and
+    max_amount (crypto_amount range).
+    """
 
     serializer_class = P2PListingSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = ListingPagination
 
     def get_queryset(self):
-        return (
-            P2PListing.objects.filter(status=1, expires_at__gt=timezone.now())
-            .order_by("-created_at")
-        )
+        # Served by idx_listing_active; ordering comes from the paginator.
+        # Expired listings are moved out of status 1 by `expire_listings`.
+        queryset = P2PListing.objects.filter(status=1)
+        params = self.request.query_params
+
+        if params.get('crypto_type'):
+            queryset = queryset.filter(crypto_type=params['crypto_type'])
+        if params.get('fiat_currency'):
+            queryset = queryset.filter(fiat_currency=params['fiat_currency'].upper())
+        if params.get('payment_method'):
+            queryset = queryset.filter(payment_method=self._param(params, 'payment_method', int))
+        if params.get('min_amount'):
+            queryset = queryset.filter(crypto_amount__gte=self._param(params, 'min_amount', Decimal))
+        if params.get('max_amount'):
+            queryset = queryset.filter(crypto_amount__lte=self._param(params, 'max_amount', Decimal))
+        return queryset
+
+    @staticmethod
+    def _param(params, name, cast):
+        try:
+            return cast(params[name])
+        except (ValueError, ArithmeticError):
+            raise serializers.ValidationError({name: "Invalid value"})
 
+    @transaction.atomic  # a failed listing returns its claimed key to the pool
     def perform_create(self, serializer):
         # Validate required fields - using usdt_amount instead of fiat_amount
         required_fields = [
@@ -39,15 +85,20 @@ class P2PListingListView(generics.ListCreateAPIView):
             if field not in serializer.validated_data:
                 raise serializers.ValidationError({field: "This field is required"})
 
-        # Generate seller token
-        client_token = self.request.user.client_token
-        hmac_key = settings.XUSDT_SETTINGS["USER_TOKEN_HMAC_KEY"].encode()
-        seller_token = hmac.new(hmac_key, client_token.encode(), hashlib.sha256).hexdigest()
+        seller_token = self.request.user.user_token
 
-        # Create escrow wallet
-        escrow_wallet = create_escrow_wallet()
+        # Imported here so web3 is only loaded by requests that touch the chain
+        from apps.escrow.services import create_escrow_wallet
+
+        # Claim an escrow address from the pre-generated key pool
+        try:
+            escrow_wallet = create_escrow_wallet()
+        except WalletError as e:
+            logger.error("Listing not created, no escrow wallet: %s", e)
+            raise EscrowUnavailable()
         escrow_wallet.user_token = seller_token
         escrow_wallet.status = 'created'
+        escrow_wallet.expected_amount = serializer.validated_data["crypto_amount"]
         escrow_wallet.save()
 
         # Save listing with seller_token, status, and escrow_wallet
@@ -76,49 +127,16 @@ class P2PTradeCreateView(generics.CreateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def perform_create(self, serializer):
-        listing = serializer.validated_data["listing"]
-
-        # Generate user token
-        client_token = self.request.user.client_token
-        hmac_key = settings.XUSDT_SETTINGS["USER_TOKEN_HMAC_KEY"].encode()
-        user_token = hmac.new(hmac_key, client_token.encode(), hashlib.sha256).hexdigest()
-
-        # Prevent self-trading
-        if user_token == listing.seller_token:
-            raise serializers.ValidationError(
-                {"listing": "You cannot create a trade with your own listing"}
-            )
-
-        # Check if listing is active and not expired
-        if listing.status != 1 or listing.expires_at < timezone.now():
-            raise serializers.ValidationError(
-                {"listing": "This listing is not available for trading"}
-            )
-
-        # Ensure the listing is funded
-        if (
-            listing.escrow_wallet is None
-            or listing.escrow_wallet.status != "funded"
-            or listing.status != 2  # Listing must have status = 2 (Funded)
-        ):
-            raise serializers.ValidationError(
-                {"listing": "Listing must be funded by merchant first"}
+        data = serializer.validated_data
+        try:
+            serializer.instance = create_trade(
+                listing_id=data["listing"].pk,
+                buyer_token=self.request.user.user_token,
+                escrow_tx_hash=data["escrow_tx_hash"],
+                payment_proof_hash=data.get("payment_proof_hash"),
             )
-
-        # Create and save the trade
-        trade = serializer.save(
-            buyer_token=user_token,
-            seller_token=listing.seller_token,
-            status=1  # Trade status = Funded
-        )
-
-        # Calculate and save fee
-        trade.calculate_fee()
-        trade.save()
-
-        # Reserve the listing
-        listing.status = 3  # Reserved
-        listing.save()
+        except TradeUnavailableError as e:
+            raise serializers.ValidationError({"listing": str(e)})
 
 
 class P2PTradeDetailView(generics.RetrieveUpdateAPIView):
@@ -128,68 +146,83 @@ class P2PTradeDetailView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        client_token = self.request.user.client_token
-        hmac_key = settings.XUSDT_SETTINGS["USER_TOKEN_HMAC_KEY"].encode()
-        user_token = hmac.new(hmac_key, client_token.encode(), hashlib.sha256).hexdigest()
-        return P2PTrade.objects.filter(Q(buyer_token=user_token) | Q(seller_token=user_token))
+        user_token = self.request.user.user_token
+        return P2PTrade.objects.select_related("listing").filter(
+            Q(buyer_token=user_token) | Q(seller_token=user_token)
+        )
+
+
+class TradePagination(KeysetPagination):
+    page_size = 50
+    max_page_size = 200
 
 
 class MyTradesListView(generics.ListAPIView):
-    """List all trades where the authenticated user is either buyer or seller."""
+    """
+    Trades where the authenticated user is either buyer or seller, newest
+    first and keyset-paginated. The two sides are read as separate index
+    ranges (idx_trade_buyer_recent, idx_trade_seller_recent) and merged, and
+    listings are joined in, so a page costs the same few queries at any size.
+    """
 
     serializer_class = P2PTradeSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = TradePagination
 
     def get_queryset(self):
-        client_token = self.request.user.client_token
-        hmac_key = settings.XUSDT_SETTINGS["USER_TOKEN_HMAC_KEY"].encode()
-        user_token = hmac.new(hmac_key, client_token.encode(), hashlib.sha256).hexdigest()
-        return (
-            P2PTrade.objects.filter(Q(buyer_token=user_token) | Q(seller_token=user_token))
-            .order_by("-created_at")
-        )
-    
+        return P2PTrade.objects.select_related("listing")
+
+    def get_keyset_branches(self):
+        user_token = self.request.user.user_token
+        return [Q(buyer_token=user_token), Q(seller_token=user_token)]
+
+
 class MarketStatsView(APIView):
-    """Provides market statistics for P2P trading"""
+    """Provides market statistics for P2P trading, served from a cached snapshot"""
     authentication_classes = []
     permission_classes = []
 
     def get(self, request, format=None):
-        # Get active listings
-        active_listings = P2PListing.objects.filter(
-            status=1,  # Active
-            expires_at__gt=timezone.now()
-        )
-        
-        # Calculate statistics - using usdt_amount instead of fiat_amount
-        stats = {
-            'total_active_listings': active_listings.count(),
-            'average_price': active_listings.aggregate(avg_price=Avg('usdt_amount'))['avg_price'],
-            'min_price': active_listings.aggregate(min_price=Min('usdt_amount'))['min_price'],
-            'max_price': active_listings.aggregate(max_price=Max('usdt_amount'))['max_price'],
-            'payment_methods_distribution': active_listings.values('payment_method').annotate(
-                count=Count('payment_method')
-            ).order_by('-count'),
-            'volume_24h': P2PTrade.objects.filter(
-                created_at__gte=timezone.now() - timezone.timedelta(days=1)
-            ).aggregate(total_volume=Sum('usdt_amount'))['total_volume'] or 0,
-        }
-        
-        return Response(stats)
+        snapshot = get_market_stats()
+        etag = f'"{snapshot["etag"]}"'
+
+        if etag in request.headers.get('If-None-Match', ''):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response(snapshot['stats'])
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(snapshot['generated_at'])
+        patch_cache_control(response, public=True, max_age=settings.XUSDT_SETTINGS['MARKET_STATS_MAX_AGE'])
+        return response
+
+class OrderBookView(APIView):
+    """Best bid/ask and aggregated depth for a fiat currency, from the in-memory book."""
+    authentication_classes = []
+    permission_classes = []
+
+    def get(self, request, format=None):
+        fiat_currency = request.query_params.get('fiat_currency', 'USD')
+        try:
+            payment_method = request.query_params.get('payment_method')
+            payment_method = int(payment_method) if payment_method else None
+            depth = int(request.query_params.get('depth', settings.XUSDT_SETTINGS['ORDERBOOK_DEPTH']))
+        except ValueError:
+            return Response(
+                {"error": "payment_method and depth must be integers"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(order_book.snapshot(fiat_currency, payment_method, depth=max(1, min(depth, 100))))
 
 class MarkTradeAsPaidView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
         try:
-            trade = P2PTrade.objects.get(pk=kwargs['pk'])
+            trade = P2PTrade.objects.select_related('listing').get(pk=kwargs['pk'])
 
             # Check if user is the buyer
-            client_token = request.user.client_token
-            hmac_key = settings.XUSDT_SETTINGS["USER_TOKEN_HMAC_KEY"].encode()
-            user_token = hmac.new(hmac_key, client_token.encode(), hashlib.sha256).hexdigest()
-
-            if trade.buyer_token != user_token:
+            if trade.buyer_token != request.user.user_token:
                 return Response({"detail": "Permission denied."}, status=status.HTTP_403_FORBIDDEN)
 
             if trade.status != 1:  # Must be in Funded state
@@ -198,18 +231,46 @@ class MarkTradeAsPaidView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-            # Update status to PaymentSent
-            trade.status = 2
-            trade.updated_at = timezone.now()
-            trade.save()
+            # Update status to PaymentSent unless the trade moved on meanwhile
+            if not trade_machine.transition(trade, 'mark_paid', actor=request.user.user_token):
+                return Response(
+                    {"detail": "Trade must be in Funded state to mark as paid."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-            serializer = P2PTradeSerializer(trade)
+            serializer = P2PTradeSerializer(trade, context={'request': request})
             return Response(serializer.data)
 
         except P2PTrade.DoesNotExist:
             return Response({"detail": "Trade not found."}, status=status.HTTP_404_NOT_FOUND)
         
         
+class TradeTimelineView(APIView):
+    """Status history of a trade, its listing and the listing's escrow."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        user_token = request.user.user_token
+        try:
+            trade = P2PTrade.objects.select_related('listing__escrow_wallet').get(
+                Q(buyer_token=user_token) | Q(seller_token=user_token), pk=pk
+            )
+        except P2PTrade.DoesNotExist:
+            return Response({"detail": "Trade not found."}, status=status.HTTP_404_NOT_FOUND)
+
+        from apps.escrow.tx_status import lookup_or_none
+
+        # The buyer supplies escrow_tx_hash; only a transaction touching the escrow counts
+        escrow = trade.listing.escrow_wallet
+        receipt = lookup_or_none(trade.escrow_tx_hash, involves=(escrow.address,)) if escrow else None
+        serializer = StatusTransitionSerializer(timeline(trade), many=True)
+        return Response({
+            "trade": trade.pk,
+            "transitions": serializer.data,
+            "escrow_receipt": receipt,
+        })
+
+
 class SpecificUserView(APIView):
     """
     Get listings for a specific user or current user if no ID provided
@@ -221,16 +282,14 @@ class SpecificUserView(APIView):
         
         # If no user_id provided, get current user's token
         if not user_id:
-            client_token = request.user.client_token
-            hmac_key = settings.XUSDT_SETTINGS["USER_TOKEN_HMAC_KEY"].encode()
-            user_id = hmac.new(hmac_key, client_token.encode(), hashlib.sha256).hexdigest()
+            user_id = request.user.user_token
 
         listings = P2PListing.objects.filter(
             seller_token=user_id,
             expires_at__gt=timezone.now()
         ).order_by('-created_at')
 
-        serializer = P2PListingSerializer(listings, many=True)
+        serializer = P2PListingSerializer(listings, many=True, context={'request': request})
         return Response({
             "listings": serializer.data,
             "user_info": {
@@ -0,0 +1,179 @@
+"""
+Rolling trade-volume counters.
+
+Completed trades are added to TradeVolumeBucket rows at minute and hour
+granularity, per fiat currency and payment method. `record_completed_trades`
+is called wherever a trade moves to Completed. A window read covers the full
+hours with hour buckets and the two partial hours at its edges with minute
+buckets, so a 24h read touches at most ~24 + 2*60 rows and a 7d read
+~168 + 2*60, whatever the trade count.
+
+Minute buckets are only needed for window edges, so they are kept for
+TRADE_VOLUME_MINUTE_RETENTION hours (just over the 7d window) and dropped by
+`prune_minute_buckets`, which `backfill_trade_volume --prune` runs.
+`backfill_trade_volume` rebuilds everything from P2PTrade history.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncHour, TruncMinute
+from django.utils import timezone
+
+from .models import P2PTrade, TradeVolumeBucket
+
+COMPLETED = 3
+WINDOWS = {
+    '1h': timedelta(hours=1),
+    '24h': timedelta(hours=24),
+    '7d': timedelta(days=7),
+}
+
+
+def _floor(moment, granularity):
+    moment = moment.replace(second=0, microsecond=0)
+    return moment.replace(minute=0) if granularity == TradeVolumeBucket.HOUR else moment
+
+
+def _increment(granularity, bucket_start, fiat_currency, payment_method, count, volume):
+    key = dict(
+        granularity=granularity,
+        bucket_start=bucket_start,
+        fiat_currency=fiat_currency,
+        payment_method=payment_method,
+    )
+    increment = dict(trade_count=F('trade_count') + count, volume=F('volume') + volume)
+    if TradeVolumeBucket.objects.filter(**key).update(**increment):
+        return
+    try:
+        with transaction.atomic():
+            TradeVolumeBucket.objects.create(**key, trade_count=count, volume=volume)
+    except IntegrityError:
+        # Another process created the bucket first
+        TradeVolumeBucket.objects.filter(**key).update(**increment)
+
+
+def record_completed_trades(trade_ids):
+    """Add trades that just moved to Completed to the volume buckets."""
+    trades = (
+        P2PTrade.objects.filter(pk__in=list(trade_ids), status=COMPLETED)
+        .values_list('usdt_amount', 'completed_at', 'listing__fiat_currency', 'listing__payment_method')
+    )
+    totals = defaultdict(lambda: [0, Decimal('0')])
+    now = timezone.now()
+    for amount, completed_at, fiat_currency, payment_method in trades:
+        for granularity in (TradeVolumeBucket.MINUTE, TradeVolumeBucket.HOUR):
+            key = (granularity, _floor(completed_at or now, granularity), fiat_currency.upper(), payment_method)
+            totals[key][0] += 1
+            totals[key][1] += amount
+
+    with transaction.atomic():
+        for (granularity, bucket_start, fiat_currency, payment_method), (count, volume) in totals.items():
+            _increment(granularity, bucket_start, fiat_currency, payment_method, count, volume)
+
+
+def trade_volume(window: timedelta, fiat_currency=None, payment_method=None, now=None) -> dict:
+    """Completed trade count and USDT volume over the trailing window."""
+    now = now or timezone.now()
+    start = now - window
+    full_hours_start = _floor(start, TradeVolumeBucket.HOUR)
+    if full_hours_start < start:
+        full_hours_start += timedelta(hours=1)
+    full_hours_end = _floor(now, TradeVolumeBucket.HOUR)
+
+    if full_hours_start < full_hours_end:
+        ranges = (
+            Q(granularity=TradeVolumeBucket.HOUR,
+              bucket_start__gte=full_hours_start, bucket_start__lt=full_hours_end)
+            | Q(granularity=TradeVolumeBucket.MINUTE,
+                bucket_start__gte=_floor(start, TradeVolumeBucket.MINUTE), bucket_start__lt=full_hours_start)
+            | Q(granularity=TradeVolumeBucket.MINUTE, bucket_start__gte=full_hours_end)
+        )
+    else:
+        # Window shorter than an hour boundary span: minutes only
+        ranges = Q(granularity=TradeVolumeBucket.MINUTE, bucket_start__gte=_floor(start, TradeVolumeBucket.MINUTE))
+
+    buckets = TradeVolumeBucket.objects.filter(ranges)
+    if fiat_currency:
+        buckets = buckets.filter(fiat_currency=fiat_currency.upper())
+    if payment_method is not None:
+        buckets = buckets.filter(payment_method=payment_method)
+
+    totals = buckets.aggregate(trades=Sum('trade_count'), volume=Sum('volume'))
+    return {'trades': totals['trades'] or 0, 'volume': totals['volume'] or Decimal('0')}
+
+
+def volume_summary(fiat_currency=None, payment_method=None) -> dict:
+    now = timezone.now()
+    return {
+        name: trade_volume(window, fiat_currency, payment_method, now=now)
+        for name, window in WINDOWS.items()
+    }
+
+
+# ---------------------------------------------------------------------------
+# Rebuild
+# ---------------------------------------------------------------------------
+
+def _history(since, granularity):
+    trunc = TruncHour if granularity == TradeVolumeBucket.HOUR else TruncMinute
+    trades = P2PTrade.objects.filter(status=COMPLETED).annotate(
+        finished_at=Coalesce('completed_at', 'updated_at'),
+    )
+    if since is not None:
+        trades = trades.filter(finished_at__gte=since)
+    return (
+        trades.annotate(bucket=trunc('finished_at'))
+        .values('bucket', 'listing__fiat_currency', 'listing__payment_method')
+        .annotate(trade_count=Count('id'), volume=Sum('usdt_amount'))
+        .order_by()
+    )
+
+
+@transaction.atomic
+def rebuild_buckets(since=None) -> dict:
+    """Recompute buckets from completed trades (all history, or from `since`)."""
+    written = {}
+    minute_since = timezone.now() - timedelta(hours=settings.XUSDT_SETTINGS['TRADE_VOLUME_MINUTE_RETENTION'])
+    if since is not None:
+        minute_since = max(minute_since, since)
+
+    for granularity, start in ((TradeVolumeBucket.HOUR, since), (TradeVolumeBucket.MINUTE, minute_since)):
+        if start is not None:
+            start = _floor(start, granularity)
+        existing = TradeVolumeBucket.objects.filter(granularity=granularity)
+        if start is not None:
+            existing = existing.filter(bucket_start__gte=start)
+        existing.delete()
+
+        # Fiat codes are not normalized on listings; merge case variants
+        totals = defaultdict(lambda: [0, Decimal('0')])
+        for row in _history(start, granularity):
+            key = (row['bucket'], row['listing__fiat_currency'].upper(), row['listing__payment_method'])
+            totals[key][0] += row['trade_count']
+            totals[key][1] += row['volume'] or Decimal('0')
+        rows = [
+            TradeVolumeBucket(
+                granularity=granularity,
+                bucket_start=bucket_start,
+                fiat_currency=fiat_currency,
+                payment_method=payment_method,
+                trade_count=count,
+                volume=volume,
+            )
+            for (bucket_start, fiat_currency, payment_method), (count, volume) in totals.items()
+        ]
+        TradeVolumeBucket.objects.bulk_create(rows, batch_size=1000)
+        written[granularity] = len(rows)
+    return written
+
+
+def prune_minute_buckets() -> int:
+    cutoff = timezone.now() - timedelta(hours=settings.XUSDT_SETTINGS['TRADE_VOLUME_MINUTE_RETENTION'])
+    deleted, _ = TradeVolumeBucket.objects.filter(
+        granularity=TradeVolumeBucket.MINUTE, bucket_start__lt=cutoff
+    ).delete()
+    return deleted
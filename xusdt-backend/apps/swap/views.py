@@ -275,15 +275,26 @@ class ExecuteSwapView(APIView):
 class SwapStatusView(APIView):
     def get(self, request, tx_id):
         try:
-            swap = SwapTransaction.objects.get(id=tx_id)
+            swap = SwapTransaction.objects.select_related('quote__token_in').get(id=tx_id)
             serializer = TransactionSerializer(swap)
-            return Response(serializer.data)
         except SwapTransaction.DoesNotExist:
             return Response(
                 {'error': 'Swap not found'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
+        # Receipt and confirmations come from the tracked status, not the node
+        from apps.bridge.models import BridgeNetwork
+        from apps.escrow.tx_status import lookup_or_none
+        receipt = None
+        if swap.tx_hash:
+            # Networks without a BridgeNetwork row are served by the default chain
+            chain_id = BridgeNetwork.objects.filter(
+                name__iexact=swap.quote.token_in.network
+            ).values_list('chain_id', flat=True).first()
+            receipt = lookup_or_none(swap.tx_hash, chain_id=chain_id, involves=(swap.from_address, swap.to_address))
+        return Response(dict(serializer.data, receipt=receipt))
+
 class SwapHistoryView(APIView):
     def get(self, request):
         user_token = request.headers.get('X-Client-Token')
@@ -81,10 +81,14 @@ TEMPLATES = [
 WSGI_APPLICATION = 'config.wsgi.application'
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': env.db('DATABASE_URL', default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
+}
+
+# Shared cache (token -> user lookups etc). Point CACHE_URL at redis/memcached
+# in production so every worker sees the same entries; on the locmem default
+# the client-token cache is disabled (see apps.core.auth_cache.is_enabled).
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
 }
 
 # DATABASES = {
@@ -115,7 +119,9 @@ SECURITY_SETTINGS = {
     }
 }
 
-WEB3_RPC_URL = "https://mainnet.infura.io/v3/YOUR_PROJECT_ID"  # Or your node URL
+# WEB3_RPC_URL is read from the environment above; sim://<name> selects the in-process chain simulator
+WEB3_RPC_FALLBACK_URLS = env.list('WEB3_RPC_FALLBACK_URLS', default=[])  # tried after WEB3_RPC_URL
+CHAIN_ID = env.int('CHAIN_ID', default=1)  # chain served by WEB3_RPC_URL
 USDT_ADDR = "0xdAC17F958D2ee523a2206206994597C13D831ec7"  # Mainnet USDT
 
 # Load environment
@@ -127,6 +133,14 @@ SECURITY_QUESTION_ENCRYPTION_KEY = Fernet.generate_key().decode()
 DEBUG = env.bool('DJANGO_DEBUG', default=False)
 
 SECURITY_EVENT_HMAC_KEY = os.getenv('SECURITY_EVENT_HMAC_KEY', 'default-insecure-key-for-dev-only')
+# Fernet key for SystemWallet.private_key_enc
+SYSTEM_WALLET_ENCRYPTION_KEY = env('SYSTEM_WALLET_ENCRYPTION_KEY', default=None)
+# Fernet key for EscrowWallet.private_key_enc; escrow keys are not kept without it
+ESCROW_WALLET_ENCRYPTION_KEY = env('ESCROW_WALLET_ENCRYPTION_KEY', default=None)
+# BIP-39 seed encrypted with ESCROW_WALLET_ENCRYPTION_KEY (manage.py create_escrow_seed); escrow keys
+# are derived from it by index under ESCROW_HD_PATH instead of being stored
+ESCROW_HD_SEED_ENC = env('ESCROW_HD_SEED_ENC', default=None)
+ESCROW_HD_PATH = env('ESCROW_HD_PATH', default="m/44'/60'/0'/0")
 
 if DEBUG:
     SECURE_SSL_REDIRECT = False
@@ -235,4 +249,44 @@ XUSDT_SETTINGS = {
     'ESCROW_MIN_FEE': 1.0,  # 1 USDT
     'LISTING_EXPIRY_DAYS': 7,
     'TRADE_TIMEOUT_HOURS': 24,
+    'AUTH_CACHE_TTL': env.int('AUTH_CACHE_TTL', default=300),  # seconds
+    # The token cache is off on a process-local CACHES backend unless allowed (single-process servers)
+    'AUTH_CACHE_ALLOW_LOCAL': env.bool('AUTH_CACHE_ALLOW_LOCAL', default=False),
+    'LAST_ACTIVE_WRITE_WINDOW': env.int('LAST_ACTIVE_WRITE_WINDOW', default=60),  # seconds
+    'LAST_ACTIVE_FLUSH_INTERVAL': env.int('LAST_ACTIVE_FLUSH_INTERVAL', default=10),  # seconds
+    'BALANCE_BATCH_SIZE': env.int('BALANCE_BATCH_SIZE', default=200),  # balanceOf calls per RPC batch
+    'TRANSFER_CONFIRMATIONS': env.int('TRANSFER_CONFIRMATIONS', default=12),  # blocks
+    'TRANSFER_LOG_RANGE': env.int('TRANSFER_LOG_RANGE', default=2000),  # blocks per eth_getLogs
+    'TX_QUEUE_BATCH_SIZE': env.int('TX_QUEUE_BATCH_SIZE', default=20),
+    'TX_MAX_RETRIES': env.int('TX_MAX_RETRIES', default=5),
+    'TX_RETRY_BACKOFF': env.int('TX_RETRY_BACKOFF', default=15),  # seconds, doubled per retry
+    'TX_RECEIPT_TIMEOUT': env.int('TX_RECEIPT_TIMEOUT', default=180),  # seconds without a receipt before a replacement
+    'TX_MAX_REPLACEMENTS': env.int('TX_MAX_REPLACEMENTS', default=3),  # then the row fails
+    'TX_CLAIM_TIMEOUT': env.int('TX_CLAIM_TIMEOUT', default=300),  # seconds before an unsigned claimed row is retried
+    'MAX_GAS_PRICE_GWEI': env.int('MAX_GAS_PRICE_GWEI', default=100),  # maxFeePerGas ceiling
+    'GAS_ORACLE_TTL': env.int('GAS_ORACLE_TTL', default=15),  # seconds
+    'GAS_FEE_HISTORY_BLOCKS': env.int('GAS_FEE_HISTORY_BLOCKS', default=20),
+    'SWEEP_BATCH_SIZE': env.int('SWEEP_BATCH_SIZE', default=50),  # transactions per sweep run
+    'SWEEP_GAS_BUDGET_ETH': env.str('SWEEP_GAS_BUDGET_ETH', default='0.05'),  # max fees per sweep run
+    'SWEEP_TOPUP_TIMEOUT': env.int('SWEEP_TOPUP_TIMEOUT', default=900),  # seconds a sent top-up is waited for
+    'RPC_TIMEOUT': env.int('RPC_TIMEOUT', default=10),  # seconds per RPC request
+    'RPC_POOL_SIZE': env.int('RPC_POOL_SIZE', default=20),  # keep-alive connections per endpoint
+    'RPC_COOLDOWN': env.int('RPC_COOLDOWN', default=5),  # seconds, doubled per consecutive failure
+    'ORDERBOOK_SYNC_INTERVAL': env.int('ORDERBOOK_SYNC_INTERVAL', default=1),  # seconds between change polls
+    'ORDERBOOK_REBUILD_INTERVAL': env.int('ORDERBOOK_REBUILD_INTERVAL', default=600),  # seconds between full reloads
+    'ORDERBOOK_DEPTH': env.int('ORDERBOOK_DEPTH', default=20),  # price levels per side
+    'MARKET_STATS_TTL': env.int('MARKET_STATS_TTL', default=30),  # seconds before a snapshot is rebuilt
+    # Like AUTH_CACHE_ALLOW_LOCAL: snapshots need a shared CACHES backend unless allowed (single-process servers)
+    'MARKET_STATS_ALLOW_LOCAL': env.bool('MARKET_STATS_ALLOW_LOCAL', default=False),
+    'MARKET_STATS_MAX_AGE': env.int('MARKET_STATS_MAX_AGE', default=10),  # Cache-Control max-age for clients
+    'TRADE_VOLUME_MINUTE_RETENTION': env.int('TRADE_VOLUME_MINUTE_RETENTION', default=170),  # hours, must cover the 7d window
+    'LISTING_EXPIRY_BATCH_SIZE': env.int('LISTING_EXPIRY_BATCH_SIZE', default=500),  # listings expired per UPDATE
+    'ESCROW_KEY_POOL_SIZE': env.int('ESCROW_KEY_POOL_SIZE', default=1000),  # unclaimed keys kept ready
+    'ESCROW_KEY_POOL_LOW_WATER': env.int('ESCROW_KEY_POOL_LOW_WATER', default=200),  # refill below this
+    'ESCROW_KEY_POOL_BATCH_SIZE': env.int('ESCROW_KEY_POOL_BATCH_SIZE', default=200),  # keys per bulk_create
+    'TX_FINALITY_CONFIRMATIONS': env.int('TX_FINALITY_CONFIRMATIONS', default=12),  # blocks until a receipt is final
+    'HEAD_BLOCK_TTL': env.int('HEAD_BLOCK_TTL', default=15),  # seconds before a lookup reads the head itself
+    'TX_STATUS_CACHE_TTL': env.int('TX_STATUS_CACHE_TTL', default=86400),  # seconds a final status stays cached
+    'TX_STATUS_PENDING_TIMEOUT': env.int('TX_STATUS_PENDING_TIMEOUT', default=3600),  # seconds the tracker polls a hash
+    'TX_STATUS_BATCH_SIZE': env.int('TX_STATUS_BATCH_SIZE', default=200),  # receipts fetched per new head
 }
\ No newline at end of file